@@ -0,0 +1,175 @@
+"""
+管理API端点 - 按任务开启/停止性能剖析，下载剖析结果；查看/触发数据库维护
+"""
+
+from flask import Blueprint, request, jsonify, send_from_directory
+import hmac
+import os
+
+admin_bp = Blueprint('admin', __name__)
+
+# 这些将在app.py中注入
+profiler = None
+task_queue = None
+maintenance = None
+auth_token = ''
+
+@admin_bp.before_request
+def check_admin_token():
+    """校验管理令牌（未配置令牌时不校验）"""
+    if not auth_token:
+        return None
+    token = request.headers.get('X-Admin-Token', '')
+    if not hmac.compare_digest(token, auth_token):
+        return jsonify({
+            'success': False,
+            'error': '管理令牌无效'
+        }), 401
+    return None
+
+@admin_bp.route('/profile/<task_id>', methods=['POST'])
+def start_profile(task_id):
+    """
+    为任务开启性能剖析
+
+    请求体: {"cpu": true, "memory": false}
+    任务须由本进程执行（排队中或执行中），执行任务的线程在任务开始或下一页开始时启动剖析。
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        cpu = bool(data.get('cpu', True))
+        memory = bool(data.get('memory', False))
+        if not cpu and not memory:
+            return jsonify({
+                'success': False,
+                'error': 'cpu和memory至少开启一个'
+            }), 400
+
+        status = task_queue.get_task_status(task_id)
+        if not status:
+            return jsonify({
+                'success': False,
+                'error': '任务不存在'
+            }), 404
+        if status.get('worker_id') or (status['status'] in ('pending', 'queued') and not task_queue.is_running):
+            return jsonify({
+                'success': False,
+                'error': '任务由远程工作节点执行，无法在本进程剖析'
+            }), 409
+        if status['status'] not in ('pending', 'queued', 'running'):
+            return jsonify({
+                'success': False,
+                'error': f"任务已结束（{status['status']}）"
+            }), 409
+
+        profile_request = profiler.request(task_id, cpu=cpu, memory=memory)
+        if profile_request is None:
+            return jsonify({
+                'success': False,
+                'error': '该任务已在剖析中'
+            }), 409
+
+        return jsonify({
+            'success': True,
+            'data': profile_request,
+            'message': '已登记剖析请求，任务开始或下一页开始时生效'
+        })
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'开启性能剖析失败: {str(e)}'
+        }), 500
+
+@admin_bp.route('/profile/<task_id>/stop', methods=['POST'])
+def stop_profile(task_id):
+    """停止任务的性能剖析（下一页开始时写出结果；任务结束时也会自动写出）"""
+    try:
+        if not profiler.stop(task_id):
+            return jsonify({
+                'success': False,
+                'error': '该任务没有进行中的剖析'
+            }), 404
+
+        return jsonify({
+            'success': True,
+            'message': '已请求停止剖析，结果写出后出现在剖析文件列表中'
+        })
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'停止性能剖析失败: {str(e)}'
+        }), 500
+
+@admin_bp.route('/profiles')
+def list_profiles():
+    """剖析状态和结果文件列表"""
+    try:
+        data = profiler.get_status()
+        data['files'] = profiler.list_files()
+        return jsonify({
+            'success': True,
+            'data': data
+        })
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'获取剖析结果失败: {str(e)}'
+        }), 500
+
+@admin_bp.route('/profiles/<path:filename>')
+def download_profile(filename):
+    """下载剖析结果文件"""
+    try:
+        if not os.path.isfile(os.path.join(profiler.profiles_dir, os.path.basename(filename))):
+            return jsonify({
+                'success': False,
+                'error': '文件不存在'
+            }), 404
+
+        return send_from_directory(profiler.profiles_dir, os.path.basename(filename), as_attachment=True)
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'下载剖析结果失败: {str(e)}'
+        }), 500
+
+@admin_bp.route('/maintenance')
+def get_maintenance_status():
+    """数据库维护状态：保留天数、数据库/WAL文件大小和最近一次执行结果"""
+    try:
+        return jsonify({
+            'success': True,
+            'data': maintenance.get_status()
+        })
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'获取数据库维护状态失败: {str(e)}'
+        }), 500
+
+@admin_bp.route('/maintenance/run', methods=['POST'])
+def run_maintenance():
+    """立即执行一次数据库维护（归档过期记录、增量vacuum）"""
+    try:
+        result = maintenance.run_once()
+        if result is None:
+            return jsonify({
+                'success': False,
+                'error': '数据库维护正在执行中'
+            }), 409
+
+        return jsonify({
+            'success': True,
+            'data': result
+        })
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'执行数据库维护失败: {str(e)}'
+        }), 500
@@ -3,6 +3,7 @@
 """
 
 from flask import Blueprint, jsonify, request
+from datetime import datetime
 
 config_bp = Blueprint('config', __name__)
 
@@ -132,13 +133,13 @@ def get_crawled_combinations():
         
         cookie_hash = cookie_manager.hash_cookie(cookie_string)
         
-        # 查询今日已爬取的组合
+        # 查询今日已爬取的组合（与记录时一样使用本地日期）
         with db_manager.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 SELECT city, category FROM crawl_combinations 
-                WHERE cookie_hash = ? AND crawl_date = DATE('now')
-            ''', (cookie_hash,))
+                WHERE cookie_hash = ? AND crawl_date = ?
+            ''', (cookie_hash, datetime.now().date()))
             
             combinations = [{'city': row[0], 'category': row[1]} for row in cursor.fetchall()]
         
@@ -2,11 +2,12 @@
 爬虫相关API端点
 """
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 import json
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta
 import hashlib
+from backend.core.task_queue import IdempotencyConflict
 
 crawler_bp = Blueprint('crawler', __name__)
 
@@ -133,6 +134,38 @@ def start_crawl():
                     category_names.append(name)
                     break
         
+        # 幂等键：请求头优先，其次是请求体。先于缓存、Cookie限制和截止时间检查，
+        # 重试总是拿到第一次请求创建的任务（即使该任务已结束）
+        idempotency_key = request.headers.get('Idempotency-Key') or data.get('idempotency_key')
+        if idempotency_key:
+            record = task_queue.find_idempotent_task(idempotency_key)
+            if record:
+                dedupe_key = task_queue.build_dedupe_key(city, categories, sort_type, start_page, end_page)
+                if record['dedupe_key'] != dedupe_key:
+                    return jsonify({
+                        'success': False,
+                        'error': f'幂等键已用于参数不同的任务: {record["task_id"]}'
+                    }), 422
+                
+                return jsonify({
+                    'success': True,
+                    'data': {
+                        'task_id': record['task_id'],
+                        'city': record['city'],
+                        'categories': record['categories'],
+                        'start_page': record['start_page'],
+                        'end_page': record['end_page'],
+                        'range_type': record['range_type'],
+                        'sort_type': sort_type,
+                        'coalesced': True,
+                        'idempotent_replay': True,  # 幂等键重试，返回的是原任务
+                        'status': record['status'],
+                        'output_file': record['output_file'],
+                        'total_shops': record['total_shops'],
+                        'created_at': record['created_at']
+                    }
+                })
+        
         # 验证Cookie格式
         is_valid, message = cookie_manager.validate_cookie_format(cookie_string)
         if not is_valid:
@@ -159,31 +192,114 @@ def start_crawl():
                 'error_messages': error_messages
             }), 400
         
-        # 创建任务（传递城市代码和品类ID给爬虫，传递中文名给数据库）
-        task_id = task_queue.add_task(
-            city=city,  # 城市代码，如 'xian'
-            city_name=city_name,  # 城市中文名，如 '西安'
-            categories=categories,  # 品类ID列表，如 ['g34351']
-            category_names=category_names,  # 品类中文名列表，如 ['地方菜系']
-            start_page=start_page,
-            end_page=end_page,
-            range_type=range_type,
-            sort_type=sort_type,  # 添加排序参数
-            cookie_string=cookie_string,
-            priority=1
+        # 检查结果缓存：整个范围都新鲜时直接返回，否则只爬取过期或缺失的页
+        use_cache = data.get('use_cache', True) is not False
+        cache_plan = None
+        if use_cache and start_page and task_queue.page_cache:
+            cache_plan = task_queue.page_cache.plan_range(city, categories, sort_type, start_page, end_page)
+            
+            if cache_plan['fully_cached']:
+                cached_task = task_queue.complete_from_cache(
+                    city=city,
+                    city_name=city_name,
+                    categories=categories,
+                    category_names=category_names,
+                    start_page=start_page,
+                    end_page=end_page,
+                    range_type=range_type,
+                    sort_type=sort_type,
+                    cookie_string=cookie_string,
+                    idempotency_key=idempotency_key,
+                    cutoff=cache_plan['cutoff']
+                )
+                if cached_task:
+                    return jsonify({
+                        'success': True,
+                        'data': {
+                            'task_id': cached_task['task_id'],
+                            'city': city_name,
+                            'categories': category_names,
+                            'start_page': start_page,
+                            'end_page': end_page,
+                            'range_type': range_type,
+                            'sort_type': sort_type,
+                            'coalesced': False,
+                            'from_cache': True,
+                            'cache': {
+                                'cached_pages': cache_plan['cached_pages'],
+                                'pages_to_crawl': cache_plan['missing_pages']
+                            },
+                            'output_file': cached_task['output_file'],
+                            'total_shops': cached_task['total_shops'],
+                            'estimated_time': 0,
+                            'created_at': datetime.now().isoformat()
+                        }
+                    })
+                
+                # 计划之后有页过期或被清理：按最新的缓存情况提交任务
+                cache_plan = task_queue.page_cache.plan_range(city, categories, sort_type, start_page, end_page)
+        
+        # 基于历史耗时统计预测任务耗时和排队等待时间
+        estimated_seconds = task_queue.estimate_task_seconds(
+            city, categories, start_page, end_page,
+            cache_plan['cached_pages'] if cache_plan else None
         )
+        estimated_wait_seconds = task_queue.estimate_queue_wait_seconds()
+        estimated_finish_at = datetime.now() + timedelta(seconds=estimated_wait_seconds + estimated_seconds)
         
-        # 创建任务数据记录
-        task_data = {
-            'task_id': task_id,
-            'city': city,
-            'categories': categories,
-            'cookie_string': cookie_string,
-            'start_page': start_page,
-            'end_page': end_page,
-            'range_type': range_type,
-            'created_at': datetime.now().isoformat()
-        }
+        # 准入控制：预计无法在操作员给定的截止时间前完成时拒绝提交
+        deadline, deadline_error = _parse_deadline(data)
+        if deadline_error:
+            return jsonify({
+                'success': False,
+                'error': deadline_error
+            }), 400
+        
+        if deadline and estimated_finish_at > deadline:
+            return jsonify({
+                'success': False,
+                'error': f'预计无法在截止时间前完成（预计完成时间 {estimated_finish_at.strftime("%Y-%m-%d %H:%M")}）',
+                'estimate': {
+                    'estimated_time': round(estimated_seconds / 60, 1),
+                    'estimated_wait': round(estimated_wait_seconds / 60, 1),
+                    'estimated_finish_at': estimated_finish_at.isoformat(),
+                    'deadline': deadline.isoformat()
+                }
+            }), 409
+        
+        # 提交人和优先级，用于公平分享调度
+        from config.crawler_config import SCHEDULER_CONFIG
+        submitter = request.headers.get('X-Submitter') or data.get('submitter') or request.remote_addr
+        try:
+            priority = int(data.get('priority', 1))
+        except (ValueError, TypeError):
+            priority = 1
+        priority = max(0, min(priority, SCHEDULER_CONFIG['MAX_PRIORITY']))
+        
+        # 创建任务（传递城市代码和品类ID给爬虫，传递中文名给数据库）
+        # 相同参数的任务正在等待或执行时，直接复用该任务
+        # 幂等键在上面的检查之后被并发的请求占用时，同样按参数是否一致处理
+        try:
+            task_id, coalesced = task_queue.submit_task(
+                city=city,  # 城市代码，如 'xian'
+                city_name=city_name,  # 城市中文名，如 '西安'
+                categories=categories,  # 品类ID列表，如 ['g34351']
+                category_names=category_names,  # 品类中文名列表，如 ['地方菜系']
+                start_page=start_page,
+                end_page=end_page,
+                range_type=range_type,
+                sort_type=sort_type,  # 添加排序参数
+                cookie_string=cookie_string,
+                priority=priority,
+                idempotency_key=idempotency_key,
+                use_cache=use_cache,
+                submitter=submitter
+            )
+        except IdempotencyConflict as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 422
         
         if not task_id:
             return jsonify({
@@ -191,9 +307,10 @@ def start_crawl():
                 'error': '创建任务失败'
             }), 500
         
-        # 记录Cookie使用
-        cookie_hash = cookie_manager.hash_cookie(cookie_string)
-        cookie_manager.db_manager.record_cookie_usage(cookie_hash)
+        # 记录Cookie使用（复用已有任务时不重复计数）
+        if not coalesced:
+            cookie_hash = cookie_manager.hash_cookie(cookie_string)
+            cookie_manager.db_manager.record_cookie_usage(cookie_hash)
         
         return jsonify({
             'success': True,
@@ -204,7 +321,16 @@ def start_crawl():
                 'start_page': start_page,
                 'end_page': end_page,
                 'range_type': range_type,
-                'estimated_time': len(category_names) * (end_page - (start_page or 1) + 1) * 0.5 if start_page else len(category_names) * end_page * 0.5,  # 估算时间(分钟)
+                'sort_type': sort_type,
+                'coalesced': coalesced,  # 是否合并到了已有的相同任务
+                'from_cache': False,
+                'cache': {
+                    'cached_pages': cache_plan['cached_pages'],
+                    'pages_to_crawl': cache_plan['missing_pages']
+                } if cache_plan else None,
+                'estimated_time': round(estimated_seconds / 60, 1),  # 预计执行时间(分钟)
+                'estimated_wait': round(estimated_wait_seconds / 60, 1),  # 预计排队时间(分钟)
+                'estimated_finish_at': estimated_finish_at.isoformat(),
                 'created_at': datetime.now().isoformat()
             }
         })
@@ -215,6 +341,21 @@ def start_crawl():
             'error': f'启动爬取任务失败: {str(e)}'
         }), 500
 
+def _parse_deadline(data):
+    """解析截止时间参数：deadline_minutes(分钟数) 或 deadline(ISO时间)，返回 (截止时间, 错误信息)"""
+    try:
+        if data.get('deadline_minutes') is not None:
+            return datetime.now() + timedelta(minutes=float(data['deadline_minutes'])), None
+        if data.get('deadline'):
+            deadline = datetime.fromisoformat(data['deadline'])
+            if deadline.tzinfo is not None:
+                # 带时区的时间（如 +08:00、Z）换算为本地时间，和其他时间一样不带时区
+                deadline = deadline.astimezone().replace(tzinfo=None)
+            return deadline, None
+    except (ValueError, TypeError, OverflowError):
+        return None, '截止时间参数无效'
+    return None, None
+
 @crawler_bp.route('/status/<task_id>')
 def get_task_status(task_id):
     """获取任务状态"""
@@ -238,6 +379,124 @@ def get_task_status(task_id):
             'error': f'获取任务状态失败: {str(e)}'
         }), 500
 
+MAX_BATCH_STATUS_IDS = 200
+
+@crawler_bp.route('/status/batch', methods=['POST'])
+def get_task_statuses():
+    """
+    批量获取任务状态
+    
+    请求体: {"task_ids": [...], "active": true, "since_version": 0}
+    只返回since_version之后变化的任务，客户端保存返回的version用于下次查询。
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        task_ids = data.get('task_ids') or []
+        active = bool(data.get('active', False))
+        
+        if not isinstance(task_ids, list) or not all(isinstance(task_id, str) for task_id in task_ids):
+            return jsonify({
+                'success': False,
+                'error': 'task_ids必须是任务ID字符串列表'
+            }), 400
+        
+        if len(task_ids) > MAX_BATCH_STATUS_IDS:
+            return jsonify({
+                'success': False,
+                'error': f'一次最多查询{MAX_BATCH_STATUS_IDS}个任务'
+            }), 400
+        
+        if not task_ids and not active:
+            return jsonify({
+                'success': False,
+                'error': '请提供task_ids或设置active=true'
+            }), 400
+        
+        try:
+            since_version = max(0, int(data.get('since_version') or 0))
+        except (TypeError, ValueError):
+            return jsonify({
+                'success': False,
+                'error': 'since_version参数无效'
+            }), 400
+        
+        result = task_queue.get_task_statuses(task_ids, active=active, since_version=since_version)
+        
+        return jsonify({
+            'success': True,
+            'data': result
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'批量获取任务状态失败: {str(e)}'
+        }), 500
+
+def _format_sse(event: dict) -> str:
+    """把任务事件编码为SSE消息"""
+    data = json.dumps(event, ensure_ascii=False)
+    return f"id: {event['event_id']}\nevent: status\ndata: {data}\n\n"
+
+@crawler_bp.route('/events/<task_id>')
+def stream_task_events(task_id):
+    """以Server-Sent Events推送任务状态事件，支持Last-Event-ID断线续传"""
+    from config.crawler_config import TASK_EVENTS_CONFIG
+    
+    task_events = task_queue.task_events
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id') or 0
+    try:
+        last_event_id = int(last_event_id)
+    except (TypeError, ValueError):
+        last_event_id = 0
+    
+    # 事件缓冲区已回收（任务早已结束）时，只推送一次最终状态
+    final_status = None
+    if not task_events.has_task(task_id):
+        final_status = task_queue.get_task_status(task_id)
+        if not final_status:
+            return jsonify({
+                'success': False,
+                'error': '任务不存在'
+            }), 404
+        if final_status['status'] not in ('completed', 'failed', 'cancelled'):
+            final_status = None
+    
+    keepalive_seconds = TASK_EVENTS_CONFIG.get('KEEPALIVE_SECONDS', 15)
+    max_stream_seconds = TASK_EVENTS_CONFIG.get('MAX_STREAM_SECONDS', 300)
+    
+    def generate():
+        yield 'retry: 3000\n\n'
+        
+        if final_status:
+            yield _format_sse(dict(final_status, event_id=last_event_id + 1))
+            yield 'event: end\ndata: {}\n\n'
+            return
+        
+        after_id = last_event_id
+        started_at = datetime.now()
+        while (datetime.now() - started_at).total_seconds() < max_stream_seconds:
+            events, closed = task_events.wait_for_events(task_id, after_id, keepalive_seconds)
+            for event in events:
+                yield _format_sse(event)
+                after_id = event['event_id']
+            
+            if closed:
+                yield 'event: end\ndata: {}\n\n'
+                return
+            
+            if not events:
+                yield ': keepalive\n\n'
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
 @crawler_bp.route('/cancel/<task_id>', methods=['POST'])
 def cancel_task(task_id):
     """取消任务"""
@@ -261,31 +520,47 @@ def cancel_task(task_id):
             'error': f'取消任务失败: {str(e)}'
         }), 500
 
+# 历史记录每页最多返回的条数
+MAX_HISTORY_PER_PAGE = 100
+
 @crawler_bp.route('/history')
 def get_crawl_history():
-    """获取爬取历史"""
+    """
+    获取爬取历史
+    
+    按创建时间倒序游标分页：第一页不带cursor，之后把返回的next_cursor原样传回；
+    next_cursor为null表示没有更多记录。可按city、category、status、cookie_hash筛选。
+    旧的page参数仍然可用（按OFFSET翻页，页数越深越慢）。
+    """
     try:
+        per_page = min(max(request.args.get('per_page', 20, type=int), 1), MAX_HISTORY_PER_PAGE)
+        cursor = request.args.get('cursor') or None
+        filters = {key: request.args.get(key) or None for key in ('city', 'category', 'status', 'cookie_hash')}
         page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 20, type=int)
-        
-        offset = (page - 1) * per_page
-        history = db_manager.get_crawl_history(limit=per_page, offset=offset)
         
-        # 转换数据格式
-        for record in history:
-            if record.get('categories') and isinstance(record['categories'], str):
-                record['categories'] = json.loads(record['categories'])
+        if page > 1 and not cursor and not any(filters.values()):
+            history = db_manager.get_crawl_history(limit=per_page, offset=(page - 1) * per_page)
+            result = {'records': history, 'next_cursor': None,
+                      'total': db_manager.get_crawl_stats().get('total_tasks', 0)}
+        else:
+            result = db_manager.get_crawl_history_page(limit=per_page, cursor=cursor, **filters)
         
         return jsonify({
             'success': True,
             'data': {
-                'records': history,
+                'records': result['records'],
                 'page': page,
                 'per_page': per_page,
-                'total': len(history)  # 简化处理，实际应该查询总数
+                'next_cursor': result['next_cursor'],
+                'total': result['total']
             }
         })
         
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
@@ -393,6 +668,23 @@ def get_queue_status():
             'error': f'获取队列状态失败: {str(e)}'
         }), 500
 
+@crawler_bp.route('/scheduler-stats')
+def get_scheduler_stats():
+    """获取调度统计（各租户队列深度和等待时间分位数）"""
+    try:
+        stats = task_queue.get_scheduler_stats()
+        
+        return jsonify({
+            'success': True,
+            'data': stats
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'获取调度统计失败: {str(e)}'
+        }), 500
+
 @crawler_bp.route('/restart-worker', methods=['POST'])
 def restart_worker():
     """重启任务队列工作线程"""
@@ -0,0 +1,111 @@
+"""
+商铺API端点 - 查找商铺、查看单个商铺的变化历史、时间窗口内的涨跌榜
+"""
+
+from flask import Blueprint, request, jsonify
+
+shop_bp = Blueprint('shop', __name__)
+
+# 这些将在app.py中注入
+shop_store = None
+
+MAX_SHOPS_PER_PAGE = 100
+MAX_WINDOW_DAYS = 365
+
+@shop_bp.route('')
+def find_shops():
+    """按城市、品类、店名关键字查找商铺（最近观测到的在前）"""
+    try:
+        limit = min(max(request.args.get('limit', 50, type=int), 1), MAX_SHOPS_PER_PAGE)
+        shops = shop_store.find_shops(city=request.args.get('city') or None,
+                                      category=request.args.get('category') or None,
+                                      name=request.args.get('name') or None,
+                                      limit=limit)
+        return jsonify({
+            'success': True,
+            'data': shops
+        })
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'查找商铺失败: {str(e)}'
+        }), 500
+
+@shop_bp.route('/<int:shop_id>')
+def get_shop(shop_id):
+    """商铺最新数据"""
+    shop = shop_store.get_shop(shop_id)
+    if not shop:
+        return jsonify({
+            'success': False,
+            'error': '商铺不存在'
+        }), 404
+
+    return jsonify({
+        'success': True,
+        'data': shop
+    })
+
+@shop_bp.route('/<int:shop_id>/history')
+def get_shop_history(shop_id):
+    """
+    商铺的名次、人均、评价数、评分变化历史
+
+    参数: days（只看最近N天，另带窗口开始前的值）、category、sort_type
+    只返回有变化的时间点，每个点的changed列出相对上一个点变化的字段。
+    """
+    try:
+        days = request.args.get('days', type=int)
+        if days is not None:
+            days = min(max(days, 1), MAX_WINDOW_DAYS)
+        history = shop_store.get_history(shop_id, days=days,
+                                         category=request.args.get('category') or None,
+                                         sort_type=request.args.get('sort_type') or None)
+        return jsonify({
+            'success': True,
+            'data': {
+                'shop_id': shop_id,
+                'series': history
+            }
+        })
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'获取商铺历史失败: {str(e)}'
+        }), 500
+
+@shop_bp.route('/movers')
+def get_top_movers():
+    """
+    时间窗口内变化最大的商铺
+
+    参数: metric（review_count/rating/avg_price/rank，默认review_count）、days（默认7）、
+    direction（up/down）、city、category、sort_type、limit
+    """
+    try:
+        days = min(max(request.args.get('days', 7, type=int), 1), MAX_WINDOW_DAYS)
+        limit = min(max(request.args.get('limit', 20, type=int), 1), MAX_SHOPS_PER_PAGE)
+        movers = shop_store.get_top_movers(metric=request.args.get('metric', 'review_count'),
+                                           days=days,
+                                           city=request.args.get('city') or None,
+                                           category=request.args.get('category') or None,
+                                           sort_type=request.args.get('sort_type') or None,
+                                           direction=request.args.get('direction', 'up'),
+                                           limit=limit)
+        return jsonify({
+            'success': True,
+            'data': movers
+        })
+
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'获取涨跌榜失败: {str(e)}'
+        }), 500
@@ -0,0 +1,140 @@
+"""
+远程工作节点API端点 - 租约领取、心跳续约、结果回传
+"""
+
+from flask import Blueprint, request, jsonify
+import hmac
+
+worker_bp = Blueprint('worker', __name__)
+
+# 这些将在app.py中注入
+lease_manager = None
+auth_token = ''
+
+@worker_bp.before_request
+def check_worker_token():
+    """校验工作节点令牌（主服务在remote/hybrid模式下必须配置令牌，本地测试工具可以不配置）"""
+    if not auth_token:
+        return None
+    token = request.headers.get('X-Worker-Token', '')
+    if not hmac.compare_digest(token, auth_token):
+        return jsonify({
+            'success': False,
+            'error': '工作节点令牌无效'
+        }), 401
+    return None
+
+def _lease_lost():
+    """租约不存在或已过期"""
+    return jsonify({
+        'success': False,
+        'error': '租约不存在或已过期'
+    }), 410
+
+@worker_bp.route('/lease', methods=['POST'])
+def acquire_lease():
+    """领取一个任务"""
+    try:
+        data = request.get_json() or {}
+        worker_id = data.get('worker_id')
+        if not worker_id:
+            return jsonify({
+                'success': False,
+                'error': '缺少必要参数: worker_id'
+            }), 400
+
+        lease = lease_manager.acquire(worker_id)
+
+        return jsonify({
+            'success': True,
+            'data': lease,
+            'poll_interval_seconds': lease_manager.poll_interval_seconds
+        })
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'领取任务失败: {str(e)}'
+        }), 500
+
+@worker_bp.route('/heartbeat', methods=['POST'])
+def heartbeat():
+    """续约并上报缓冲的状态事件和阶段耗时"""
+    try:
+        data = request.get_json() or {}
+        result = lease_manager.renew(data.get('lease_id'), data.get('events'), data.get('phases'))
+        if not result:
+            return _lease_lost()
+
+        return jsonify({
+            'success': True,
+            'data': result
+        })
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'续约失败: {str(e)}'
+        }), 500
+
+@worker_bp.route('/results', methods=['POST'])
+def submit_results():
+    """回传一批页面结果"""
+    try:
+        data = request.get_json() or {}
+        accepted = lease_manager.submit_results(data.get('lease_id'), data.get('pages') or [])
+        if accepted is None:
+            return _lease_lost()
+
+        return jsonify({
+            'success': True,
+            'data': {'accepted_shops': accepted}
+        })
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'回传结果失败: {str(e)}'
+        }), 500
+
+@worker_bp.route('/complete', methods=['POST'])
+def complete_task():
+    """报告任务结束"""
+    try:
+        data = request.get_json() or {}
+        completed = lease_manager.complete(
+            data.get('lease_id'),
+            bool(data.get('success')),
+            stats=data.get('stats'),
+            error=data.get('error')
+        )
+        if not completed:
+            return _lease_lost()
+
+        return jsonify({
+            'success': True,
+            'message': '任务已完成'
+        })
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'完成任务失败: {str(e)}'
+        }), 500
+
+@worker_bp.route('/leases')
+def list_leases():
+    """查看当前有效租约"""
+    try:
+        lease_manager.reap_expired()
+
+        return jsonify({
+            'success': True,
+            'data': lease_manager.get_leases()
+        })
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'获取租约列表失败: {str(e)}'
+        }), 500
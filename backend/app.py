@@ -2,7 +2,7 @@
 Flask主应用入口
 """
 
-from flask import Flask, render_template, jsonify, request, send_from_directory
+from flask import Flask, Response, render_template, jsonify, request, send_from_directory
 from flask_cors import CORS
 import os
 import logging
@@ -15,10 +15,15 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from config.crawler_config import WEB_CONFIG, FILE_PATHS, DATABASE_CONFIG
+from config.crawler_config import WEB_CONFIG, FILE_PATHS, DATABASE_CONFIG, WORKER_CONFIG, PROFILING_CONFIG, \
+    DASHBOARD_CONFIG, MAINTENANCE_CONFIG
 from backend.models.database import DatabaseManager
 from backend.models.cookie_manager import CookieManager
 from backend.core.task_queue import TaskQueue
+from backend.core.lease_manager import LeaseManager
+from backend.core.db_maintenance import DatabaseMaintenance
+from backend.core.shop_store import ShopStore
+from backend.core.metrics import REGISTRY as metrics_registry
 # 这些蓝图将通过模块导入获取
 
 # 创建Flask应用
@@ -45,16 +50,29 @@ logger = logging.getLogger(__name__)
 for path in FILE_PATHS.values():
     os.makedirs(path, exist_ok=True)
 
+# 远程工作节点可以领取任务（包含Cookie）并回传结果，开放工作节点API时必须配置令牌
+REMOTE_WORKERS_ENABLED = WORKER_CONFIG['MODE'] in ('remote', 'hybrid')
+if REMOTE_WORKERS_ENABLED and not WORKER_CONFIG['AUTH_TOKEN']:
+    raise RuntimeError(f"工作模式为 {WORKER_CONFIG['MODE']} 时必须设置环境变量 CRAWLER_WORKER_TOKEN")
+
 # 初始化组件
 db_manager = DatabaseManager(DATABASE_CONFIG['DB_PATH'])
-cookie_manager = CookieManager(FILE_PATHS['COOKIES_DIR'], db_manager)
+cookie_manager = CookieManager(FILE_PATHS['COOKIES_DIR'], db_manager,
+                               stats_ttl_seconds=DASHBOARD_CONFIG['COOKIE_STATS_TTL_SECONDS'])
 task_queue = TaskQueue(db_manager, cookie_manager)  # 传入CookieManager
+lease_manager = LeaseManager(task_queue)  # 远程工作节点租约
+db_maintenance = DatabaseMaintenance(db_manager, page_cache=task_queue.page_cache)  # 过期历史归档和空间回收
+
+# 启动任务队列工作线程（remote模式下任务全部交给远程工作节点）
+if WORKER_CONFIG['MODE'] in ('local', 'hybrid'):
+    task_queue.start_worker()
 
-# 启动任务队列工作线程
-task_queue.start_worker()
+if MAINTENANCE_CONFIG['ENABLED']:
+    db_maintenance.start()
 
 # 导入API蓝图并注入依赖
-from backend.api import crawler_api, config_api, upload_api, gaode_api, third_party_api
+from backend.api import crawler_api, config_api, upload_api, gaode_api, third_party_api, worker_api, admin_api, \
+    shop_api
 
 crawler_api.db_manager = db_manager
 crawler_api.cookie_manager = cookie_manager  
@@ -65,12 +83,27 @@ config_api.cookie_manager = cookie_manager
 
 upload_api.db_manager = db_manager
 
+worker_api.lease_manager = lease_manager
+worker_api.auth_token = WORKER_CONFIG['AUTH_TOKEN']
+
+admin_api.profiler = task_queue.profiler
+admin_api.task_queue = task_queue
+admin_api.maintenance = db_maintenance
+admin_api.auth_token = PROFILING_CONFIG['AUTH_TOKEN']
+
+# 关闭写入商铺数据时仍可查询已有数据
+shop_api.shop_store = task_queue.shop_store or ShopStore(db_manager)
+
 # 注册蓝图
 app.register_blueprint(crawler_api.crawler_bp, url_prefix='/api/crawler')
 app.register_blueprint(config_api.config_bp, url_prefix='/api/config')
 app.register_blueprint(upload_api.upload_bp, url_prefix='/api/upload')
 app.register_blueprint(gaode_api.gaode_bp, url_prefix='/api/gaode')
 app.register_blueprint(third_party_api.third_party_bp, url_prefix='/api/third-party')
+if REMOTE_WORKERS_ENABLED:
+    app.register_blueprint(worker_api.worker_bp, url_prefix='/api/worker')
+app.register_blueprint(admin_api.admin_bp, url_prefix='/api/admin')
+app.register_blueprint(shop_api.shop_bp, url_prefix='/api/shops')
 
 @app.route('/')
 def index():
@@ -90,9 +123,14 @@ def api_status():
         }
     })
 
+@app.route('/metrics')
+def metrics():
+    """Prometheus文本格式指标（只格式化内存中的计数，不查询数据库）"""
+    return Response(metrics_registry.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
 @app.route('/api/stats/dashboard')
 def dashboard_stats():
-    """仪表板统计信息"""
+    """仪表板统计信息（计数表按主键读取，Cookie统计走缓存，不随历史数据量增长）"""
     try:
         crawl_stats = db_manager.get_crawl_stats()
         cookie_stats = cookie_manager.get_cookie_stats()
@@ -0,0 +1,202 @@
+"""
+爬虫日志后端 - 所有爬虫实例共用一个异步队列日志后端，按任务注入上下文
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+
+from .metrics import LOG_DROPPED
+
+LOGGER_NAME = 'web_crawler'
+EVENT_LOGGER_NAME = 'web_crawler_events'
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(task_tag)s%(message)s'
+
+class DailyFileHandler(logging.FileHandler):
+    """按日期写入 {prefix}_YYYYMMDD{extension}，跨天时自动切换文件"""
+
+    def __init__(self, log_dir: str, prefix: str = 'crawler', extension: str = '.log'):
+        self.log_dir = log_dir
+        self.prefix = prefix
+        self.extension = extension
+        self.current_date = datetime.now().strftime('%Y%m%d')
+        os.makedirs(log_dir, exist_ok=True)
+        super().__init__(self._path(self.current_date), encoding='utf-8', delay=True)
+
+    def _path(self, date_str: str) -> str:
+        return os.path.join(self.log_dir, f'{self.prefix}_{date_str}{self.extension}')
+
+    def emit(self, record):
+        date_str = datetime.fromtimestamp(record.created).strftime('%Y%m%d')
+        if date_str != self.current_date:
+            self.acquire()
+            try:
+                if self.stream:
+                    self.stream.close()
+                    self.stream = None
+                self.current_date = date_str
+                self.baseFilename = os.path.abspath(self._path(date_str))
+            finally:
+                self.release()
+        super().emit(record)
+
+class JsonLinesFormatter(logging.Formatter):
+    """结构化事件：每条记录一行JSON（在日志线程中序列化，不占用爬虫线程）"""
+
+    def format(self, record):
+        event = {'ts': round(record.created, 3)}
+        event.update(record.event)
+        return json.dumps(event, ensure_ascii=False, separators=(',', ':'))
+
+class TaskContextFilter(logging.Filter):
+    """保证每条记录都有task_id/task_tag字段（非任务日志为空）"""
+
+    def filter(self, record):
+        task_id = getattr(record, 'task_id', None)
+        if not hasattr(record, 'task_tag'):
+            record.task_tag = f'[T:{task_id[:8]}] ' if task_id else ''
+        if task_id is None:
+            record.task_id = ''
+        return True
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """队列满时丢弃日志并计数，不阻塞爬虫线程"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            LOG_DROPPED.inc()
+
+class TaskLoggerAdapter(logging.LoggerAdapter):
+    """为每条日志注入任务上下文"""
+
+    def process(self, msg, kwargs):
+        extra = dict(self.extra)
+        extra.update(kwargs.get('extra') or {})
+        kwargs['extra'] = extra
+        return msg, kwargs
+
+_backend = None
+_backend_lock = threading.Lock()
+
+def configure_crawler_logging(log_dir: str = None, console: bool = None, queue_size: int = None) -> Dict:
+    """
+    初始化共用的日志后端（重复调用直接返回已有后端）
+
+    爬虫线程只把记录放入队列，由QueueListener线程统一格式化并写入控制台和按日文件。
+    """
+    global _backend
+    with _backend_lock:
+        if _backend is not None:
+            return _backend
+
+        from config.crawler_config import FILE_PATHS, CRAWLER_LOG_CONFIG
+        log_dir = log_dir or FILE_PATHS['LOGS_DIR']
+        console = CRAWLER_LOG_CONFIG.get('CONSOLE', True) if console is None else console
+        queue_size = queue_size or CRAWLER_LOG_CONFIG.get('QUEUE_SIZE', 10000)
+
+        formatter = logging.Formatter(LOG_FORMAT)
+        handlers = []
+        file_handler = DailyFileHandler(log_dir)
+        handlers.append(file_handler)
+        if console:
+            handlers.append(logging.StreamHandler())
+        for handler in handlers:
+            handler.setLevel(logging.INFO)
+            handler.setFormatter(formatter)
+            handler.addFilter(TaskContextFilter())
+
+        log_queue = queue.Queue(maxsize=queue_size)
+        queue_handler = DroppingQueueHandler(log_queue)
+
+        logger = logging.getLogger(LOGGER_NAME)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False  # 已有专用输出，不再重复写入app.log
+        logger.addHandler(queue_handler)
+
+        # 结构化事件日志 events_YYYYMMDD.jsonl，与文本日志共用同一个队列线程
+        event_logger = None
+        if CRAWLER_LOG_CONFIG.get('EVENT_LOG', True):
+            event_handler = DailyFileHandler(log_dir, prefix='events', extension='.jsonl')
+            event_handler.setFormatter(JsonLinesFormatter())
+            event_handler.addFilter(lambda record: hasattr(record, 'event'))
+            for handler in handlers:
+                handler.addFilter(lambda record: not hasattr(record, 'event'))
+            handlers.append(event_handler)
+
+            event_logger = logging.getLogger(EVENT_LOGGER_NAME)
+            event_logger.setLevel(logging.INFO)
+            event_logger.propagate = False
+            event_logger.addHandler(queue_handler)
+
+        listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        listener.start()
+
+        _backend = {
+            'logger': logger,
+            'event_logger': event_logger,
+            'queue_handler': queue_handler,
+            'listener': listener,
+            'handlers': handlers,
+            'log_dir': log_dir
+        }
+        return _backend
+
+def get_task_logger(task_id: Optional[str] = None) -> TaskLoggerAdapter:
+    """获取带任务上下文的日志对象（不创建新的logger或handler）"""
+    backend = configure_crawler_logging()
+    return TaskLoggerAdapter(backend['logger'], {'task_id': task_id})
+
+def log_event(task_id: Optional[str], **fields):
+    """写入一条结构化事件（值为None的字段省略）"""
+    backend = configure_crawler_logging()
+    event_logger = backend['event_logger']
+    if event_logger is None:
+        return
+    event = {'task_id': task_id}
+    event.update((key, value) for key, value in fields.items() if value is not None)
+    event_logger.info('', extra={'event': event})
+
+def event_log_enabled() -> bool:
+    """是否写入结构化事件日志（只为事件日志准备的数据在关闭时不必计算）"""
+    return configure_crawler_logging()['event_logger'] is not None
+
+def shutdown_crawler_logging():
+    """处理完队列中剩余的日志并关闭文件"""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            return
+        _backend['listener'].stop()
+        _backend['logger'].removeHandler(_backend['queue_handler'])
+        if _backend['event_logger']:
+            _backend['event_logger'].removeHandler(_backend['queue_handler'])
+        for handler in _backend['handlers']:
+            handler.close()
+        _backend = None
+
+def get_logging_stats() -> Dict:
+    """日志后端状态：队列积压、丢弃数、logger/handler数量"""
+    with _backend_lock:
+        backend = _backend
+    return {
+        'configured': backend is not None,
+        'queue_size': backend['queue_handler'].queue.qsize() if backend else 0,
+        'dropped': backend['queue_handler'].dropped if backend else 0,
+        'handlers': len(backend['handlers']) if backend else 0,
+        'loggers': len(logging.Logger.manager.loggerDict)
+    }
+
+atexit.register(shutdown_crawler_logging)
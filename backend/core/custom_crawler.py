@@ -16,23 +16,135 @@ from playwright.sync_api import sync_playwright
 import logging
 from fake_useragent import UserAgent
 from .anti_detection_config import AntiDetectionConfig
+from .status_pipeline import StatusCoalescer
+from .crawler_logging import get_task_logger, log_event, event_log_enabled
+from .span_tracer import SpanTracer, traced
+from .metrics import (CRAWLER_PAGES, CRAWLER_SHOPS, CRAWLER_CAPTCHAS, CRAWLER_GOTO_SECONDS,
+                      CRAWLER_PARSE_SECONDS, CRAWLER_PHASE_SECONDS, CACHE_LOOKUPS)
+
+# 城市配置
+CITIES = {
+    '长沙市': 'changsha',
+    '深圳市': 'shenzhen',
+    '苏州市': 'suzhou',
+    '南宁市': 'nanning',
+    '上海市': 'shanghai',
+    '广州市': 'guangzhou',
+    '杭州市': 'hangzhou',
+    '厦门市': 'xiamen',
+    '武汉市': 'wuhan',
+    '西安市': 'xian',
+    '北京市':'beijing'
+}
+
+# 品类配置（已验证的品类ID）
+CATEGORIES = {
+    '烤肉': 'g34303',
+    '面包蛋糕甜品': "g117",
+    '日式料理': 'g113',
+    '川菜': 'g102',
+    '水果生鲜': 'g2714',
+    '江浙菜': 'g101',
+    '小吃快餐': 'g112',
+    '粤菜': 'g103',
+    '火锅': 'g110',
+    '烧烤烤串': 'g508',
+    '小龙虾': 'g219',  # 修正ID从g1204到g219
+    '咖啡': 'g132',
+    '饮品': 'g34236',
+    '地方菜系': 'g34351',
+    # 从页面HTML中新增的品类
+    '自助餐': 'g111',
+    '特色菜': 'g34284',
+    '食品滋补': 'g33759',
+    '西餐': 'g116',
+    '韩式料理': 'g114',
+    '面馆': 'g215',
+    '湘菜': 'g104',
+    '陕菜': 'g34234',
+    '鱼鲜海鲜': 'g251',
+    '东北菜': 'g106',
+    '新疆菜': 'g3243',
+    '农家菜': 'g25474',
+    '北京菜': 'g311',
+    '家常菜': 'g1783',
+    '私房菜': 'g1338',
+    '螺蛳粉': 'g32725',
+    '创意菜': 'g250',
+    '东南亚菜': 'g115',
+    '中东菜': 'g234',
+    '非洲菜': 'g2797',
+    '其他美食': 'g118'
+}
+
+def resolve_task_names(city_code, category_ids, cities=None, categories=None):
+    """把城市代码和品类ID转换为中文名，不支持时抛出异常（远程工作节点完成的任务也在主服务用它命名）"""
+    cities = cities or CITIES
+    categories = categories or CATEGORIES
+    city_name = None
+    for name, code in cities.items():
+        if code == city_code:
+            city_name = name
+            break
+    if not city_name:
+        raise Exception(f"不支持的城市代码: {city_code}")
+
+    category_names = []
+    for category_id in category_ids:
+        category_name = None
+        for name, cid in categories.items():
+            if cid == category_id:
+                category_name = name
+                break
+        if not category_name:
+            raise Exception(f"不支持的品类ID: {category_id}")
+        category_names.append(category_name)
+
+    return city_name, category_names
+
+# 输出CSV的列（顺序即文件中的列顺序）
+OUTPUT_FIELDS = [
+    'city',
+    'primary_category',
+    'secondary_category',
+    'shop_name',
+    'avg_price',
+    'review_count',  # 新增评价数量字段
+    'rating'         # 新增评分等级字段
+]
 
 class WebCustomCrawler:
     """Web版本的定制化爬虫 - 去除GUI，添加状态回调"""
     
-    def __init__(self, cookie_string, status_callback=None):
+    def __init__(self, cookie_string, status_callback=None, page_cache=None, phase_recorder=None,
+                 page_result_callback=None, save_outputs=True, task_id=None, profiler=None):
         """
         初始化Web爬虫
         Args:
             cookie_string: Cookie字符串
             status_callback: 状态回调函数，用于更新Web界面状态
+            page_cache: 列表页结果缓存(PageResultCache)，命中的页面不再重新爬取
+            phase_recorder: 阶段耗时记录器(ThroughputModel)，用于积累历史耗时统计
+            page_result_callback: 每页结果回调 (category_id, category_name, page_num, shops, from_cache)
+            save_outputs: 是否在本机保存增量CSV（远程工作节点把结果回传给主服务，不需要本地文件）
+            task_id: 任务ID，写入每条日志的上下文
+            profiler: 任务性能剖析器(TaskProfiler)，每页开始时检查是否需要开启/停止剖析
         """
         self.cookie_string = cookie_string
         self.status_callback = status_callback
+        self.page_cache = page_cache
+        self.phase_recorder = phase_recorder
+        self.page_result_callback = page_result_callback
+        self.save_outputs = save_outputs
+        self.task_id = task_id
+        self.profiler = profiler
+        self._city_code = None
+        self.last_saved_file = None
         
         # 统计信息
         self.captcha_count = 0
         self.skipped_pages = 0
+        self.cached_pages = 0
         self.daily_request_count = 0
         self.max_daily_requests = 200
         self.consecutive_failures = 0
@@ -45,99 +157,146 @@ class WebCustomCrawler:
         
         # 设置详细日志
         self._setup_detailed_logging()
+        self.event_log_enabled = event_log_enabled()
+        
+        # 状态更新管道：合并短时间内的普通状态更新
+        self.status_pipeline = StatusCoalescer(self._deliver_status, on_drop=self._log_dropped_status)
+        
+        # 任务耗时追踪：记录各阶段时间跨度，任务结束时写入trace文件
+        from config.crawler_config import TRACE_CONFIG
+        self.tracer = SpanTracer(task_id, enabled=TRACE_CONFIG.get('ENABLED', True),
+                                 max_events=TRACE_CONFIG.get('MAX_EVENTS', 20000))
         
         # 城市配置
-        self.cities = {
-            '长沙市': 'changsha',
-            '深圳市': 'shenzhen',
-            '苏州市': 'suzhou',
-            '南宁市': 'nanning',
-            '上海市': 'shanghai',
-            '广州市': 'guangzhou',
-            '杭州市': 'hangzhou',
-            '厦门市': 'xiamen',
-            '武汉市': 'wuhan',
-            '西安市': 'xian',
-            '北京市':'beijing'
-        }
+        self.cities = dict(CITIES)
         
         # 品类配置（已验证的品类ID）
-        self.categories = {
-            '烤肉': 'g34303',
-            '面包蛋糕甜品': "g117",
-            '日式料理': 'g113',
-            '川菜': 'g102',
-            '水果生鲜': 'g2714',
-            '江浙菜': 'g101',
-            '小吃快餐': 'g112',
-            '粤菜': 'g103',
-            '火锅': 'g110',
-            '烧烤烤串': 'g508',
-            '小龙虾': 'g219',  # 修正ID从g1204到g219
-            '咖啡': 'g132',
-            '饮品': 'g34236',
-            '地方菜系': 'g34351',
-            # 从页面HTML中新增的品类
-            '自助餐': 'g111',
-            '特色菜': 'g34284',
-            '食品滋补': 'g33759',
-            '西餐': 'g116',
-            '韩式料理': 'g114',
-            '面馆': 'g215',
-            '湘菜': 'g104',
-            '陕菜': 'g34234',
-            '鱼鲜海鲜': 'g251',
-            '东北菜': 'g106',
-            '新疆菜': 'g3243',
-            '农家菜': 'g25474',
-            '北京菜': 'g311',
-            '家常菜': 'g1783',
-            '私房菜': 'g1338',
-            '螺蛳粉': 'g32725',
-            '创意菜': 'g250',
-            '东南亚菜': 'g115',
-            '中东菜': 'g234',
-            '非洲菜': 'g2797',
-            '其他美食': 'g118'
-        }
+        self.categories = dict(CATEGORIES)
         
         # 核心字段
-        self.core_fields = [
-            'city',
-            'primary_category',
-            'secondary_category',
-            'shop_name',
-            'avg_price',
-            'review_count',  # 新增评价数量字段
-            'rating'         # 新增评分等级字段
-        ]
+        self.core_fields = list(OUTPUT_FIELDS)
         
         self.all_data = []
 
     def _setup_detailed_logging(self):
-        """设置详细日志系统"""
-        # 创建任务专用logger
-        self.logger = logging.getLogger(f'web_crawler_{id(self)}')
-        if not self.logger.handlers:
-            # 控制台处理器
-            console_handler = logging.StreamHandler()
-            console_handler.setLevel(logging.INFO)
-            formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-            console_handler.setFormatter(formatter)
-            self.logger.addHandler(console_handler)
-            
-            # 文件处理器
-            log_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'data', 'logs')
-            os.makedirs(log_dir, exist_ok=True)
-            log_file = os.path.join(log_dir, f'crawler_{datetime.now().strftime("%Y%m%d")}.log')
-            file_handler = logging.FileHandler(log_file, encoding='utf-8')
-            file_handler.setLevel(logging.INFO)
-            file_handler.setFormatter(formatter)
-            self.logger.addHandler(file_handler)
+        """设置详细日志系统：使用共用的异步日志后端，每条日志带上任务ID"""
+        self.logger = get_task_logger(self.task_id)
+
+    @staticmethod
+    def _response_bytes(response, read_body=True):
+        """
+        页面响应大小：优先取content-length，gzip/分块传输时没有该头，read_body为True时改用响应体长度
+        （需要读取整个响应体，只在写入事件日志时使用）；都取不到时为None
+        """
+        if not response:
+            return None
+        content_length = response.headers.get('content-length')
+        if content_length and content_length.isdigit():
+            return int(content_length)
+        if not read_body:
+            return None
+        try:
+            return len(response.body())
+        except Exception:
+            # 重定向等响应没有可读取的响应体
+            return None
+
+    def close(self):
+        """任务结束时释放资源：补发暂存的状态更新，写入耗时追踪文件"""
+        self.status_pipeline.close()
+        self.write_trace()
+
+    def write_trace(self):
+        """
+        写入本次任务的trace文件，返回文件路径（未启用或没有记录时返回None）
+
+        有输出CSV时写在最后保存的CSV旁边（同名 .trace.json），否则写到TRACE_DIR。
+        """
+        if not self.tracer.enabled or not self.tracer.has_spans():
+            return None
+        
+        from config.crawler_config import TRACE_CONFIG
+        if self.last_saved_file:
+            path = os.path.splitext(self.last_saved_file)[0] + '.trace.json'
+        else:
+            name = self.task_id or self.tracer.started_at.strftime('%Y%m%d_%H%M%S')
+            path = os.path.join(TRACE_CONFIG['TRACE_DIR'], f'trace_{name}.trace.json')
+        
+        try:
+            summary = self.tracer.write(path)
+        except Exception as e:
+            self.logger.warning(f"[TRACE] ⚠️ 写入trace文件失败: {e}")
+            return None
+        
+        self.tracer.enabled = False  # 每个任务只写一次
+        self.logger.info(f"[TRACE] 📈 耗时追踪已保存: {path}")
+        self.logger.info(f"[TRACE] ⏱️ 总耗时: {summary['wall_seconds']:.1f}秒，各阶段自身耗时占比:")
+        for name, phase in summary['phases'].items():
+            self.logger.info(f"[TRACE]   {name}: {phase['self_seconds']:.1f}秒 ({phase['share'] * 100:.1f}%, {phase['count']}次)")
+        self.logger.info(f"[TRACE]   未追踪: {summary['untraced_seconds']:.1f}秒 ({summary['untraced_share'] * 100:.1f}%)")
+        return path
+
+    def _sleep(self, seconds, reason):
+        """有意的等待，统一记录为 sleep:<reason> 跨度，返回实际等待的秒数"""
+        started = time.perf_counter()
+        with self.tracer.span(f'sleep:{reason}', 'sleep', seconds=round(seconds, 2)):
+            time.sleep(seconds)
+        return time.perf_counter() - started
+
+    def resolve_task_names(self, city_code, category_ids):
+        """把城市代码和品类ID转换为中文名，不支持时抛出异常"""
+        return resolve_task_names(city_code, category_ids, self.cities, self.categories)
+
+    def _emit_page_result(self, category_id, category_name, page_num, shops, from_cache=False):
+        """把一页结果交给页面结果回调"""
+        if not self.page_result_callback:
+            return
+        try:
+            self.page_result_callback(category_id, category_name, page_num, shops, from_cache)
+        except Exception as e:
+            self.logger.warning(f"[RESULT] ⚠️ 页面结果回调失败: {e}")
+
+    def _record_phase(self, phase, started_at, category_id=None, page_num=None, rows=None, nbytes=None):
+        """记录一个阶段的耗时，started_at为time.perf_counter()的起始值"""
+        self._record_duration(phase, time.perf_counter() - started_at, category_id, page_num, rows, nbytes)
+
+    def _record_duration(self, phase, seconds, category_id=None, page_num=None, rows=None, nbytes=None):
+        """记录一个阶段的耗时（秒）"""
+        CRAWLER_PHASE_SECONDS.observe(seconds, phase=phase)
+        if phase == 'parse':
+            CRAWLER_PARSE_SECONDS.observe(seconds)
+        
+        # 结构化事件日志（异步写入 events_YYYYMMDD.jsonl）
+        log_event(self.task_id, city=self._city_code, category=category_id, page=page_num, phase=phase,
+                  duration_ms=round(seconds * 1000, 1), rows=rows, bytes=nbytes)
+        
+        if not self.phase_recorder:
+            return
+        try:
+            self.phase_recorder.record(self._city_code, category_id, page_num, phase, seconds)
+        except Exception as e:
+            self.logger.debug(f"[TIMING] 记录阶段耗时失败: {e}")
 
     def _update_status(self, message, progress=None, status_type='info', detailed=False):
-        """更新状态到Web界面，同时记录详细日志"""
+        """更新状态到Web界面，同时记录详细日志（经状态管道合并后投递）"""
+        self.status_pipeline.submit({
+            'message': message,
+            'progress': progress,
+            'type': status_type,
+            'timestamp': datetime.now().isoformat(),
+            'stats': {
+                'captcha_count': self.captcha_count,
+                'skipped_pages': self.skipped_pages,
+                'cached_pages': self.cached_pages,
+                'page_refresh_count': self.page_refresh_count,
+                'ua_change_count': self.ua_change_count
+            }
+        })
+
+    def _deliver_status(self, status_info):
+        """投递合并后的状态：记录日志并发送到Web界面"""
         # 记录详细日志
+        status_type = status_info['type']
         log_level = {
             'info': logging.INFO,
             'warning': logging.WARNING,
@@ -145,22 +304,16 @@ class WebCustomCrawler:
             'success': logging.INFO
         }.get(status_type, logging.INFO)
         
-        self.logger.log(log_level, f"[{status_type.upper()}] {message}")
+        merged = f" (合并{status_info['merged_count']}条)" if status_info.get('merged_count') else ""
+        self.logger.log(log_level, f"[{status_type.upper()}] {status_info['message']}{merged}")
         
         # 发送到Web界面
         if self.status_callback:
-            self.status_callback({
-                'message': message,
-                'progress': progress,
-                'type': status_type,
-                'timestamp': datetime.now().isoformat(),
-                'stats': {
-                    'captcha_count': self.captcha_count,
-                    'skipped_pages': self.skipped_pages,
-                    'page_refresh_count': self.page_refresh_count,
-                    'ua_change_count': self.ua_change_count
-                }
-            })
+            self.status_callback(status_info)
+
+    def _log_dropped_status(self, status_info):
+        """被合并掉的状态只记录DEBUG日志"""
+        self.logger.debug(f"[{status_info['type'].upper()}] {status_info['message']}")
 
     def get_random_user_agent(self):
         """随机生成User-Agent"""
@@ -240,6 +393,7 @@ class WebCustomCrawler:
         """
         return script
 
+    @traced('create_browser_context')
     def create_browser_context(self, playwright_instance):
         """创建带有随机指纹的浏览器上下文"""
         try:
@@ -306,6 +460,7 @@ class WebCustomCrawler:
                     })
         return cookies
     
+    @traced('clear_browser_data')
     def clear_browser_data(self, context):
         """清理浏览器数据以避免设备关联"""
         try:
@@ -348,6 +503,7 @@ class WebCustomCrawler:
         except Exception as e:
             self.logger.warning(f"[PRIVACY] ⚠️ 清理浏览器数据时出现警告: {e}")
 
+    @traced('extract_shop_data')
     def extract_shop_data(self, page, city_name, category_name):
         """提取商铺数据"""
         try:
@@ -521,6 +677,7 @@ class WebCustomCrawler:
             self._update_status(f"数据提取失败: {e}", status_type='error')
             return []
 
+    @traced('detect_captcha')
     def detect_captcha(self, page):
         """检测验证码"""
         try:
@@ -551,6 +708,7 @@ class WebCustomCrawler:
         except Exception as e:
             return None
 
+    @traced('simulate_user_behavior')
     def simulate_user_behavior(self, page):
         """用户行为模拟 - 优化版本，增加稳定性和错误处理"""
         try:
@@ -563,7 +721,7 @@ class WebCustomCrawler:
             
             # 1. 初始等待 - 缩短时间
             initial_wait = random.uniform(1, 3)
-            time.sleep(initial_wait)
+            self._sleep(initial_wait, 'behavior')
             
             # 2. 简化的鼠标移动 - 减少次数和范围
             try:
@@ -577,7 +735,7 @@ class WebCustomCrawler:
                     y = random.randint(200, 600)
                     
                     self._safe_mouse_move(page, x, y)
-                    time.sleep(random.uniform(0.5, 1.5))  # 缩短延迟
+                    self._sleep(random.uniform(0.5, 1.5), 'behavior')  # 缩短延迟
             except Exception as e:
                 self.logger.warning(f"[BEHAVIOR] 鼠标移动异常: {e}")
             
@@ -600,7 +758,7 @@ class WebCustomCrawler:
                     final_wait = random.uniform(1, 3)  # 从2-5缩短
                 else:  # medium
                     final_wait = random.uniform(2, 4)  # 从4-8缩短
-                time.sleep(final_wait)
+                self._sleep(final_wait, 'behavior')
             except Exception as e:
                 self.logger.warning(f"[BEHAVIOR] 最终等待异常: {e}")
             
@@ -608,7 +766,7 @@ class WebCustomCrawler:
             
         except Exception as e:
             self.logger.error(f"[BEHAVIOR] ❌ 用户行为模拟失败: {e}")
-            time.sleep(random.uniform(2, 4))  # 缩短错误恢复时间
+            self._sleep(random.uniform(2, 4), 'error_recovery')  # 缩短错误恢复时间
     
     def _check_page_status(self, page):
         """检查页面状态是否正常"""
@@ -642,7 +800,7 @@ class WebCustomCrawler:
                         page, 
                         f"window.scrollTo(0, document.body.scrollHeight * {scroll_pos})"
                     )
-                    time.sleep(random.uniform(1, 2))  # 缩短延迟
+                    self._sleep(random.uniform(1, 2), 'behavior')  # 缩短延迟
             else:  # reading
                 # 阅读式滚动
                 positions = [0.3, 0.6]
@@ -654,7 +812,7 @@ class WebCustomCrawler:
                         page,
                         f"window.scrollTo(0, document.body.scrollHeight * {pos})"
                     )
-                    time.sleep(random.uniform(1, 2))
+                    self._sleep(random.uniform(1, 2), 'behavior')
         except Exception as e:
             self.logger.warning(f"[BEHAVIOR] 滚动行为异常: {e}")
     
@@ -686,7 +844,7 @@ class WebCustomCrawler:
         # 等待一段时间再重启
         recovery_delay = random.uniform(5, 10)
         self.logger.info(f"[RECOVERY] ⏱️ 恢复延迟: {recovery_delay:.1f}秒")
-        time.sleep(recovery_delay)
+        self._sleep(recovery_delay, 'error_recovery')
         
         return True  # 表示需要重新创建浏览器
     
@@ -702,7 +860,7 @@ class WebCustomCrawler:
             
             # 执行分段延迟
             for i in range(segments):
-                time.sleep(segment_duration)
+                self._sleep(segment_duration, 'page_delay')
                 
                 # 每段后检查浏览器状态
                 if not self._is_browser_alive(page):
@@ -715,7 +873,7 @@ class WebCustomCrawler:
             
             # 剩余时间
             if remaining > 0:
-                time.sleep(remaining)
+                self._sleep(remaining, 'page_delay')
                 if not self._is_browser_alive(page):
                     self.logger.error("[DELAY] ❌ 延迟期间浏览器断开")
                     raise Exception("Browser disconnected during delay")
@@ -726,6 +884,7 @@ class WebCustomCrawler:
             self.logger.error(f"[DELAY] ❌ 延迟期间出现异常: {e}")
             raise e
     
+    @traced('simulate_intelligent_behavior')
     def simulate_intelligent_behavior(self, page, behavior_config):
         """智能用户行为模拟 - 增加浏览器崩溃检测"""
         try:
@@ -740,7 +899,7 @@ class WebCustomCrawler:
                     scroll_distance = random.randint(300, 800)
                     self._safe_evaluate(page, f'window.scrollBy(0, {scroll_distance})', timeout=3000)
                     scroll_delay = AntiDetectionConfig.get_random_delay('request_delay')
-                    time.sleep(scroll_delay)
+                    self._sleep(scroll_delay, 'behavior')
                     self.logger.debug("[BEHAVIOR] 📜 执行滚动行为")
                 except Exception as e:
                     self.logger.warning(f"[BEHAVIOR] 滚动失败: {e}")
@@ -757,7 +916,7 @@ class WebCustomCrawler:
                             element = random.choice(hover_elements[:3])  # 只选择前3个元素
                             element.hover(timeout=2000)
                             hover_delay = min(AntiDetectionConfig.get_random_delay('request_delay'), 2)  # 限制最大延迟
-                            time.sleep(hover_delay)
+                            self._sleep(hover_delay, 'behavior')
                             self.logger.debug("[BEHAVIOR] 🖱️ 执行悬停行为")
                 except Exception as e:
                     self.logger.debug(f"[BEHAVIOR] 悬停失败: {e}")
@@ -769,11 +928,11 @@ class WebCustomCrawler:
                 min_time, max_time = patterns['stay_patterns'][stay_pattern]
                 # 缩短停留时间到原来的一半
                 stay_time = random.uniform(min_time * 0.5, max_time * 0.5)
-                time.sleep(stay_time)
+                self._sleep(stay_time, 'behavior')
                 self.logger.debug(f"[BEHAVIOR] ⏱️ {stay_pattern}停留: {stay_time:.1f}秒")
             except Exception as e:
                 self.logger.debug(f"[BEHAVIOR] 停留时间计算失败: {e}")
-                time.sleep(random.uniform(1, 3))  # 默认停留时间
+                self._sleep(random.uniform(1, 3), 'behavior')  # 默认停留时间
             
         except Exception as e:
             self.logger.warning(f"[BEHAVIOR] ⚠️ 智能行为模拟失败: {e}")
@@ -807,7 +966,15 @@ class WebCustomCrawler:
             category_ids.append(self.categories[category_name])
         
         # 调用内部实现
-        return self._crawl_specific_task_internal(city_code, city_name, category_ids, category_names, start_page, end_page, sort_type)
+        try:
+            with self.tracer.span('crawl_task', city=city_code, categories=category_ids,
+                                  start_page=start_page, end_page=end_page):
+                return self._crawl_specific_task_internal(city_code, city_name, category_ids, category_names, start_page, end_page, sort_type)
+        finally:
+            # 补发暂存的状态，避免任务结束后才投递旧的进度
+            self.status_pipeline.close()
+            stats = self.status_pipeline.get_stats()
+            self.logger.info(f"[STATUS] 状态更新: 提交 {stats['submitted']} 条, 投递 {stats['delivered']} 条, 合并 {stats['dropped']} 条")
     
     def _crawl_specific_task_internal(self, city_code, city_name, category_ids, category_names, start_page=1, end_page=15, sort_type='popularity'):
         """
@@ -834,6 +1001,7 @@ class WebCustomCrawler:
         # 重置统计变量
         self.captcha_count = 0
         self.skipped_pages = 0
+        self.cached_pages = 0
         self.page_refresh_count = 0
         self.ua_change_count = 0
 
@@ -844,9 +1012,11 @@ class WebCustomCrawler:
         
         task_start_time = datetime.now()
         all_task_data = []
+        self._city_code = city_code
         
         with sync_playwright() as p:
             try:
+                startup_started = time.perf_counter()
                 self.logger.info("[BROWSER] 🌐 创建浏览器上下文...")
                 browser, context = self.create_browser_context(p)
                 
@@ -859,7 +1029,7 @@ class WebCustomCrawler:
                 # 随机延迟以避免时间模式关联
                 initial_delay = AntiDetectionConfig.get_random_delay('initial_delay')
                 self.logger.info(f"[PRIVACY] ⏱️ 初始随机延迟: {initial_delay:.1f}秒")
-                time.sleep(initial_delay)
+                self._sleep(initial_delay, 'initial_delay')
                 
                 cookies = self.parse_cookies()
                 context.add_cookies(cookies)
@@ -868,6 +1038,7 @@ class WebCustomCrawler:
                 page = context.new_page()
                 fingerprint_script = self.get_browser_fingerprint_script()
                 page.add_init_script(fingerprint_script)
+                self._record_phase('startup', startup_started)
                 
                 total_categories = len(category_names)
                 saved_files = []
@@ -900,6 +1071,26 @@ class WebCustomCrawler:
                     # 爬取指定页数
                     for page_num in range(start_page, end_page + 1):
                         page_start_time = datetime.now()
+                        if self.profiler:
+                            self.profiler.checkpoint(self.task_id)
+                        
+                        # 优先使用新鲜的缓存结果，跳过页面加载和延迟
+                        cached_shops = self._get_cached_page(city_code, category_id, sort_type, page_num)
+                        if self.page_cache:
+                            CACHE_LOOKUPS.inc(cache='page', result='hit' if cached_shops else 'miss')
+                        if cached_shops:
+                            CRAWLER_PAGES.inc(result='cached')
+                            category_data.extend(cached_shops)
+                            consecutive_empty_pages = 0
+                            self.cached_pages += 1
+                            self._emit_page_result(category_id, category_name, page_num, cached_shops, from_cache=True)
+                            self.logger.info(f"[CACHE] ♻️ 第{page_num}页命中缓存: {len(cached_shops)} 个商铺")
+                            self._update_status(f"♻️ 第{page_num}页使用缓存: {len(cached_shops)} 个商铺")
+                            log_event(self.task_id, city=city_code, category=category_id, page=page_num,
+                                      phase='cache_hit', rows=len(cached_shops))
+                            continue
+                        
+                        page_started = time.perf_counter()
                         
                         # 构建URL（添加排序参数）
                         sort_options = {
@@ -915,6 +1106,7 @@ class WebCustomCrawler:
                             url = f"https://www.dianping.com/{city_code}/ch10/{category_id}{sort_suffix}p{page_num}"
                         
                         self.logger.info(f"[PAGE] 📄 第{page_num}页: {url}")
+                        self.tracer.instant('page_start', category=category_id, page=page_num)
                         self.logger.info(f"[PAGE] ⏱️ 开始时间: {page_start_time.strftime('%H:%M:%S')}")
                         
                         page_progress = category_progress + ((page_num - start_page + 1) / page_range) * (100 / total_categories)
@@ -922,19 +1114,27 @@ class WebCustomCrawler:
                         
                         try:
                             self.logger.info(f"[PAGE] 🔄 正在加载页面: {url}")
+                            load_started = time.perf_counter()
+                            load_wait_seconds = 0.0  # 加载过程中有意等待的时间，单独记为load_wait阶段
                             
                             # 增强页面加载稳定性
                             max_retries = 3
+                            page_bytes = None
                             for retry in range(max_retries):
                                 try:
-                                    page.goto(url, timeout=30000, wait_until='domcontentloaded')
+                                    with self.tracer.span('page.goto', page=page_num, attempt=retry + 1):
+                                        goto_started = time.perf_counter()
+                                        response = page.goto(url, timeout=30000, wait_until='domcontentloaded')
+                                        CRAWLER_GOTO_SECONDS.observe(time.perf_counter() - goto_started)
+                                    page_bytes = self._response_bytes(response, read_body=self.event_log_enabled)
                                     
                                     # 等待页面稳定并验证加载状态
                                     page_delay = AntiDetectionConfig.get_random_delay('page_delay')
-                                    time.sleep(page_delay)
+                                    load_wait_seconds += self._sleep(page_delay, 'page_ready')
                                     
                                     # 检查页面是否正确加载
-                                    ready_state = page.evaluate('document.readyState')
+                                    with self.tracer.span('wait_ready', page=page_num):
+                                        ready_state = page.evaluate('document.readyState')
                                     if ready_state == 'complete':
                                         self.logger.info(f"[PAGE] ✅ 页面加载成功: {url}")
                                         break
@@ -942,26 +1142,34 @@ class WebCustomCrawler:
                                         self.logger.warning(f"[PAGE] ⚠️ 页面未完全加载，状态: {ready_state}")
                                         if retry < max_retries - 1:
                                             retry_delay = AntiDetectionConfig.get_random_delay('error_delay')
-                                            time.sleep(retry_delay)
+                                            load_wait_seconds += self._sleep(retry_delay, 'load_retry')
                                             continue
                                         
                                 except Exception as goto_error:
                                     self.logger.warning(f"[PAGE] ⚠️ 页面加载尝试 {retry + 1}/{max_retries} 失败: {goto_error}")
                                     if retry < max_retries - 1:
                                         error_delay = AntiDetectionConfig.get_random_delay('error_delay')
-                                        time.sleep(error_delay)
+                                        load_wait_seconds += self._sleep(error_delay, 'load_retry')
                                         continue
                                     else:
                                         raise goto_error
                             
                             # 额外的页面稳定性检查
                             stability_delay = AntiDetectionConfig.get_random_delay('request_delay')
-                            time.sleep(stability_delay)
+                            load_wait_seconds += self._sleep(stability_delay, 'page_stability')
+                            
+                            # load只含goto到readyState检查的耗时，其间的等待记为load_wait
+                            self._record_duration('load', time.perf_counter() - load_started - load_wait_seconds,
+                                                  category_id, page_num, nbytes=page_bytes)
+                            self._record_duration('load_wait', load_wait_seconds, category_id, page_num)
                             
                             # 检查验证码
                             captcha = self.detect_captcha(page)
                             if captcha:
+                                captcha_started = time.perf_counter()
                                 self.captcha_count += 1
+                                CRAWLER_CAPTCHAS.inc()
+                                self.tracer.instant('captcha', page=page_num)
                                 self.logger.warning(f"[CAPTCHA] 🚨 检测到验证码！第{page_num}页 - {category_name}")
                                 self.logger.warning(f"[CAPTCHA] 🔍 详细信息: {captcha}")
                                 
@@ -974,7 +1182,7 @@ class WebCustomCrawler:
                                 waited_time = 0
                                 
                                 while waited_time < max_wait_time:
-                                    time.sleep(wait_interval)
+                                    self._sleep(wait_interval, 'captcha_wait')
                                     waited_time += wait_interval
                                     
                                     current_captcha = self.detect_captcha(page)
@@ -990,19 +1198,22 @@ class WebCustomCrawler:
                                 
                                 if waited_time >= max_wait_time:
                                     self.skipped_pages += 1
+                                    CRAWLER_PAGES.inc(result='skipped')
                                     self.logger.warning(f"[CAPTCHA] ⚠️ 验证码等待超时，跳过第{page_num}页")
                                     self._update_status("⚠️ 验证码等待超时，跳过当前页面", status_type='warning')
                                     continue
                                 
                                 # 验证码解决后重新加载
                                 try:
-                                    page.reload(timeout=30000)
+                                    with self.tracer.span('page.reload', page=page_num):
+                                        page.reload(timeout=30000)
                                     reload_delay = AntiDetectionConfig.get_random_delay('page_delay')
-                                    time.sleep(reload_delay)
+                                    self._sleep(reload_delay, 'page_ready')
                                     self.logger.info("[PAGE] 🔄 页面重新加载完成")
                                 except Exception as e:
                                     self.logger.error(f"[PAGE] ❌ 页面刷新失败: {e}")
                                     continue
+                                self._record_phase('captcha_wait', captcha_started, category_id, page_num)
                              
                             # 智能User-Agent轮换
                             ua_config = AntiDetectionConfig.get_user_agents()
@@ -1017,19 +1228,29 @@ class WebCustomCrawler:
 
                             # 智能用户行为模拟
                             behavior = AntiDetectionConfig.get_random_behavior()
+                            behavior_started = time.perf_counter()
                             self.simulate_intelligent_behavior(page, behavior)
+                            self._record_phase('behavior', behavior_started, category_id, page_num)
                              
                             # 提取数据
+                            parse_started = time.perf_counter()
                             page_shops = self.extract_shop_data(page, city_name, category_name)
+                            self._record_phase('parse', parse_started, category_id, page_num, rows=len(page_shops))
                             page_end_time = datetime.now()
                             page_duration = (page_end_time - page_start_time).total_seconds()
 
                             if page_shops:
+                                CRAWLER_PAGES.inc(result='ok')
+                                CRAWLER_SHOPS.inc(len(page_shops))
                                 category_data.extend(page_shops)
                                 consecutive_empty_pages = 0
+                                if self.page_cache:
+                                    self.page_cache.put_page(city_code, category_id, sort_type, page_num, page_shops)
+                                self._emit_page_result(category_id, category_name, page_num, page_shops)
                                 self.logger.info(f"[PAGE] ✅ 第{page_num}页成功: {len(page_shops)} 个商铺 (耗时{page_duration:.1f}秒)")
                                 self._update_status(f"✅ 第{page_num}页成功: {len(page_shops)} 个商铺")
                             else:
+                                CRAWLER_PAGES.inc(result='empty')
                                 consecutive_empty_pages += 1
                                 self.logger.warning(f"[PAGE] ⚠️ 第{page_num}页无数据 (耗时{page_duration:.1f}秒)")
                                 self._update_status(f"⚠️ 第{page_num}页无数据", status_type='warning')
@@ -1040,8 +1261,8 @@ class WebCustomCrawler:
                                                       status_type='warning')
                                     break
                              
-                            # 页面间延迟 - 优化为分段延迟+健康检查
-                            if page_num < end_page:
+                            # 页面间延迟 - 优化为分段延迟+健康检查（下一页命中缓存时无需延迟）
+                            if page_num < end_page and not self._is_page_cached(city_code, category_id, sort_type, page_num + 1):
                                 # 缩短基础延迟时间
                                 base_delay = random.uniform(8, 15)  # 从20-35缩短到8-15
                                 
@@ -1061,9 +1282,15 @@ class WebCustomCrawler:
                                 self._update_status(f"⏱️ 页面延迟({delay_pattern}): {base_delay:.1f}秒")
                                 
                                 # 分段延迟+浏览器健康检查
+                                delay_started = time.perf_counter()
                                 self._safe_delay_with_health_check(page, base_delay)
+                                self._record_phase('page_delay', delay_started, category_id, page_num)
+                            
+                            self._record_phase('page_total', page_started, category_id, page_num,
+                                               rows=len(page_shops), nbytes=page_bytes)
                              
                         except Exception as e:
+                            CRAWLER_PAGES.inc(result='error')
                             self.logger.error(f"[PAGE] ❌ 第{page_num}页异常: {e}")
                             self.logger.error(f"[PAGE] 🔍 异常类型: {type(e).__name__}")
                             self._update_status(f"❌ 第{page_num}页异常: {e}", status_type='error')
@@ -1094,7 +1321,7 @@ class WebCustomCrawler:
                     all_task_data.extend(category_data)
                     
                     # 每完成一个品类就保存数据（增量保存）
-                    if category_data:
+                    if category_data and self.save_outputs:
                         import sys
                         import os
                         sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
@@ -1116,7 +1343,9 @@ class WebCustomCrawler:
                         delay = AntiDetectionConfig.get_random_delay('category_delay')
                         self.logger.info(f"[DELAY] ⏱️ 品类间延迟: {delay:.1f}秒")
                         self._update_status(f"⏱️ 品类间延迟: {delay:.1f}秒")
-                        time.sleep(delay)
+                        category_delay_started = time.perf_counter()
+                        self._sleep(delay, 'category_delay')
+                        self._record_phase('category_delay', category_delay_started)
                 
                 # 任务完成统计
                 task_end_time = datetime.now()
@@ -1130,6 +1359,7 @@ class WebCustomCrawler:
                 self.logger.info("[TASK] 🛡️ 反检测统计:")
                 self.logger.info(f"[TASK]   验证码遇到: {self.captcha_count} 次")
                 self.logger.info(f"[TASK]   跳过页面: {self.skipped_pages} 页")
+                self.logger.info(f"[TASK]   缓存命中: {self.cached_pages} 页")
                 self.logger.info(f"[TASK]   页面刷新: {self.page_refresh_count} 次")
                 self.logger.info(f"[TASK]   UA更换: {self.ua_change_count} 次")
                 
@@ -1141,7 +1371,7 @@ class WebCustomCrawler:
                 self.logger.info("=" * 60)
                 
                 # 合并所有增量文件为最终文件
-                if len(category_names) > 1 and all_task_data:
+                if len(category_names) > 1 and all_task_data and self.save_outputs:
                     import sys
                     import os
                     sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
@@ -1188,7 +1418,7 @@ class WebCustomCrawler:
                         pass
                 
                 # 等待页面资源释放
-                time.sleep(1)
+                self._sleep(1, 'browser_close')
                 
                 # 2. 关闭浏览器上下文
                 try:
@@ -1202,7 +1432,7 @@ class WebCustomCrawler:
                     self.logger.warning(f"[BROWSER] ⚠️ 浏览器上下文关闭异常: {e}")
                 
                 # 等待上下文资源释放
-                time.sleep(1)
+                self._sleep(1, 'browser_close')
                 
                 # 3. 关闭浏览器
                 try:
@@ -1222,9 +1452,20 @@ class WebCustomCrawler:
                         pass
                 
                 # 最终等待确保所有资源完全释放
-                time.sleep(2)
+                self._sleep(2, 'browser_close')
                 self.logger.info("[BROWSER] 🔒 所有浏览器资源已安全释放")
 
+    def _get_cached_page(self, city_code, category_id, sort_type, page_num):
+        """读取页面缓存，未启用缓存或未命中时返回None"""
+        if not self.page_cache:
+            return None
+        return self.page_cache.get_page(city_code, category_id, sort_type, page_num)
+
+    def _is_page_cached(self, city_code, category_id, sort_type, page_num):
+        """判断某页是否有新鲜缓存"""
+        return self._get_cached_page(city_code, category_id, sort_type, page_num) is not None
+
+    @traced('save_task_data')
     def save_task_data(self, data, city_name, category_names, output_dir, incremental=False, category_name=None):
         """保存任务数据到指定目录，支持增量保存"""
         if not data and not incremental:
@@ -1260,6 +1501,7 @@ class WebCustomCrawler:
                 for shop in data:
                     writer.writerow(shop)
             
+            self.last_saved_file = filepath
             self.logger.info(f"[SAVE] ✅ 数据已{'追加到' if incremental else '保存到'}: {filename}")
             self._update_status(f"✅ 数据已保存: {display_name} ({len(data)}个商铺)")
             
@@ -0,0 +1,235 @@
+"""
+数据库维护 - 后台定期归档过期历史、分批删除并增量回收空间
+
+超过保留天数（DATABASE_CONFIG['MAX_HISTORY_DAYS']）的爬取历史、Cookie使用记录和爬取组合
+按月追加到压缩归档文件（<表名>_<YYYY-MM>.jsonl.gz，每行一条JSON记录），写入并刷盘后
+再从数据库删除。删除按批交给写线程，每批是一个短事务，批之间稍作停顿，不会长时间占用写锁。
+归档成功、删除前进程退出时，下次会再次归档这些行（归档文件中可能出现重复记录，不会丢失）。
+
+删除后的空闲页用 PRAGMA incremental_vacuum 分块归还给文件系统（需要auto_vacuum=INCREMENTAL，
+见 DatabaseManager.init_database），最后截断WAL文件；vacuum和检查点都交给写线程执行，不与其他写操作争锁。
+"""
+
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from .metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+DB_ARCHIVED_ROWS = REGISTRY.counter('db_archived_rows_total', '归档并删除的过期记录数（按表）', ('table',))
+DB_VACUUMED_PAGES = REGISTRY.counter('db_vacuumed_pages_total', '增量vacuum归还给文件系统的页数')
+
+# (表名, 判断过期的日期列, 日期列是否带时间)
+ARCHIVE_TABLES = [
+    ('crawl_history', 'created_at', True),
+    ('cookie_usage', 'usage_date', False),
+    ('crawl_combinations', 'crawl_date', False)
+]
+
+class DatabaseMaintenance:
+    """数据库定期维护任务"""
+
+    def __init__(self, db_manager, page_cache=None, config: Dict = None, retention_days: int = None):
+        if config is None:
+            from config.crawler_config import MAINTENANCE_CONFIG
+            config = MAINTENANCE_CONFIG
+        if retention_days is None:
+            from config.crawler_config import DATABASE_CONFIG
+            retention_days = DATABASE_CONFIG.get('MAX_HISTORY_DAYS', 30)
+
+        self.db_manager = db_manager
+        self.page_cache = page_cache
+        self.retention_days = retention_days
+        self.archive_dir = config.get('ARCHIVE_DIR')
+        self.interval_seconds = config.get('INTERVAL_HOURS', 6) * 3600
+        self.start_delay_seconds = config.get('START_DELAY_SECONDS', 300)
+        self.batch_size = config.get('DELETE_BATCH_SIZE', 500)
+        self.batch_pause_seconds = config.get('BATCH_PAUSE_SECONDS', 0.05)
+        self.vacuum_pages = config.get('VACUUM_PAGES', 2000)
+        self.vacuum_chunk_pages = config.get('VACUUM_CHUNK_PAGES', 200)
+
+        self.last_run = None
+        self._stop_event = threading.Event()
+        self._run_lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        """启动后台维护线程（启动后延迟一段时间再执行第一次，避免拖慢服务启动）"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='db-maintenance', daemon=True)
+        self._thread.start()
+        logger.info(f"数据库维护线程已启动（保留 {self.retention_days} 天，"
+                    f"每 {self.interval_seconds / 3600:g} 小时执行一次）")
+
+    def stop(self, timeout: float = 10):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _run(self):
+        if self._stop_event.wait(self.start_delay_seconds):
+            return
+        while True:
+            self.run_once()
+            if self._stop_event.wait(self.interval_seconds):
+                return
+
+    def run_once(self) -> Optional[Dict]:
+        """
+        执行一次维护：归档并删除过期记录、清理过期页面缓存、增量vacuum
+
+        同一时刻只执行一次，已有维护在执行时返回None。
+        """
+        if not self._run_lock.acquire(blocking=False):
+            return None
+        try:
+            started = time.perf_counter()
+            result = {
+                'started_at': datetime.now().isoformat(),
+                'retention_days': self.retention_days,
+                'archived': {},
+                'errors': []
+            }
+
+            for table, column, has_time in ARCHIVE_TABLES:
+                try:
+                    result['archived'][table] = self._archive_table(table, column, has_time)
+                except Exception as e:
+                    logger.error(f"归档 {table} 失败: {e}")
+                    result['errors'].append(f'{table}: {e}')
+
+            # 归档后整天为0的计数行没有意义
+            try:
+                self.db_manager.writer.execute(
+                    "DELETE FROM crawl_stats WHERE stat_date != '*' AND total_tasks <= 0")
+            except Exception as e:
+                logger.error(f"清理空计数行失败: {e}")
+
+            if self.page_cache:
+                result['page_cache_purged'] = self.page_cache.purge_expired()
+
+            try:
+                result['vacuum'] = self._incremental_vacuum()
+            except Exception as e:
+                logger.error(f"增量vacuum失败: {e}")
+                result['errors'].append(f'vacuum: {e}')
+
+            result['duration_seconds'] = round(time.perf_counter() - started, 3)
+            self.last_run = result
+            archived_total = sum(result['archived'].values())
+            if archived_total or result['errors']:
+                logger.info(f"数据库维护完成: 归档 {archived_total} 行 {result['archived']}，"
+                            f"回收 {result.get('vacuum', {}).get('freed_pages', 0)} 页，"
+                            f"耗时 {result['duration_seconds']} 秒")
+            return result
+        finally:
+            self._run_lock.release()
+
+    def _cutoff(self, has_time: bool) -> str:
+        cutoff = datetime.now() - timedelta(days=self.retention_days)
+        return cutoff.strftime('%Y-%m-%d %H:%M:%S') if has_time else str(cutoff.date())
+
+    def _archive_table(self, table: str, column: str, has_time: bool) -> int:
+        """把一张表的过期记录按批归档并删除，返回处理的行数"""
+        cutoff = self._cutoff(has_time)
+        archived = 0
+        while not self._stop_event.is_set():
+            with self.db_manager.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(f'''
+                    SELECT * FROM {table} WHERE {column} < ?
+                    ORDER BY {column}, id LIMIT ?
+                ''', (cutoff, self.batch_size))
+                columns = [description[0] for description in cursor.description]
+                rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            if not rows:
+                break
+
+            self._append_archive(table, column, rows)
+
+            ids = [row['id'] for row in rows]
+            placeholders = ', '.join('?' * len(ids))
+            self.db_manager.writer.execute(f'DELETE FROM {table} WHERE id IN ({placeholders})', ids)
+            archived += len(rows)
+            DB_ARCHIVED_ROWS.inc(len(rows), table=table)
+
+            if len(rows) < self.batch_size:
+                break
+            # 让出写线程，批之间其他写操作可以先提交
+            time.sleep(self.batch_pause_seconds)
+        return archived
+
+    def _append_archive(self, table: str, column: str, rows: List[Dict]):
+        """按月追加到压缩归档文件并刷盘（gzip允许多个成员首尾相接，追加后仍可整体读取）"""
+        by_month = {}
+        for row in rows:
+            value = row.get(column)
+            month = str(value)[:7] if value else 'unknown'
+            by_month.setdefault(month, []).append(row)
+
+        os.makedirs(self.archive_dir, exist_ok=True)
+        for month, month_rows in by_month.items():
+            path = os.path.join(self.archive_dir, f'{table}_{month}.jsonl.gz')
+            with open(path, 'ab') as raw:
+                with gzip.GzipFile(fileobj=raw, mode='ab') as archive:
+                    for row in month_rows:
+                        archive.write((json.dumps(row, ensure_ascii=False, default=str) + '\n').encode('utf-8'))
+                raw.flush()
+                os.fsync(raw.fileno())
+
+    @staticmethod
+    def _vacuum_chunk(cursor, pages: int):
+        # incremental_vacuum每执行一步释放一页，sqlite3的execute只执行一步，因此逐页执行
+        for _ in range(pages):
+            cursor.execute('PRAGMA incremental_vacuum(1)')
+
+    def _incremental_vacuum(self) -> Dict:
+        """分块归还空闲页（每块交给写线程作为一个短写事务），之后在写线程上截断WAL文件"""
+        requested = 0
+        with self.db_manager.get_connection() as conn:
+            if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+                return {'enabled': False, 'freed_pages': 0}
+            free_before = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        limit = min(free_before, self.vacuum_pages) if self.vacuum_pages else free_before
+        while requested < limit and not self._stop_event.is_set():
+            pages = min(self.vacuum_chunk_pages, limit - requested)
+            self.db_manager.writer.submit(lambda cursor, pages=pages: self._vacuum_chunk(cursor, pages))
+            requested += pages
+            # 块之间让出写线程
+            time.sleep(self.batch_pause_seconds)
+        with self.db_manager.get_connection() as conn:
+            free_after = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        # 检查点不能在事务中执行
+        checkpoint = self.db_manager.writer.submit(
+            lambda cursor: cursor.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchone(), transaction=False)
+
+        freed = free_before - free_after
+        DB_VACUUMED_PAGES.inc(freed)
+        return {
+            'enabled': True,
+            'freed_pages': freed,
+            'free_pages': free_after,
+            'checkpoint_busy': bool(checkpoint and checkpoint[0])
+        }
+
+    def get_status(self) -> Dict:
+        db_size = os.path.getsize(self.db_manager.db_path) if os.path.exists(self.db_manager.db_path) else 0
+        wal_path = self.db_manager.db_path + '-wal'
+        return {
+            'running': bool(self._thread and self._thread.is_alive()),
+            'retention_days': self.retention_days,
+            'interval_hours': self.interval_seconds / 3600,
+            'archive_dir': self.archive_dir,
+            'db_size_bytes': db_size,
+            'wal_size_bytes': os.path.getsize(wal_path) if os.path.exists(wal_path) else 0,
+            'last_run': self.last_run
+        }
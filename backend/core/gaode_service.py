@@ -18,6 +18,7 @@ project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(_
 sys.path.insert(0, project_root)
 
 from config.crawler_config import GAODE_API_CONFIG
+from backend.core.metrics import GAODE_REQUESTS, GAODE_REQUEST_SECONDS
 
 class GaodeAPIService:
     """
@@ -71,11 +72,15 @@ class GaodeAPIService:
         
         for attempt in range(self.retry_count):
             try:
-                response = requests.get(
-                    self.api_url, 
-                    params=params, 
-                    timeout=self.timeout
-                )
+                request_started = time.perf_counter()
+                try:
+                    response = requests.get(
+                        self.api_url, 
+                        params=params, 
+                        timeout=self.timeout
+                    )
+                finally:
+                    GAODE_REQUEST_SECONDS.observe(time.perf_counter() - request_started)
                 response.raise_for_status()
                 
                 data = response.json()
@@ -87,18 +92,22 @@ class GaodeAPIService:
                         # 如果tel是list，转成字符串
                         if isinstance(tel, list):
                             tel = ' / '.join(map(str, tel))
+                        GAODE_REQUESTS.inc(result='found')
                         return str(tel)
                 
                 # 如果没有找到结果，记录日志但不重试
+                GAODE_REQUESTS.inc(result='not_found')
                 self.logger.info(f"未找到 {city} {shop_name} 的电话信息")
                 return ""
                 
             except requests.exceptions.RequestException as e:
+                GAODE_REQUESTS.inc(result='error')
                 self.logger.warning(f"查询 {city} {shop_name} 时网络错误 (尝试 {attempt + 1}/{self.retry_count}): {e}")
                 if attempt < self.retry_count - 1:
                     time.sleep(1)  # 重试前等待1秒
                     continue
             except Exception as e:
+                GAODE_REQUESTS.inc(result='error')
                 self.logger.error(f"查询 {city} {shop_name} 时出错: {e}")
                 break
         
@@ -0,0 +1,324 @@
+"""
+工作节点租约管理 - 远程工作节点通过HTTP租约领取任务、回传进度和结果
+"""
+
+import csv
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from .custom_crawler import resolve_task_names
+from .task_queue import TaskQueue, TaskStatus
+from .metrics import CRAWLER_PHASE_SECONDS, QUEUE_ACTIVE_LEASES
+
+logger = logging.getLogger(__name__)
+
+class LeaseManager:
+    """
+    任务租约管理
+
+    工作节点领取任务后获得一个有效期为LEASE_SECONDS的租约，通过心跳续约。
+    结果按页分批回传，先追加到临时文件，任务完成后再移到输出目录。
+    租约过期（工作节点崩溃或断网）的任务会被重新放回队列。
+    """
+
+    def __init__(self, task_queue: TaskQueue, config: Dict = None):
+        if config is None:
+            from config.crawler_config import WORKER_CONFIG
+            config = WORKER_CONFIG
+        from config.crawler_config import FILE_PATHS
+
+        self.task_queue = task_queue
+        self.db_manager = task_queue.db_manager
+        self.lease_seconds = config.get('LEASE_SECONDS', 120)
+        self.result_batch_size = config.get('RESULT_BATCH_SIZE', 50)
+        self.poll_interval_seconds = config.get('POLL_INTERVAL_SECONDS', 5)
+        self.temp_dir = FILE_PATHS['TEMP_DIR']
+        self.outputs_dir = FILE_PATHS['OUTPUTS_DIR']
+
+        self.leases = {}  # lease_id -> 租约信息
+        self._lock = threading.Lock()
+        QUEUE_ACTIVE_LEASES.set_function(lambda: len(self.leases))
+        task_queue.lease_manager = self  # 预测排队时间时计入远程执行中的任务和工作节点
+
+    def _partial_path(self, task_id: str) -> str:
+        """任务结果的临时文件路径"""
+        return os.path.join(self.temp_dir, f'worker_{task_id}.partial.csv')
+
+    def acquire(self, worker_id: str) -> Optional[Dict]:
+        """为工作节点领取一个任务，没有可执行任务时返回None"""
+        self.reap_expired()
+
+        lease_id = str(uuid.uuid4())
+        expires_at = datetime.now() + timedelta(seconds=self.lease_seconds)
+        task = self.task_queue._get_next_task('leased', worker_id, lease_id, expires_at)
+        if not task:
+            return None
+
+        with self._lock:
+            self.leases[lease_id] = {
+                'task': task,
+                'worker_id': worker_id,
+                'acquired_at': datetime.now(),
+                'expires_at': expires_at,
+                'pages': set(),              # 已接收的(品类ID, 页码)，重复回传的批次直接忽略
+                'total_shops': 0,
+                'shops_per_category': {},
+                'fieldnames': None
+            }
+
+        # 任务在远程执行，本进程登记的剖析请求不会生效
+        self.task_queue.profiler.discard(task['task_id'])
+        self.task_queue._begin_task(task)
+        self.task_queue._notify_status_change(task['task_id'], TaskStatus.RUNNING, f"任务已分配给工作节点 {worker_id}")
+        logger.info(f"任务 {task['task_id']} 已租给工作节点 {worker_id} (租约: {lease_id})")
+
+        return {
+            'lease_id': lease_id,
+            'lease_seconds': self.lease_seconds,
+            'result_batch_size': self.result_batch_size,
+            'task': {
+                'task_id': task['task_id'],
+                'city': task['city'],
+                'categories': json.loads(task['categories']),
+                'start_page': task.get('start_page') or 1,
+                'end_page': task.get('end_page') or 15,
+                'sort_type': task.get('sort_type') or 'popularity',
+                'cookie_string': task['cookie_string']
+            }
+        }
+
+    def _get_lease(self, lease_id: str) -> Optional[Dict]:
+        """获取仍然有效的租约"""
+        with self._lock:
+            lease = self.leases.get(lease_id)
+            if lease and lease['expires_at'] >= datetime.now():
+                return lease
+        return None
+
+    def renew(self, lease_id: str, events: List[Dict] = None, phases: List[Dict] = None) -> Optional[Dict]:
+        """
+        心跳续约，同时接收工作节点缓冲的状态事件和阶段耗时
+
+        Returns:
+            {'lease_id', 'expires_at'}，租约已失效时返回None（工作节点应放弃该任务）
+        """
+        lease = self._get_lease(lease_id)
+        if not lease:
+            return None
+
+        task = lease['task']
+        expires_at = datetime.now() + timedelta(seconds=self.lease_seconds)
+        try:
+            renewed = self.db_manager.writer.execute('''
+                UPDATE task_queue SET lease_expires_at = ?, updated_at = ?
+                WHERE task_id = ? AND lease_id = ?
+            ''', (expires_at, datetime.now(), task['task_id'], lease_id))
+            if renewed == 0:
+                return None
+        except Exception as e:
+            logger.error(f"续约失败: {e}")
+            return None
+
+        with self._lock:
+            lease['expires_at'] = expires_at
+
+        for event in events or []:
+            self.task_queue._notify_status_change(task['task_id'], TaskStatus.RUNNING, event.get('message', ''), event)
+
+        for phase in phases or []:
+            self.task_queue.throughput_model.record(
+                task['city'], phase.get('category_id'), phase.get('page_num'),
+                phase.get('phase'), phase.get('seconds')
+            )
+            if phase.get('phase') and phase.get('seconds') is not None:
+                CRAWLER_PHASE_SECONDS.observe(phase['seconds'], phase=phase['phase'])
+
+        return {'lease_id': lease_id, 'expires_at': expires_at.isoformat()}
+
+    def submit_results(self, lease_id: str, pages: List[Dict]) -> Optional[int]:
+        """
+        接收一批页面结果
+
+        Args:
+            pages: [{'category_id', 'category_name', 'page_num', 'shops': [...], 'from_cache': bool}]
+
+        Returns:
+            本批新接收的商铺数，租约已失效时返回None
+        """
+        lease = self._get_lease(lease_id)
+        if not lease:
+            return None
+
+        task = lease['task']
+        sort_type = task.get('sort_type') or 'popularity'
+        accepted = 0
+
+        with self._lock:
+            new_pages = []
+            for page in pages:
+                key = (page.get('category_id'), page.get('page_num'))
+                if key in lease['pages']:
+                    continue
+                lease['pages'].add(key)
+                new_pages.append(page)
+
+            rows = [shop for page in new_pages for shop in page.get('shops') or []]
+            if rows:
+                path = self._partial_path(task['task_id'])
+                write_header = lease['fieldnames'] is None
+                if write_header:
+                    lease['fieldnames'] = list(rows[0].keys())
+                os.makedirs(self.temp_dir, exist_ok=True)
+                with open(path, 'a', newline='', encoding='utf-8') as csvfile:
+                    writer = csv.DictWriter(csvfile, fieldnames=lease['fieldnames'], extrasaction='ignore')
+                    if write_header:
+                        writer.writeheader()
+                    writer.writerows(rows)
+
+            for page in new_pages:
+                shops = page.get('shops') or []
+                category_name = page.get('category_name')
+                lease['shops_per_category'][category_name] = lease['shops_per_category'].get(category_name, 0) + len(shops)
+                accepted += len(shops)
+            lease['total_shops'] += accepted
+
+        # 工作节点新爬取的页面写入商铺存储
+        if self.task_queue.shop_store:
+            for page in new_pages:
+                if page.get('shops') and not page.get('from_cache'):
+                    self.task_queue.shop_store.record_page(task['task_id'], page.get('category_name'), sort_type,
+                                                           page.get('page_num'), page['shops'])
+
+        # 工作节点新爬取的页面写入主服务的页面缓存
+        if self.task_queue.page_cache:
+            for page in new_pages:
+                if page.get('shops') and not page.get('from_cache'):
+                    self.task_queue.page_cache.put_page(task['city'], page.get('category_id'), sort_type,
+                                                        page.get('page_num'), page['shops'])
+
+        return accepted
+
+    def complete(self, lease_id: str, success: bool, stats: Dict = None, error: str = None) -> bool:
+        """工作节点报告任务结束（输出文件名和历史中的城市/品类名由主服务按任务参数确定）"""
+        lease = self._get_lease(lease_id)
+        if not lease:
+            return False
+
+        with self._lock:
+            self.leases.pop(lease_id, None)
+
+        task = lease['task']
+        task_id = task['task_id']
+        stats = stats or {}
+        partial_path = self._partial_path(task_id)
+
+        try:
+            if success:
+                try:
+                    city_name, category_names = resolve_task_names(task['city'], json.loads(task['categories']))
+                    output_file = None
+                    if lease['total_shops'] and os.path.exists(partial_path):
+                        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+                        output_file = f'custom_crawl_{city_name}_{"_".join(category_names)}_{timestamp}.csv'
+                        os.makedirs(self.outputs_dir, exist_ok=True)
+                        shutil.move(partial_path, os.path.join(self.outputs_dir, output_file))
+
+                    self.task_queue._complete_task(
+                        task, city_name, category_names, lease['total_shops'], lease['shops_per_category'],
+                        captcha_count=stats.get('captcha_count', 0),
+                        skipped_pages=stats.get('skipped_pages', 0),
+                        output_file=output_file
+                    )
+                except Exception as e:
+                    # 保存结果失败时任务记为失败，不能停留在运行中
+                    logger.error(f"保存工作节点 {lease['worker_id']} 的任务 {task_id} 结果失败: {e}")
+                    self.task_queue._fail_task(task_id, f"保存任务结果失败: {e}")
+            else:
+                self.task_queue._fail_task(task_id, error or "爬取任务执行失败")
+        finally:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            self.task_queue.throughput_model.flush()
+            self.task_queue._release_task(task_id)
+
+        logger.info(f"工作节点 {lease['worker_id']} 完成任务 {task_id}: 成功={success}, 商铺数={lease['total_shops']}")
+        return True
+
+    def _requeue(self, task_id: str, lease_id: str) -> bool:
+        """把租约失效的任务放回队列"""
+        try:
+            requeued = self.db_manager.writer.execute('''
+                UPDATE task_queue
+                SET status = 'pending', worker_id = NULL, lease_id = NULL, lease_expires_at = NULL, updated_at = ?
+                WHERE task_id = ? AND lease_id = ?
+            ''', (datetime.now(), task_id, lease_id)) == 1
+        except Exception as e:
+            logger.error(f"任务重新排队失败: {e}")
+            return False
+
+        partial_path = self._partial_path(task_id)
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+
+        if requeued:
+            self.db_manager.update_crawl_history(task_id, status='pending')
+            self.task_queue._notify_status_change(task_id, TaskStatus.PENDING, "工作节点租约过期，任务重新排队")
+        return requeued
+
+    def reap_expired(self) -> int:
+        """回收过期租约，返回重新排队的任务数"""
+        now = datetime.now()
+        with self._lock:
+            expired = [(lease_id, lease) for lease_id, lease in self.leases.items() if lease['expires_at'] < now]
+            for lease_id, _ in expired:
+                del self.leases[lease_id]
+
+        count = 0
+        for lease_id, lease in expired:
+            if self._requeue(lease['task']['task_id'], lease_id):
+                logger.warning(f"工作节点 {lease['worker_id']} 的租约 {lease_id} 已过期，任务 {lease['task']['task_id']} 重新排队")
+                count += 1
+
+        # 服务重启前发出、内存中已无记录的租约
+        try:
+            with self.db_manager.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT task_id, lease_id FROM task_queue
+                    WHERE status = 'leased' AND lease_expires_at < ?
+                ''', (now,))
+                orphans = cursor.fetchall()
+        except Exception as e:
+            logger.error(f"查询过期租约失败: {e}")
+            orphans = []
+
+        for task_id, lease_id in orphans:
+            with self._lock:
+                if lease_id in self.leases:
+                    continue
+            if self._requeue(task_id, lease_id):
+                count += 1
+
+        return count
+
+    def get_leases(self) -> List[Dict]:
+        """获取当前有效租约列表"""
+        with self._lock:
+            return [
+                {
+                    'lease_id': lease_id,
+                    'task_id': lease['task']['task_id'],
+                    'worker_id': lease['worker_id'],
+                    'acquired_at': lease['acquired_at'].isoformat(),
+                    'expires_at': lease['expires_at'].isoformat(),
+                    'pages_received': len(lease['pages']),
+                    'total_shops': lease['total_shops']
+                }
+                for lease_id, lease in self.leases.items()
+            ]
@@ -0,0 +1,372 @@
+"""
+爬虫日志性能报告 - 流式解析 data/logs/crawler_*.log，按任务和按天汇总爬取性能
+
+兼容带 [T:xxxxxxxx] 任务标记的新格式和不带标记的旧格式；逐行处理，
+内存占用只与同时进行中的任务数有关，与日志文件大小无关。
+
+旧格式的并发任务无法区分各自的日志行，这样的任务标记为重叠(overlapped)，
+只统计页数、商铺数等计数，不参与耗时、占比和分位数统计。
+"""
+
+import glob
+import os
+import re
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional
+
+LINE_RE = re.compile(r'^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}),(\d{3}) - ([A-Z]+) - (?:\[T:([0-9a-zA-Z_-]+)\] )?(.*)$')
+
+TASK_START_RE = re.compile(r'^\[TASK\] 🚀 开始爬取任务')
+TASK_CITY_RE = re.compile(r'^\[TASK\] 📍 城市: (.+?) \(')
+TASK_CATEGORIES_RE = re.compile(r'^\[TASK\] 📂 品类: \[(.*)\]')
+TASK_DONE_RE = re.compile(r'^\[TASK\] 🎉 任务完成')
+TASK_ERROR_RE = re.compile(r'^\[TASK\] ❌ 任务执行异常')
+
+PAGE_START_RE = re.compile(r'^\[PAGE\] 📄 第(\d+)页')
+LOAD_START_RE = re.compile(r'^\[PAGE\] 🔄 正在加载页面')
+LOAD_DONE_RE = re.compile(r'^\[PAGE\] ✅ 页面加载成功')
+PAGE_OK_RE = re.compile(r'^\[PAGE\] ✅ 第(\d+)页成功: (\d+) 个商铺(?: \(耗时([\d.]+)秒\))?')
+PAGE_EMPTY_RE = re.compile(r'^\[PAGE\] ⚠️ 第(\d+)页无数据(?: \(耗时([\d.]+)秒\))?')
+PAGE_ERROR_RE = re.compile(r'^\[PAGE\] ❌ 第(\d+)页异常')
+PAGE_SKIP_RE = re.compile(r'^\[(?:PAGE|CAPTCHA)\] (?:⏭️ |⚠️ 验证码等待超时，)跳过第(\d+)页')
+CACHE_HIT_RE = re.compile(r'^\[CACHE\] ♻️ 第(\d+)页命中缓存: (\d+) 个商铺')
+DELAY_RE = re.compile(r'^\[(?:DELAY|PRIVACY)\] ⏱️ (?:页面延迟|品类间延迟|初始随机延迟)[^:]*: ([\d.]+)秒')
+CAPTCHA_RE = re.compile(r'^\[CAPTCHA\] 🚨 检测到验证码')
+
+# 已结束的任务在多久之后不再等待其尾部汇总行；无结束标记的任务空闲多久后按未完成处理
+FINISH_GRACE = timedelta(seconds=60)
+STALE_AFTER = timedelta(hours=6)
+# 无标记任务开始时，上一个无标记任务刚开始不久或还在爬取某一页，视为两个任务并发
+OVERLAP_WINDOW = timedelta(seconds=10)
+
+class DurationHistogram:
+    """固定桶宽的耗时直方图，用固定内存估算分位数"""
+
+    def __init__(self, bucket_seconds: float = 0.5, max_seconds: float = 600):
+        self.bucket_seconds = bucket_seconds
+        self.buckets = [0] * (int(max_seconds / bucket_seconds) + 1)  # 最后一个桶存放超出上限的值
+        self.count = 0
+        self.total = 0.0
+        self.max_value = 0.0
+
+    def add(self, seconds: float):
+        index = min(int(seconds / self.bucket_seconds), len(self.buckets) - 1)
+        self.buckets[index] += 1
+        self.count += 1
+        self.total += seconds
+        self.max_value = max(self.max_value, seconds)
+
+    def merge(self, other: 'DurationHistogram'):
+        for i, n in enumerate(other.buckets):
+            self.buckets[i] += n
+        self.count += other.count
+        self.total += other.total
+        self.max_value = max(self.max_value, other.max_value)
+
+    def mean(self) -> Optional[float]:
+        return self.total / self.count if self.count else None
+
+    def percentile(self, q: float) -> Optional[float]:
+        """返回分位数所在桶的上界（不超过观测到的最大值）"""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= target:
+                return min((i + 1) * self.bucket_seconds, self.max_value)
+        return self.max_value
+
+class CrawlStats:
+    """一个任务或一天的累计指标"""
+
+    COUNTERS = ('tasks', 'completed', 'failed', 'incomplete', 'overlapped', 'pages_attempted', 'pages_ok',
+                'pages_empty', 'pages_error', 'pages_skipped', 'pages_cached', 'shops', 'cached_shops', 'captchas')
+    SECONDS = ('wall_seconds', 'load_seconds', 'processing_seconds', 'delay_seconds')
+    # 依赖耗时的汇总指标，重叠任务不输出
+    TIMINGS = ('pages_per_hour', 'page_mean_seconds', 'page_p95_seconds', 'delay_share', 'load_share',
+               'processing_share')
+
+    def __init__(self):
+        for name in self.COUNTERS + self.SECONDS:
+            setattr(self, name, 0)
+        self.page_durations = DurationHistogram()
+
+    def merge(self, other: 'CrawlStats', timings: bool = True):
+        """累加另一个统计；timings为False时只累加计数，不累加耗时和页面耗时分布"""
+        for name in self.COUNTERS:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        if timings:
+            for name in self.SECONDS:
+                setattr(self, name, getattr(self, name) + getattr(other, name))
+            self.page_durations.merge(other.page_durations)
+
+    def summary(self) -> Dict:
+        crawled = self.pages_ok + self.pages_empty
+        timed_pages = self.page_durations.count  # 参与耗时统计的页（不含重叠任务的页）
+        hours = self.wall_seconds / 3600
+        wall = self.wall_seconds or None
+
+        def share(seconds):
+            # 延迟在休眠开始前记录，任务在休眠中被中断时可能超过总耗时
+            return min(round(seconds / wall, 3), 1.0) if wall else None
+
+        mean = self.page_durations.mean()
+        p95 = self.page_durations.percentile(0.95)
+        data = {name: getattr(self, name) for name in self.COUNTERS}
+        data.update({name: round(getattr(self, name), 1) for name in self.SECONDS})
+        data.update({
+            'pages_per_hour': round(timed_pages / hours, 1) if hours > 0 else None,
+            'page_mean_seconds': round(mean, 1) if mean is not None else None,
+            'page_p95_seconds': round(p95, 1) if p95 is not None else None,
+            'delay_share': share(self.delay_seconds),
+            'load_share': share(self.load_seconds),
+            'processing_share': share(self.processing_seconds),
+            'captcha_rate': round(self.captchas / self.pages_attempted, 3) if self.pages_attempted else None,
+            'skip_rate': round(self.pages_skipped / self.pages_attempted, 3) if self.pages_attempted else None,
+            'shops_per_page': round(self.shops / crawled, 1) if crawled else None
+        })
+        return data
+
+class _TaskState:
+    """解析中的单个任务"""
+
+    def __init__(self, tag: str, started_at: datetime):
+        self.tag = tag
+        self.started_at = started_at
+        self.last_seen = started_at
+        self.last_active = started_at  # 最后一条本任务的带标签日志（不含分隔线，分隔线可能属于下一个任务）
+        self.finished_at = None
+        self.status = 'incomplete'
+        self.overlapped = False
+        self.city = None
+        self.categories = None
+        self.stats = CrawlStats()
+        self.stats.tasks = 1
+        self.page_started = None
+        self.load_started = None
+        self.load_done = None
+
+    def end_page(self, ts: datetime, duration: Optional[float]):
+        """一页结束：记录页面耗时和处理耗时（加载完成到出结果，含行为模拟和解析）"""
+        if duration is None and self.page_started:
+            duration = (ts - self.page_started).total_seconds()
+        if duration is not None:
+            self.stats.page_durations.add(duration)
+        if self.load_done:
+            self.stats.processing_seconds += (ts - self.load_done).total_seconds()
+        self.page_started = self.load_started = self.load_done = None
+
+    def report(self) -> Dict:
+        end = self.finished_at or self.last_seen
+        self.stats.wall_seconds = max(0.0, (end - self.started_at).total_seconds())
+        setattr(self.stats, self.status, 1)
+        self.stats.overlapped = 1 if self.overlapped else 0
+        data = {
+            'task': self.tag or None,
+            'started_at': self.started_at.strftime('%Y-%m-%d %H:%M:%S'),
+            'date': self.started_at.strftime('%Y-%m-%d'),
+            'status': self.status,
+            'city': self.city,
+            'categories': self.categories
+        }
+        data.update(self.stats.summary())
+        if self.overlapped:
+            # 日志行可能属于与之并发的任务，耗时类指标没有意义
+            data.update({name: None for name in CrawlStats.SECONDS + CrawlStats.TIMINGS})
+        return data
+
+def iter_log_lines(paths: Iterable[str]) -> Iterator[str]:
+    """逐行读取多个日志文件（按给定顺序），不一次性读入内存"""
+    for path in paths:
+        with open(path, encoding='utf-8', errors='replace') as f:
+            for line in f:
+                yield line.rstrip('\n')
+
+def find_log_files(log_dir: str, since: str = None, until: str = None) -> List[str]:
+    """按日期顺序列出 crawler_YYYYMMDD.log，since/until 为 YYYYMMDD（含）"""
+    paths = []
+    for path in sorted(glob.glob(os.path.join(log_dir, 'crawler_*.log'))):
+        date_str = os.path.basename(path)[len('crawler_'):-len('.log')]
+        if since and date_str < since:
+            continue
+        if until and date_str > until:
+            continue
+        paths.append(path)
+    return paths
+
+class CrawlLogReport:
+    """
+    流式日志解析器
+
+    feed() 每处理完一个任务就返回其报告，按天的汇总保存在 days 中。新格式按
+    [T:xxxxxxxx] 标记区分并发任务，旧格式没有标记，按出现顺序视为串行任务；
+    前一个任务还没结束就出现的开始行，两个任务都标记为重叠。
+    """
+
+    def __init__(self):
+        self.open_tasks = {}  # 任务标记 -> _TaskState
+        self.days = {}        # YYYY-MM-DD -> CrawlStats
+        self.lines = 0
+        self.unparsed_lines = 0
+
+    def feed(self, line: str) -> List[Dict]:
+        """处理一行日志，返回这一行导致结束的任务报告"""
+        self.lines += 1
+        match = LINE_RE.match(line)
+        if not match:
+            # 异常堆栈等续行没有时间戳前缀
+            self.unparsed_lines += 1
+            return []
+
+        ts = datetime.strptime(match.group(1), '%Y-%m-%d %H:%M:%S').replace(microsecond=int(match.group(2)) * 1000)
+        tag = match.group(4) or ''
+        message = match.group(5)
+        finished = self._expire(ts)
+
+        task = self.open_tasks.get(tag)
+        if TASK_START_RE.match(message):
+            new_task = _TaskState(tag, ts)
+            if task:
+                if not tag and self._overlaps(task, ts):
+                    task.overlapped = new_task.overlapped = True
+                finished.append(self._finish(tag))
+            self.open_tasks[tag] = new_task
+            return finished
+        if task is None:
+            return finished
+
+        task.last_seen = ts
+        self._apply(task, ts, message)
+        return finished
+
+    @staticmethod
+    def _overlaps(task: _TaskState, ts: datetime) -> bool:
+        """无标记任务开始时，上一个无标记任务是否可能仍在执行"""
+        if task.finished_at:
+            return False
+        if ts - task.started_at <= OVERLAP_WINDOW:
+            return True
+        # 还在爬取某一页（或与它并发的任务可能还在执行），且最近仍有日志；长时间无日志的是已中断的任务
+        return (task.page_started is not None or task.overlapped) and ts - task.last_active <= FINISH_GRACE
+
+    def _apply(self, task: _TaskState, ts: datetime, message: str):
+        stats = task.stats
+        if not message.startswith('[') or message.startswith(('[INFO]', '[SUCCESS]', '[WARNING]', '[ERROR]')):
+            # 状态回显行与带标签的日志重复，忽略
+            return
+        task.last_active = ts
+
+        if PAGE_START_RE.match(message):
+            stats.pages_attempted += 1
+            task.page_started = ts
+            task.load_started = task.load_done = None
+            return
+        if LOAD_START_RE.match(message):
+            task.load_started = ts
+            return
+        if LOAD_DONE_RE.match(message):
+            if task.load_started:
+                stats.load_seconds += (ts - task.load_started).total_seconds()
+            task.load_done = ts
+            return
+
+        m = PAGE_OK_RE.match(message)
+        if m:
+            stats.pages_ok += 1
+            stats.shops += int(m.group(2))
+            task.end_page(ts, float(m.group(3)) if m.group(3) else None)
+            return
+        m = PAGE_EMPTY_RE.match(message)
+        if m:
+            stats.pages_empty += 1
+            task.end_page(ts, float(m.group(2)) if m.group(2) else None)
+            return
+        if PAGE_ERROR_RE.match(message):
+            stats.pages_error += 1
+            if task.load_started and not task.load_done:
+                stats.load_seconds += (ts - task.load_started).total_seconds()
+            task.page_started = task.load_started = task.load_done = None
+            return
+        if PAGE_SKIP_RE.match(message):
+            stats.pages_skipped += 1
+            return
+        m = CACHE_HIT_RE.match(message)
+        if m:
+            stats.pages_cached += 1
+            stats.cached_shops += int(m.group(2))
+            return
+        m = DELAY_RE.match(message)
+        if m:
+            stats.delay_seconds += float(m.group(1))
+            return
+        if CAPTCHA_RE.match(message):
+            stats.captchas += 1
+            return
+
+        m = TASK_CITY_RE.match(message)
+        if m:
+            task.city = m.group(1)
+            return
+        m = TASK_CATEGORIES_RE.match(message)
+        if m:
+            task.categories = [name.strip().strip('\'"') for name in m.group(1).split(',') if name.strip()]
+            return
+        if TASK_DONE_RE.match(message):
+            task.status = 'completed'
+            task.finished_at = ts
+        elif TASK_ERROR_RE.match(message):
+            task.status = 'failed'
+            task.finished_at = ts
+
+    def _expire(self, now: datetime) -> List[Dict]:
+        """结束已完成且过了宽限期的任务，以及长时间无日志的任务"""
+        expired = [
+            tag for tag, task in self.open_tasks.items()
+            if (task.finished_at and now - task.last_seen > FINISH_GRACE) or now - task.last_seen > STALE_AFTER
+        ]
+        return [self._finish(tag) for tag in expired]
+
+    def _finish(self, tag: str) -> Dict:
+        task = self.open_tasks.pop(tag)
+        report = task.report()
+        self.days.setdefault(report['date'], CrawlStats()).merge(task.stats, timings=not task.overlapped)
+        return report
+
+    def close(self) -> List[Dict]:
+        """日志读完后结束所有剩余任务"""
+        return [self._finish(tag) for tag in list(self.open_tasks)]
+
+    def day_reports(self) -> List[Dict]:
+        return [dict(date=date, **self.days[date].summary()) for date in sorted(self.days)]
+
+def build_report(paths: Iterable[str], on_task=None) -> Dict:
+    """
+    解析日志文件并生成报告
+
+    Args:
+        paths: 日志文件路径（按时间顺序）
+        on_task: 每个任务结束时的回调；为None时任务报告收集到返回值中
+    """
+    parser = CrawlLogReport()
+    tasks = []
+    emit = on_task or tasks.append
+
+    for line in iter_log_lines(paths):
+        for report in parser.feed(line):
+            emit(report)
+    for report in parser.close():
+        emit(report)
+
+    total = CrawlStats()
+    for stats in parser.days.values():
+        total.merge(stats)
+
+    return {
+        'tasks': tasks,
+        'days': parser.day_reports(),
+        'total': total.summary(),
+        'lines': parser.lines,
+        'unparsed_lines': parser.unparsed_lines
+    }
@@ -0,0 +1,214 @@
+"""
+进程内指标注册表 - 计数器、仪表和直方图，以Prometheus文本格式暴露在 /metrics
+
+指标在事件发生时更新（只是内存中的加法），抓取时只需把当前值格式化成文本。
+仪表也可以绑定一个取值函数，抓取时调用：读取内存状态，或执行一条走索引的计数查询（待领取任务数）。
+"""
+
+import bisect
+import threading
+from typing import Callable, Dict, List, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence, extra: Tuple = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _format_value(value) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+class _Metric:
+    """指标基类：按标签值保存数据"""
+
+    metric_type = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict) -> Tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"指标 {self.name} 需要标签 {self.labelnames}，实际为 {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.metric_type}']
+        lines.extend(self._samples())
+        return '\n'.join(lines)
+
+class Counter(_Metric):
+    """只增不减的计数器"""
+
+    metric_type = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items()) or ([((), 0)] if not self.labelnames else [])
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}' for key, value in items]
+
+class Gauge(_Metric):
+    """可增可减的仪表；也可以绑定函数，抓取时读取当前值"""
+
+    metric_type = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._function = None
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, function: Callable[[], float]):
+        """绑定取值函数（只能用于无标签的仪表，函数应只读内存状态或执行走索引的小查询）"""
+        self._function = function
+
+    def _samples(self) -> List[str]:
+        if self._function is not None:
+            try:
+                value = self._function()
+            except Exception:
+                return []
+            return [f'{self.name} {_format_value(value)}']
+        with self._lock:
+            items = sorted(self._values.items()) or ([((), 0)] if not self.labelnames else [])
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}' for key, value in items]
+
+class Histogram(_Metric):
+    """固定桶的直方图"""
+
+    metric_type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            data = self._values.get(key)
+            if data is None:
+                data = self._values[key] = {'counts': [0] * (len(self.buckets) + 1), 'sum': 0.0, 'count': 0}
+            data['counts'][index] += 1
+            data['sum'] += value
+            data['count'] += 1
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(data['counts']), data['sum'], data['count'])
+                     for key, data in sorted(self._values.items())]
+
+        lines = []
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float('inf'),), counts):
+                cumulative += n
+                labels = _format_labels(self.labelnames, key, ('le', _format_value(float(bound))))
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(round(total, 6))}')
+            lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+class MetricsRegistry:
+    """指标注册表（同名指标只注册一次）"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric_class, name, documentation, labelnames=(), **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = metric_class(name, documentation, labelnames, **kwargs)
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self) -> str:
+        """生成Prometheus文本格式（version 0.0.4）"""
+        with self._lock:
+            metrics = [self._metrics[name] for name in sorted(self._metrics)]
+        return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+REGISTRY = MetricsRegistry()
+
+# 爬虫
+CRAWLER_PAGES = REGISTRY.counter('crawler_pages_total', '处理的列表页数（按结果）', ('result',))
+CRAWLER_SHOPS = REGISTRY.counter('crawler_shops_total', '提取到的商铺数')
+CRAWLER_CAPTCHAS = REGISTRY.counter('crawler_captcha_events_total', '检测到验证码的次数')
+CRAWLER_GOTO_SECONDS = REGISTRY.histogram('crawler_page_goto_seconds', 'page.goto 耗时(秒)',
+                                          buckets=(0.5, 1, 2, 3, 5, 8, 13, 20, 30))
+CRAWLER_PARSE_SECONDS = REGISTRY.histogram('crawler_parse_seconds', '单页商铺提取耗时(秒)',
+                                           buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5))
+CRAWLER_PHASE_SECONDS = REGISTRY.histogram('crawler_phase_seconds', '爬取各阶段耗时(秒)，含远程工作节点上报',
+                                           ('phase',), buckets=(0.1, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300))
+
+# 任务队列
+QUEUE_PENDING = REGISTRY.gauge('task_queue_pending_tasks', '等待领取的任务数')
+QUEUE_RUNNING = REGISTRY.gauge('task_queue_running_tasks', '本地正在执行的任务数')
+QUEUE_SLOTS = REGISTRY.gauge('task_queue_slots', '本地可同时执行的任务数')
+QUEUE_SLOT_UTILIZATION = REGISTRY.gauge('task_queue_slot_utilization', '本地执行槽位占用率(0-1)')
+QUEUE_ACTIVE_LEASES = REGISTRY.gauge('worker_active_leases', '远程工作节点持有的租约数')
+TASKS_FINISHED = REGISTRY.counter('task_queue_tasks_finished_total', '结束的任务数（按状态）', ('status',))
+TASK_SECONDS = REGISTRY.histogram('task_queue_task_seconds', '任务执行耗时(秒)',
+                                  buckets=(30, 60, 120, 300, 600, 1200, 1800, 3600, 7200))
+
+# 高德补全
+GAODE_REQUESTS = REGISTRY.counter('gaode_requests_total', '高德API请求数（按结果），QPS用rate()计算', ('result',))
+GAODE_REQUEST_SECONDS = REGISTRY.histogram('gaode_request_seconds', '高德API单次请求耗时(秒)',
+                                           buckets=(0.05, 0.1, 0.2, 0.5, 1, 2, 5, 10))
+
+# 缓存
+CACHE_LOOKUPS = REGISTRY.counter('cache_lookups_total', '缓存查询次数（按缓存和结果），命中率=hit/总数',
+                                 ('cache', 'result'))
+
+# 日志和状态管道
+LOG_DROPPED = REGISTRY.counter('crawler_log_dropped_total', '日志队列已满时丢弃的日志条数')
+STATUS_UPDATES = REGISTRY.counter('crawler_status_updates_total', '状态管道更新数（submitted/delivered/dropped）',
+                                  ('stage',))
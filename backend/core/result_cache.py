@@ -0,0 +1,176 @@
+"""
+列表页结果缓存 - 按(城市代码, 品类ID, 排序, 页码)缓存最近爬取的商铺数据
+"""
+
+import csv
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from ..models.database import DatabaseManager
+from .custom_crawler import OUTPUT_FIELDS
+
+logger = logging.getLogger(__name__)
+
+class PageResultCache:
+    """带新鲜度的列表页结果缓存"""
+
+    def __init__(self, db_manager: DatabaseManager, ttl_hours: float = 6):
+        self.db_manager = db_manager
+        self.ttl_hours = ttl_hours
+
+    def _cutoff(self, max_age_hours: float = None) -> datetime:
+        """计算仍然新鲜的最早爬取时间"""
+        hours = self.ttl_hours if max_age_hours is None else max_age_hours
+        return datetime.now() - timedelta(hours=hours)
+
+    def get_page(self, city_code: str, category_id: str, sort_type: str, page_num: int,
+                 max_age_hours: float = None) -> Optional[List[Dict]]:
+        """获取一页新鲜的缓存数据，不存在或已过期时返回None"""
+        try:
+            with self.db_manager.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT shops FROM page_cache
+                    WHERE city_code = ? AND category_id = ? AND sort_type = ? AND page_num = ?
+                      AND crawled_at >= ?
+                ''', (city_code, category_id, sort_type, page_num, self._cutoff(max_age_hours)))
+
+                row = cursor.fetchone()
+                return json.loads(row[0]) if row else None
+
+        except Exception as e:
+            logger.error(f"读取页面缓存失败: {e}")
+            return None
+
+    def put_page(self, city_code: str, category_id: str, sort_type: str, page_num: int,
+                 shops: List[Dict]) -> bool:
+        """写入一页爬取结果"""
+        try:
+            self.db_manager.writer.execute('''
+                INSERT OR REPLACE INTO page_cache
+                (city_code, category_id, sort_type, page_num, shops, shop_count, crawled_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (city_code, category_id, sort_type, page_num, json.dumps(shops, ensure_ascii=False),
+                  len(shops), datetime.now()))
+            return True
+
+        except Exception as e:
+            logger.error(f"写入页面缓存失败: {e}")
+            return False
+
+    def plan_range(self, city_code: str, category_ids: List[str], sort_type: str,
+                   start_page: int, end_page: int, max_age_hours: float = None) -> Dict:
+        """
+        检查页数范围内哪些页可以直接使用缓存
+
+        Returns:
+            {
+                'cached_pages': {category_id: [页码...]},
+                'missing_pages': {category_id: [页码...]},
+                'fully_cached': bool,
+                'cutoff': 判断新鲜度用的最早爬取时间（传给load_range，保证按同一标准读取）
+            }
+        """
+        cutoff = self._cutoff(max_age_hours)
+        cached_pages = {category_id: [] for category_id in category_ids}
+
+        try:
+            with self.db_manager.get_connection() as conn:
+                cursor = conn.cursor()
+                for category_id in category_ids:
+                    cursor.execute('''
+                        SELECT page_num FROM page_cache
+                        WHERE city_code = ? AND category_id = ? AND sort_type = ?
+                          AND page_num BETWEEN ? AND ? AND crawled_at >= ?
+                        ORDER BY page_num
+                    ''', (city_code, category_id, sort_type, start_page, end_page, cutoff))
+                    cached_pages[category_id] = [row[0] for row in cursor.fetchall()]
+
+        except Exception as e:
+            logger.error(f"检查页面缓存失败: {e}")
+            cached_pages = {category_id: [] for category_id in category_ids}
+
+        missing_pages = {}
+        for category_id in category_ids:
+            cached = set(cached_pages[category_id])
+            missing_pages[category_id] = [p for p in range(start_page, end_page + 1) if p not in cached]
+
+        return {
+            'cached_pages': cached_pages,
+            'missing_pages': missing_pages,
+            'fully_cached': all(not pages for pages in missing_pages.values()),
+            'cutoff': cutoff
+        }
+
+    def load_range(self, city_code: str, category_ids: List[str], sort_type: str,
+                   start_page: int, end_page: int, cutoff: datetime = None) -> Dict[str, Dict[int, List[Dict]]]:
+        """
+        逐页读取整个范围的缓存数据
+
+        Args:
+            cutoff: 最早的爬取时间，传入plan_range返回的cutoff以使用与计划相同的新鲜度标准
+
+        Returns:
+            {category_id: {页码: 商铺列表}}，只包含读取到的新鲜页（空页为空列表）；
+            页在计划之后过期、被清理或读取失败时不在结果中
+        """
+        if cutoff is None:
+            cutoff = self._cutoff()
+        pages = {category_id: {} for category_id in category_ids}
+
+        try:
+            with self.db_manager.get_connection() as conn:
+                cursor = conn.cursor()
+                for category_id in category_ids:
+                    cursor.execute('''
+                        SELECT page_num, shops FROM page_cache
+                        WHERE city_code = ? AND category_id = ? AND sort_type = ?
+                          AND page_num BETWEEN ? AND ? AND crawled_at >= ?
+                    ''', (city_code, category_id, sort_type, start_page, end_page, cutoff))
+                    for page_num, shops in cursor.fetchall():
+                        pages[category_id][page_num] = json.loads(shops)
+
+        except Exception as e:
+            logger.error(f"读取页面缓存失败: {e}")
+            return {category_id: {} for category_id in category_ids}
+
+        return pages
+
+    def purge_expired(self) -> int:
+        """删除已过期的缓存页，返回删除数量"""
+        try:
+            return self.db_manager.writer.execute('DELETE FROM page_cache WHERE crawled_at < ?', (self._cutoff(),))
+        except Exception as e:
+            logger.error(f"清理过期页面缓存失败: {e}")
+            return 0
+
+def export_cached_rows(rows: List[Dict], city_name: str, category_names: List[str], output_dir: str) -> Optional[Dict]:
+    """把缓存数据导出为与爬虫输出一致的CSV文件"""
+    if not rows:
+        return None
+
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    categories_str = "_".join(category_names)
+    filename = f'custom_crawl_{city_name}_{categories_str}_{timestamp}.csv'
+    filepath = os.path.join(output_dir, filename)
+
+    try:
+        os.makedirs(output_dir, exist_ok=True)
+        with open(filepath, 'w', newline='', encoding='utf-8') as csvfile:
+            # 与爬虫保存的文件列相同；缓存行中多出的键忽略
+            writer = csv.DictWriter(csvfile, fieldnames=OUTPUT_FIELDS, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(rows)
+
+        return {
+            'filename': filename,
+            'filepath': filepath,
+            'total_shops': len(rows)
+        }
+
+    except Exception as e:
+        logger.error(f"导出缓存数据失败: {e}")
+        return None
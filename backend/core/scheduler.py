@@ -0,0 +1,129 @@
+"""
+公平分享调度器 - 优先级老化 + 按Cookie账号和提交人分摊执行机会
+"""
+
+import math
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional
+
+def parse_db_time(value) -> Optional[datetime]:
+    """解析SQLite CURRENT_TIMESTAMP写入的UTC时间"""
+    if isinstance(value, datetime):
+        return value
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+
+def percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    """最近秩法计算分位数"""
+    if not sorted_values:
+        return None
+    rank = math.ceil(pct / 100 * len(sorted_values))
+    return sorted_values[min(len(sorted_values), max(1, rank)) - 1]
+
+class FairShareScheduler:
+    """
+    公平分享调度
+
+    有效优先级 = 提交优先级 + 等待分钟数 / AGING_MINUTES
+                 - FAIR_SHARE_WEIGHT × (提交人近期使用量 + 账号近期使用量)
+
+    近期使用量每派发一个任务+1，并按半衰期指数衰减。一个提交人一次排入
+    大量任务时，后续任务的有效优先级逐渐降低，其他人的任务得以穿插执行；
+    而等待足够久的低优先级任务也会因老化最终被执行。
+    """
+
+    def __init__(self, config: Dict = None):
+        if config is None:
+            from config.crawler_config import SCHEDULER_CONFIG
+            config = SCHEDULER_CONFIG
+
+        self.aging_minutes = config.get('AGING_MINUTES', 10)
+        self.fair_share_weight = config.get('FAIR_SHARE_WEIGHT', 1.0)
+        self.half_life_minutes = config.get('USAGE_HALF_LIFE_MINUTES', 60)
+        self.wait_samples = config.get('WAIT_SAMPLES', 200)
+
+        self._usage = {}         # tenant -> (使用量, 更新时间)
+        self._waits = {}         # tenant -> deque[等待秒数]
+        self._dispatched = {}    # tenant -> 派发总数
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def tenants_of(task: Dict) -> List[str]:
+        """任务所属的租户：提交人 + Cookie账号"""
+        return [
+            f"submitter:{task.get('submitter') or 'anonymous'}",
+            f"account:{task.get('cookie_hash') or 'unknown'}"
+        ]
+
+    def _decayed_usage(self, tenant: str, now: datetime) -> float:
+        value, updated_at = self._usage.get(tenant, (0.0, now))
+        elapsed_minutes = max(0.0, (now - updated_at).total_seconds() / 60)
+        return value * 0.5 ** (elapsed_minutes / self.half_life_minutes)
+
+    def effective_priority(self, task: Dict, now: datetime) -> float:
+        """计算任务的有效优先级（now为UTC时间，与created_at一致）"""
+        created_at = parse_db_time(task.get('created_at')) or now
+        waited_minutes = max(0.0, (now - created_at).total_seconds() / 60)
+
+        score = (task.get('priority') or 0) + waited_minutes / self.aging_minutes
+        with self._lock:
+            usage = sum(self._decayed_usage(tenant, now) for tenant in self.tenants_of(task))
+        return score - self.fair_share_weight * usage
+
+    def select(self, candidates: List[Dict], now: datetime = None) -> Optional[Dict]:
+        """从等待中的任务里选出下一个要执行的任务"""
+        if not candidates:
+            return None
+        now = now or datetime.utcnow()
+        return max(
+            candidates,
+            key=lambda task: (self.effective_priority(task, now), -(parse_db_time(task.get('created_at')) or now).timestamp())
+        )
+
+    def record_dispatch(self, task: Dict, now: datetime = None):
+        """记录任务派发：累加租户使用量并保存等待时间样本"""
+        now = now or datetime.utcnow()
+        created_at = parse_db_time(task.get('created_at')) or now
+        waited_seconds = max(0.0, (now - created_at).total_seconds())
+
+        with self._lock:
+            for tenant in self.tenants_of(task):
+                self._usage[tenant] = (self._decayed_usage(tenant, now) + 1, now)
+                self._waits.setdefault(tenant, deque(maxlen=self.wait_samples)).append(waited_seconds)
+                self._dispatched[tenant] = self._dispatched.get(tenant, 0) + 1
+
+    def get_tenant_stats(self, pending_tasks: List[Dict], now: datetime = None) -> Dict:
+        """
+        按租户汇总队列深度和等待时间分位数
+
+        Args:
+            pending_tasks: 当前等待中的任务
+        """
+        now = now or datetime.utcnow()
+        depth = {}
+        for task in pending_tasks:
+            for tenant in self.tenants_of(task):
+                depth[tenant] = depth.get(tenant, 0) + 1
+
+        stats = {}
+        with self._lock:
+            tenants = set(depth) | set(self._waits)
+            for tenant in sorted(tenants):
+                waits = sorted(self._waits.get(tenant, []))
+                stats[tenant] = {
+                    'queue_depth': depth.get(tenant, 0),
+                    'dispatched': self._dispatched.get(tenant, 0),
+                    'recent_usage': round(self._decayed_usage(tenant, now), 3),
+                    'wait_seconds': {
+                        'p50': percentile(waits, 50),
+                        'p90': percentile(waits, 90),
+                        'p99': percentile(waits, 99)
+                    }
+                }
+        return stats
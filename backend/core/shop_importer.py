@@ -0,0 +1,194 @@
+"""
+输出文件导入 - 把 data/outputs 中已有的爬取结果CSV回填到商铺存储
+
+从文件名解析城市、品类和爬取时间：
+    custom_crawl_<城市>_<品类1>_<品类2>_<YYYYMMDD_HHMMSS>.csv       任务完成时保存的完整结果
+    custom_crawl_<城市>_<品类>_partial_<YYYYMMDD_HHMMSS>.csv        爬取过程中按品类增量保存
+    <原文件名>_with_tel_<YYYYMMDD_HHMMSS>.csv                       高德补全电话后的结果（多一个tel列）
+
+去重规则：
+- 内容完全相同的文件（按内容hash，记录在shop_imports表）只导入一次；
+- 同一次爬取的partial文件已被随后保存的完整文件包含时跳过；
+- 同一次爬取（按文件名中的城市、品类和时间）的观测按名次唯一，补全电话的文件只补充tel。
+
+逐行流式读取，每batch_size行交给写线程作为一个事务提交，内存占用与文件大小无关。
+"""
+
+import csv
+import hashlib
+import logging
+import os
+import re
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional
+
+from ..models.database import DatabaseManager
+from .shop_store import ShopStore
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_NAME_PATTERN = re.compile(
+    r'^custom_crawl_(?P<city>[^_]+)_(?P<categories>.+?)(?P<partial>_partial)?_(?P<timestamp>\d{8}_\d{6})'
+    r'(?:_with_tel_\d{8}_\d{6})?\.csv$')
+TEL_NAME_PATTERN = re.compile(r'_with_tel_(?P<timestamp>\d{8}_\d{6})\.csv$')
+
+# partial文件之后多久内保存的同城市完整文件视为同一次爬取
+PARTIAL_SUPERSEDE_WINDOW = timedelta(hours=6)
+
+def parse_output_name(filename: str) -> Optional[Dict]:
+    """解析输出文件名，不是爬取结果文件时返回None"""
+    match = OUTPUT_NAME_PATTERN.match(filename)
+    if not match:
+        return None
+    timestamp = datetime.strptime(match.group('timestamp'), '%Y%m%d_%H%M%S')
+    city = match.group('city')
+    categories = match.group('categories').split('_')
+    return {
+        'city': city,
+        'categories': categories,
+        'partial': bool(match.group('partial')),
+        'with_tel': bool(TEL_NAME_PATTERN.search(filename)),
+        'timestamp': timestamp,
+        # 同一次爬取的完整文件和补全电话文件得到相同的task_id，观测按名次去重
+        'task_id': f"import:{city}_{match.group('categories')}_{match.group('timestamp')}"
+    }
+
+def hash_file(path: str, chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class ShopImporter:
+    """爬取结果CSV导入器"""
+
+    def __init__(self, db_manager: DatabaseManager, shop_store: ShopStore = None, batch_size: int = 5000,
+                 sort_type: str = 'popularity'):
+        self.db_manager = db_manager
+        self.shop_store = shop_store or ShopStore(db_manager)
+        self.batch_size = batch_size
+        self.sort_type = sort_type  # 输出文件没有记录排序方式
+
+    @staticmethod
+    def plan(paths: Iterable[str]) -> List[Dict]:
+        """
+        按爬取时间排序待导入文件，并标记被完整文件包含的partial文件（只看文件名和修改时间，不访问数据库）
+
+        Returns:
+            [{'path', 'info', 'skip': 跳过原因或None}]
+        """
+        entries = []
+        for path in paths:
+            info = parse_output_name(os.path.basename(path))
+            if info is None:
+                if not TEL_NAME_PATTERN.search(os.path.basename(path)):
+                    continue
+                # 用户上传文件补全电话后的结果：城市/品类取自行内容，时间取文件修改时间
+                info = {'city': None, 'categories': [], 'partial': False, 'with_tel': True,
+                        'timestamp': datetime.fromtimestamp(os.path.getmtime(path)), 'task_id': None}
+            entries.append({'path': path, 'info': info, 'skip': None})
+
+        complete = [entry['info'] for entry in entries if entry['info']['city'] and not entry['info']['partial']]
+        for entry in entries:
+            info = entry['info']
+            if not info['partial'] or info['with_tel']:
+                continue
+            for other in complete:
+                if (other['city'] == info['city'] and info['categories'][0] in other['categories']
+                        and timedelta(0) <= other['timestamp'] - info['timestamp'] <= PARTIAL_SUPERSEDE_WINDOW):
+                    entry['skip'] = '已包含在同一次爬取的完整结果中'
+                    break
+
+        entries.sort(key=lambda entry: (entry['info']['timestamp'], entry['path']))
+        return entries
+
+    def _is_imported(self, file_hash: str) -> Optional[str]:
+        with self.db_manager.get_connection() as conn:
+            row = conn.execute('SELECT file_name FROM shop_imports WHERE file_hash = ?', (file_hash,)).fetchone()
+            return row[0] if row else None
+
+    def _write_batch(self, shop_rows: List[tuple], observation_rows: List[tuple], tel_rows: List[tuple]):
+        def operation(cursor):
+            ShopStore.write_rows(cursor, shop_rows, observation_rows)
+            if tel_rows:
+                cursor.executemany('UPDATE shops SET tel = ? WHERE shop_key = ?', tel_rows)
+        # 等待提交后再读下一批，内存中最多只有一批数据
+        self.db_manager.writer.submit(operation, wait=True)
+
+    def import_file(self, path: str, info: Dict) -> Dict:
+        """导入一个文件，返回 {'file', 'status': imported/duplicate/invalid, 'rows'}"""
+        file_name = os.path.basename(path)
+        file_hash = hash_file(path)
+        duplicate_of = self._is_imported(file_hash)
+        if duplicate_of:
+            return {'file': file_name, 'status': 'duplicate', 'rows': 0, 'duplicate_of': duplicate_of}
+
+        task_id = info['task_id'] or f'import:{file_hash[:16]}'
+        observed_at = info['timestamp']
+        default_category = info['categories'][0] if len(info['categories']) == 1 else None
+        page_size = self.shop_store.page_size
+
+        ranks = {}
+        shop_rows, observation_rows, tel_rows = [], [], []
+        imported = 0
+        with open(path, newline='', encoding='utf-8-sig') as csvfile:
+            reader = csv.DictReader(csvfile)
+            if not reader.fieldnames or 'shop_name' not in reader.fieldnames:
+                return {'file': file_name, 'status': 'invalid', 'rows': 0, 'error': '缺少shop_name列'}
+
+            for shop in reader:
+                if not shop.get('city') and info['city']:
+                    shop['city'] = info['city']
+                category = shop.get('secondary_category') or default_category or ''
+                # 文件中每个品类的行按列表顺序排列，名次按品类分别计数
+                rank = ranks.get(category, 0) + 1
+                rows = self.shop_store.build_row(shop, task_id, category, self.sort_type,
+                                                 (rank - 1) // page_size + 1, rank, observed_at)
+                if not rows:
+                    continue
+                ranks[category] = rank
+                shop_rows.append(rows[0])
+                observation_rows.append(rows[1])
+                tel = (shop.get('tel') or '').strip()
+                if tel and tel.lower() != 'nan':
+                    tel_rows.append((tel, rows[0][0]))
+
+                if len(shop_rows) >= self.batch_size:
+                    self._write_batch(shop_rows, observation_rows, tel_rows)
+                    imported += len(shop_rows)
+                    shop_rows, observation_rows, tel_rows = [], [], []
+
+        if shop_rows:
+            self._write_batch(shop_rows, observation_rows, tel_rows)
+            imported += len(shop_rows)
+
+        # 整个文件写完才登记，中途失败时重新导入（观测按名次去重，不会重复）
+        self.db_manager.writer.execute('''
+            INSERT OR REPLACE INTO shop_imports (file_hash, file_name, task_id, row_count, imported_at)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (file_hash, file_name, task_id, imported, datetime.now()))
+        return {'file': file_name, 'status': 'imported', 'rows': imported}
+
+    def import_paths(self, paths: Iterable[str], progress: Callable[[Dict], None] = None) -> Dict:
+        """按计划依次导入文件，单个文件失败不影响其他文件"""
+        summary = {'imported': 0, 'duplicate': 0, 'superseded': 0, 'invalid': 0, 'failed': 0, 'rows': 0}
+        for entry in self.plan(paths):
+            if entry['skip']:
+                result = {'file': os.path.basename(entry['path']), 'status': 'superseded', 'rows': 0,
+                          'reason': entry['skip']}
+            else:
+                try:
+                    result = self.import_file(entry['path'], entry['info'])
+                except Exception as e:
+                    logger.error(f"导入 {entry['path']} 失败: {e}")
+                    result = {'file': os.path.basename(entry['path']), 'status': 'failed', 'rows': 0, 'error': str(e)}
+            summary[result['status']] += 1
+            summary['rows'] += result['rows']
+            if progress:
+                progress(result)
+        return summary
+
+    def import_directory(self, directory: str, progress: Callable[[Dict], None] = None) -> Dict:
+        paths = [os.path.join(directory, name) for name in os.listdir(directory) if name.endswith('.csv')]
+        return self.import_paths(paths, progress)
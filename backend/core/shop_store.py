@@ -0,0 +1,347 @@
+"""
+商铺数据存储 - 爬取结果按商铺身份写入shops表，每次观测写入shop_observations表
+
+爬虫每爬完一页就把该页商铺交给ShopStore，一页一个写操作（商铺批量upsert + 观测批量插入），
+由写线程合并提交，不等待结果。跨任务的问题（某店的评价数/名次变化、某品类的商铺）直接
+按索引查询，不需要再读取输出目录中的CSV文件。
+
+观测按变化点存储：同一商铺在同一品类列表（排序方式）中构成一个序列，名次、人均、评价数、
+评分都与该序列上一条记录相同时不写入，某时刻的值就是该时刻之前最近一条记录的值。
+商铺最后一次被看到的时间记录在shops.last_seen_at。
+
+大众点评列表页没有解析出商铺ID，商铺身份使用(城市, 店名)：店名通常带分店名，如"xx(万象城店)"。
+"""
+
+import hashlib
+import logging
+import re
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from ..models.database import DatabaseManager
+from .metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+SHOP_OBSERVATIONS = REGISTRY.counter('shop_observations_total',
+                                     '商铺观测数（written: 有变化写入，unchanged: 与上一条相同未写入）', ('result',))
+
+# 涨跌榜支持的指标及方向：名次数字变小是上升
+MOVER_METRICS = {'review_count': 1, 'rating': 1, 'avg_price': 1, 'rank': -1}
+
+# 每个列表页的商铺数，用于把(页码, 页内序号)换算成列表中的名次
+DEFAULT_PAGE_SIZE = 15
+
+def normalize_shop_name(name: str) -> str:
+    """去掉首尾和连续空白，作为身份的店名部分"""
+    return re.sub(r'\s+', ' ', (name or '').strip())
+
+def build_shop_key(city: str, shop_name: str) -> str:
+    """商铺的稳定身份：城市+规范化店名的hash"""
+    raw = f"{(city or '').strip()}|{normalize_shop_name(shop_name)}"
+    return hashlib.md5(raw.encode('utf-8')).hexdigest()[:16]
+
+def _to_int(value) -> Optional[int]:
+    try:
+        return int(float(value)) if value not in (None, '') else None
+    except (TypeError, ValueError):
+        return None
+
+def _to_float(value) -> Optional[float]:
+    try:
+        return float(value) if value not in (None, '') else None
+    except (TypeError, ValueError):
+        return None
+
+class ShopStore:
+    """商铺和观测记录的存储"""
+
+    def __init__(self, db_manager: DatabaseManager, page_size: int = DEFAULT_PAGE_SIZE):
+        self.db_manager = db_manager
+        self.page_size = page_size
+
+    def build_row(self, shop: Dict, task_id: str, category: str, sort_type: str, page_num: int, rank: int,
+                  observed_at: datetime) -> Optional[tuple]:
+        """把一条商铺数据转换为(商铺行, 观测行)，没有城市或店名时返回None"""
+        shop_name = normalize_shop_name(shop.get('shop_name'))
+        city = (shop.get('city') or '').strip()
+        if not shop_name or not city:
+            return None
+        shop_key = build_shop_key(city, shop_name)
+        avg_price = _to_int(shop.get('avg_price'))
+        review_count = _to_int(shop.get('review_count'))
+        rating = _to_float(shop.get('rating'))
+        category_name = shop.get('secondary_category') or category
+
+        shop_row = (shop_key, city, shop_name, shop.get('primary_category'), category_name,
+                    avg_price, review_count, rating, observed_at, observed_at)
+        observation_row = (shop_key, task_id, category_name, sort_type, page_num, rank,
+                           avg_price, review_count, rating, observed_at)
+        return shop_row, observation_row
+
+    def build_rows(self, task_id: str, category: str, sort_type: str, page_num: int,
+                   shops: List[Dict], observed_at: datetime = None, start_rank: int = None) -> tuple:
+        """
+        把一页商铺转换为(商铺行列表, 观测行列表)
+
+        名次默认按 (页码-1)*每页商铺数 + 页内序号 计算；没有店名的行跳过。
+        """
+        observed_at = observed_at or datetime.now()
+        if start_rank is None:
+            start_rank = (page_num - 1) * self.page_size + 1
+
+        shop_rows = []
+        observation_rows = []
+        for index, shop in enumerate(shops):
+            rows = self.build_row(shop, task_id, category, sort_type, page_num, start_rank + index, observed_at)
+            if rows:
+                shop_rows.append(rows[0])
+                observation_rows.append(rows[1])
+        return shop_rows, observation_rows
+
+    @staticmethod
+    def write_rows(cursor, shop_rows: List[tuple], observation_rows: List[tuple]):
+        """在写线程中执行：商铺upsert（只用更新的观测覆盖最新值）+ 有变化的观测插入，返回写入的观测数"""
+        cursor.executemany('''
+            INSERT INTO shops
+            (shop_key, city, shop_name, primary_category, secondary_category, avg_price, review_count, rating,
+             first_seen_at, last_seen_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(shop_key) DO UPDATE SET
+                primary_category = CASE WHEN excluded.last_seen_at >= last_seen_at
+                    THEN COALESCE(excluded.primary_category, primary_category) ELSE primary_category END,
+                secondary_category = CASE WHEN excluded.last_seen_at >= last_seen_at
+                    THEN COALESCE(excluded.secondary_category, secondary_category) ELSE secondary_category END,
+                avg_price = CASE WHEN excluded.last_seen_at >= last_seen_at
+                    THEN COALESCE(excluded.avg_price, avg_price) ELSE avg_price END,
+                review_count = CASE WHEN excluded.last_seen_at >= last_seen_at
+                    THEN COALESCE(excluded.review_count, review_count) ELSE review_count END,
+                rating = CASE WHEN excluded.last_seen_at >= last_seen_at
+                    THEN COALESCE(excluded.rating, rating) ELSE rating END,
+                first_seen_at = MIN(first_seen_at, excluded.first_seen_at),
+                last_seen_at = MAX(last_seen_at, excluded.last_seen_at)
+        ''', shop_rows)
+        # 只在与序列中该时刻之前最近一条记录不同时写入（补传的旧页面也和它之前的记录比较）
+        cursor.executemany('''
+            INSERT INTO shop_observations
+            (shop_id, task_id, category, sort_type, page_num, rank, avg_price, review_count, rating, observed_at)
+            SELECT s.id, ?2, ?3, ?4, ?5, ?6, ?7, ?8, ?9, ?10 FROM shops s
+            WHERE s.shop_key = ?1 AND NOT EXISTS (
+                SELECT 1 FROM shop_observations last
+                WHERE last.id = (
+                    SELECT id FROM shop_observations
+                    WHERE shop_id = s.id AND category = ?3 AND sort_type = ?4 AND observed_at <= ?10
+                    ORDER BY observed_at DESC LIMIT 1
+                )
+                AND last.rank IS ?6 AND last.avg_price IS ?7 AND last.review_count IS ?8 AND last.rating IS ?9
+            )
+            ON CONFLICT(task_id, category, sort_type, rank) DO NOTHING
+        ''', observation_rows)
+        written = max(cursor.rowcount, 0)
+        SHOP_OBSERVATIONS.inc(written, result='written')
+        SHOP_OBSERVATIONS.inc(len(observation_rows) - written, result='unchanged')
+        return written
+
+    def record_page(self, task_id: str, category: str, sort_type: str, page_num: int,
+                    shops: List[Dict], observed_at: datetime = None, wait: bool = False) -> bool:
+        """写入一页爬取结果（默认交给写线程后立即返回）"""
+        try:
+            shop_rows, observation_rows = self.build_rows(task_id, category, sort_type, page_num, shops, observed_at)
+            if not shop_rows:
+                return True
+            self.db_manager.writer.submit(
+                lambda cursor: self.write_rows(cursor, shop_rows, observation_rows), wait=wait)
+            return True
+
+        except Exception as e:
+            logger.error(f"写入商铺数据失败: {e}")
+            return False
+
+    def get_shop(self, shop_id: int) -> Optional[Dict]:
+        try:
+            with self.db_manager.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('SELECT * FROM shops WHERE id = ?', (shop_id,))
+                row = cursor.fetchone()
+                if not row:
+                    return None
+                columns = [description[0] for description in cursor.description]
+                return dict(zip(columns, row))
+
+        except Exception as e:
+            logger.error(f"读取商铺失败: {e}")
+            return None
+
+    def find_shops(self, city: str = None, category: str = None, name: str = None, limit: int = 50) -> List[Dict]:
+        """按城市/品类（走索引）和店名关键字查找商铺，最近观测到的在前"""
+        conditions, params = [], []
+        if city:
+            conditions.append('city = ?')
+            params.append(city)
+        if category:
+            conditions.append('secondary_category = ?')
+            params.append(category)
+        if name:
+            conditions.append('shop_name LIKE ?')
+            params.append(f'%{name}%')
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+        try:
+            with self.db_manager.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(f'''
+                    SELECT * FROM shops {where}
+                    ORDER BY last_seen_at DESC LIMIT ?
+                ''', params + [limit])
+                columns = [description[0] for description in cursor.description]
+                return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+        except Exception as e:
+            logger.error(f"查找商铺失败: {e}")
+            return []
+
+    def get_observations(self, shop_id: int, limit: int = 100) -> List[Dict]:
+        """一个商铺最近的变化记录（所有序列），按时间倒序"""
+        try:
+            with self.db_manager.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT task_id, category, sort_type, page_num, rank, avg_price, review_count, rating, observed_at
+                    FROM shop_observations WHERE shop_id = ?
+                    ORDER BY observed_at DESC LIMIT ?
+                ''', (shop_id, limit))
+                columns = [description[0] for description in cursor.description]
+                return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+        except Exception as e:
+            logger.error(f"读取商铺观测记录失败: {e}")
+            return []
+
+    def get_history(self, shop_id: int, days: int = None, category: str = None,
+                    sort_type: str = None) -> List[Dict]:
+        """
+        一个商铺的变化历史，按序列（品类, 排序方式）分组、按时间正序
+
+        指定days时只返回最近days天的变化，另带上窗口开始前的最后一条作为起始值。
+
+        Returns:
+            [{'category', 'sort_type', 'points': [{'observed_at', 'rank', ..., 'changed': [变化的字段]}]}]
+        """
+        conditions, params = ['o.shop_id = ?'], [shop_id]
+        if category:
+            conditions.append('o.category = ?')
+            params.append(category)
+        if sort_type:
+            conditions.append('o.sort_type = ?')
+            params.append(sort_type)
+        if days:
+            since = datetime.now() - timedelta(days=days)
+            conditions.append('''o.observed_at >= COALESCE((
+                SELECT MAX(b.observed_at) FROM shop_observations b
+                WHERE b.shop_id = o.shop_id AND b.category = o.category AND b.sort_type = o.sort_type
+                  AND b.observed_at < ?
+            ), ?)''')
+            params.extend([since, since])
+
+        try:
+            with self.db_manager.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(f'''
+                    SELECT o.category, o.sort_type, o.observed_at, o.task_id, o.page_num, o.rank,
+                           o.avg_price, o.review_count, o.rating
+                    FROM shop_observations o WHERE {' AND '.join(conditions)}
+                    ORDER BY o.category, o.sort_type, o.observed_at
+                ''', params)
+                rows = cursor.fetchall()
+
+        except Exception as e:
+            logger.error(f"读取商铺变化历史失败: {e}")
+            return []
+
+        series = []
+        previous = None
+        for category_name, sort_name, observed_at, task_id, page_num, rank, avg_price, review_count, rating in rows:
+            point = {'observed_at': observed_at, 'task_id': task_id, 'page_num': page_num, 'rank': rank,
+                     'avg_price': avg_price, 'review_count': review_count, 'rating': rating}
+            if not series or (series[-1]['category'], series[-1]['sort_type']) != (category_name, sort_name):
+                series.append({'category': category_name, 'sort_type': sort_name, 'points': []})
+                previous = None
+            point['changed'] = [field for field in MOVER_METRICS
+                                if previous is None or previous[field] != point[field]]
+            series[-1]['points'].append(point)
+            previous = point
+        return series
+
+    def get_top_movers(self, metric: str = 'review_count', days: int = 7, city: str = None, category: str = None,
+                       sort_type: str = None, direction: str = 'up', limit: int = 20) -> List[Dict]:
+        """
+        时间窗口内变化最大的商铺
+
+        按序列比较窗口开始前的最后一个值和窗口内的最新值，只扫描窗口内有变化的记录。
+        窗口开始前没有记录的序列（新出现的商铺、更早的记录已归档）以窗口内第一条记录为起始值。
+        名次以数字变小为上升。
+
+        Args:
+            metric: review_count / rating / avg_price / rank
+            direction: up（增加最多/名次上升最多）或 down
+        """
+        if metric not in MOVER_METRICS:
+            raise ValueError(f"不支持的指标: {metric}，可选 {', '.join(MOVER_METRICS)}")
+        if direction not in ('up', 'down'):
+            raise ValueError('direction 只能是 up 或 down')
+        sign = MOVER_METRICS[metric] * (1 if direction == 'up' else -1)
+        since = datetime.now() - timedelta(days=days)
+
+        conditions, params = ['observed_at >= ?'], [since]
+        if category:
+            conditions.append('category = ?')
+            params.append(category)
+        if sort_type:
+            conditions.append('sort_type = ?')
+            params.append(sort_type)
+        params.extend([since, since])
+        city_filter = ''
+        if city:
+            city_filter = 'AND s.city = ?'
+            params.append(city)
+        params.append(limit)
+
+        try:
+            with self.db_manager.get_connection() as conn:
+                cursor = conn.cursor()
+                # 聚合查询中与MAX()同行的裸列取自最大值所在的行，即窗口内的最新值
+                cursor.execute(f'''
+                    WITH latest AS (
+                        SELECT shop_id, category, sort_type, MAX(observed_at) AS observed_at,
+                               {metric} AS current_value
+                        FROM shop_observations WHERE {' AND '.join(conditions)}
+                        GROUP BY shop_id, category, sort_type
+                    ), moves AS (
+                        SELECT latest.*, COALESCE((
+                            SELECT b.{metric} FROM shop_observations b
+                            WHERE b.shop_id = latest.shop_id AND b.category = latest.category
+                              AND b.sort_type = latest.sort_type AND b.observed_at < ?
+                            ORDER BY b.observed_at DESC LIMIT 1
+                        ), (
+                            SELECT f.{metric} FROM shop_observations f
+                            WHERE f.shop_id = latest.shop_id AND f.category = latest.category
+                              AND f.sort_type = latest.sort_type AND f.observed_at >= ?
+                            ORDER BY f.observed_at LIMIT 1
+                        )) AS previous_value
+                        FROM latest
+                    )
+                    SELECT s.id AS shop_id, s.city, s.shop_name, m.category, m.sort_type,
+                           m.previous_value, m.current_value, m.current_value - m.previous_value AS change,
+                           m.observed_at
+                    FROM moves m JOIN shops s ON s.id = m.shop_id
+                    WHERE m.previous_value IS NOT NULL AND m.current_value IS NOT NULL
+                      AND (m.current_value - m.previous_value) * {sign} > 0 {city_filter}
+                    ORDER BY (m.current_value - m.previous_value) * {sign} DESC, s.id
+                    LIMIT ?
+                ''', params)
+                columns = [description[0] for description in cursor.description]
+                return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+        except Exception as e:
+            logger.error(f"查询商铺涨跌榜失败: {e}")
+            return []
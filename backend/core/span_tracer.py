@@ -0,0 +1,170 @@
+"""
+任务耗时追踪 - 记录爬虫各阶段的时间跨度，输出Chrome trace-event格式的JSON
+
+生成的 *.trace.json 可以直接拖进 chrome://tracing 或 https://ui.perfetto.dev 查看时间线，
+文件中的 otherData.summary 给出各阶段（按自身耗时，不含嵌套子阶段）占任务总耗时的比例。
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Optional
+
+class SpanTracer:
+    """单个任务的时间跨度记录器（写入时间线的事件数有上限，汇总统计不受上限影响）"""
+
+    def __init__(self, task_id: Optional[str] = None, enabled: bool = True, max_events: int = 20000):
+        self.task_id = task_id
+        self.enabled = enabled
+        self.max_events = max_events
+        self.started_at = datetime.now()
+        self._origin = time.perf_counter()
+        self._events = []
+        self._dropped_events = 0
+        self._totals = {}  # 名称 -> {'count', 'total', 'self'}
+        self._local = threading.local()
+        self._thread_ids = {}
+        self._lock = threading.Lock()
+
+    def _tid(self) -> int:
+        ident = threading.get_ident()
+        with self._lock:
+            return self._thread_ids.setdefault(ident, len(self._thread_ids) + 1)
+
+    def _append(self, event: Dict):
+        with self._lock:
+            if len(self._events) < self.max_events:
+                self._events.append(event)
+            else:
+                self._dropped_events += 1
+
+    @contextmanager
+    def span(self, name: str, category: str = 'crawl', **args):
+        """记录一个时间跨度；嵌套的子跨度耗时从父跨度的自身耗时中扣除"""
+        if not self.enabled:
+            yield
+            return
+
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        frame = {'children': 0.0}
+        stack.append(frame)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - started
+            stack.pop()
+            if stack:
+                stack[-1]['children'] += duration
+
+            with self._lock:
+                totals = self._totals.setdefault(name, {'count': 0, 'total': 0.0, 'self': 0.0})
+                totals['count'] += 1
+                totals['total'] += duration
+                totals['self'] += max(0.0, duration - frame['children'])
+
+            event = {
+                'name': name,
+                'cat': category,
+                'ph': 'X',
+                'ts': round((started - self._origin) * 1e6),
+                'dur': round(duration * 1e6),
+                'pid': 1,
+                'tid': self._tid()
+            }
+            args = {key: value for key, value in args.items() if value is not None}
+            if args:
+                event['args'] = args
+            self._append(event)
+
+    def instant(self, name: str, category: str = 'crawl', **args):
+        """记录一个瞬时事件（如检测到验证码）"""
+        if not self.enabled:
+            return
+        event = {
+            'name': name,
+            'cat': category,
+            'ph': 'i',
+            's': 't',
+            'ts': round((time.perf_counter() - self._origin) * 1e6),
+            'pid': 1,
+            'tid': self._tid()
+        }
+        args = {key: value for key, value in args.items() if value is not None}
+        if args:
+            event['args'] = args
+        self._append(event)
+
+    def has_spans(self) -> bool:
+        with self._lock:
+            return bool(self._totals)
+
+    def summary(self) -> Dict:
+        """各阶段的次数、总耗时、自身耗时及自身耗时占比；未被任何跨度覆盖的时间计为untraced"""
+        wall = time.perf_counter() - self._origin
+        with self._lock:
+            totals = {name: dict(values) for name, values in self._totals.items()}
+
+        phases = {}
+        traced = 0.0
+        for name, values in sorted(totals.items(), key=lambda item: item[1]['self'], reverse=True):
+            traced += values['self']
+            phases[name] = {
+                'count': values['count'],
+                'total_seconds': round(values['total'], 3),
+                'self_seconds': round(values['self'], 3),
+                'share': round(values['self'] / wall, 4) if wall > 0 else 0.0
+            }
+        untraced = max(0.0, wall - traced)
+        return {
+            'task_id': self.task_id,
+            'started_at': self.started_at.isoformat(),
+            'wall_seconds': round(wall, 3),
+            'untraced_seconds': round(untraced, 3),
+            'untraced_share': round(untraced / wall, 4) if wall > 0 else 0.0,
+            'dropped_events': self._dropped_events,
+            'phases': phases
+        }
+
+    def write(self, path: str) -> Dict:
+        """写入Chrome trace-event JSON，返回汇总"""
+        summary = self.summary()
+        with self._lock:
+            events = list(self._events)
+
+        metadata = [
+            {'name': 'process_name', 'ph': 'M', 'pid': 1, 'args': {'name': f'crawl {self.task_id or ""}'.strip()}}
+        ]
+        for ident, tid in self._thread_ids.items():
+            metadata.append({'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': tid,
+                             'args': {'name': 'crawler' if tid == 1 else f'thread-{tid}'}})
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'traceEvents': metadata + events,
+                'displayTimeUnit': 'ms',
+                'otherData': {'summary': summary}
+            }, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        return summary
+
+def traced(name: str, category: str = 'crawl'):
+    """方法装饰器：用实例的 self.tracer 记录整个方法调用的跨度"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            tracer = getattr(self, 'tracer', None)
+            if tracer is None:
+                return func(self, *args, **kwargs)
+            with tracer.span(name, category):
+                return func(self, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,139 @@
+"""
+状态更新管道 - 合并时间窗口内的爬虫状态更新，减少日志和监听方的压力
+"""
+
+import threading
+import time
+from typing import Callable, Dict
+
+from .metrics import STATUS_UPDATES
+
+# 所有管道的累计计数，用于评估合并窗口大小
+_global_stats = {'submitted': 0, 'delivered': 0, 'dropped': 0}
+_global_lock = threading.Lock()
+
+def get_global_stats() -> Dict:
+    """获取所有状态管道的累计计数"""
+    with _global_lock:
+        stats = dict(_global_stats)
+    stats['drop_rate'] = round(stats['dropped'] / stats['submitted'], 3) if stats['submitted'] else 0.0
+    return stats
+
+def _count(key: str, n: int = 1):
+    with _global_lock:
+        _global_stats[key] += n
+    STATUS_UPDATES.inc(n, stage=key)
+
+class StatusCoalescer:
+    """
+    状态更新合并器
+
+    同一时间窗口内的普通状态更新只投递最后一条（前一次投递超过窗口时立即投递，
+    否则暂存并在窗口结束时补发）。错误/警告等类型和进度100%的终态更新总是立即投递，
+    投递前先补发暂存的更新以保证顺序。被合并掉的更新计入dropped。
+    """
+
+    def __init__(self, deliver: Callable[[Dict], None], config: Dict = None,
+                 on_drop: Callable[[Dict], None] = None):
+        if config is None:
+            from config.crawler_config import STATUS_PIPELINE_CONFIG
+            config = STATUS_PIPELINE_CONFIG
+
+        self.deliver = deliver
+        self.on_drop = on_drop
+        self.window_seconds = config.get('WINDOW_SECONDS', 2.0)
+        self.immediate_types = set(config.get('IMMEDIATE_TYPES', ['error', 'warning']))
+
+        self.submitted = 0
+        self.delivered = 0
+        self.dropped = 0
+
+        self._pending = None
+        self._pending_merged = 0
+        self._last_delivery = 0.0
+        self._timer = None
+        self._closed = False
+        self._lock = threading.RLock()
+
+    def _is_immediate(self, status_info: Dict) -> bool:
+        return (status_info.get('type') in self.immediate_types
+                or (status_info.get('progress') or 0) >= 100)
+
+    def submit(self, status_info: Dict):
+        """提交一条状态更新"""
+        _count('submitted')
+
+        with self._lock:
+            self.submitted += 1
+            if self._closed or self.window_seconds <= 0 or self._is_immediate(status_info):
+                self._flush_pending()
+                self._deliver(status_info)
+                return
+
+            if self._pending is not None:
+                # 窗口内的新更新替换暂存的更新；进度只前进不回退
+                if status_info.get('progress') is None and self._pending.get('progress') is not None:
+                    status_info = dict(status_info, progress=self._pending['progress'])
+                self._drop(self._pending)
+                self._pending_merged += 1
+
+            if time.monotonic() - self._last_delivery >= self.window_seconds:
+                self._pending = None
+                self._deliver(status_info, self._pending_merged)
+                self._pending_merged = 0
+                return
+
+            self._pending = status_info
+            if self._timer is None:
+                delay = self.window_seconds - (time.monotonic() - self._last_delivery)
+                self._timer = threading.Timer(max(0.0, delay), self._on_timer)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _on_timer(self):
+        with self._lock:
+            self._timer = None
+            self._flush_pending()
+
+    def _flush_pending(self):
+        """立即补发暂存的更新（调用方持有锁）"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._pending is not None:
+            pending, merged = self._pending, self._pending_merged
+            self._pending = None
+            self._pending_merged = 0
+            self._deliver(pending, merged)
+
+    def _deliver(self, status_info: Dict, merged: int = 0):
+        if merged:
+            status_info = dict(status_info, merged_count=merged)
+        self._last_delivery = time.monotonic()
+        self.delivered += 1
+        _count('delivered')
+        self.deliver(status_info)
+
+    def _drop(self, status_info: Dict):
+        self.dropped += 1
+        _count('dropped')
+        if self.on_drop:
+            self.on_drop(status_info)
+
+    def flush(self):
+        """补发暂存的更新"""
+        with self._lock:
+            self._flush_pending()
+
+    def close(self):
+        """补发暂存的更新，之后的更新不再合并"""
+        with self._lock:
+            self._flush_pending()
+            self._closed = True
+
+    def get_stats(self) -> Dict:
+        return {
+            'submitted': self.submitted,
+            'delivered': self.delivered,
+            'dropped': self.dropped
+        }
@@ -0,0 +1,102 @@
+"""
+任务事件中心 - 每个任务一个有界环形缓冲区，供SSE推送和断线续传使用
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Tuple
+
+TERMINAL_STATUSES = ('completed', 'failed', 'cancelled')
+
+class TaskEventHub:
+    """
+    任务状态事件的发布/订阅中心
+
+    每个任务的事件按递增的event_id保存在固定长度的环形缓冲区中，订阅方带着
+    最后收到的event_id重连即可补齐遗漏的事件（超出缓冲区的旧事件会被丢弃）。
+    任务结束后缓冲区继续保留RETENTION_SECONDS，方便迟到的订阅方获取最终状态。
+    """
+
+    def __init__(self, config: Dict = None):
+        if config is None:
+            from config.crawler_config import TASK_EVENTS_CONFIG
+            config = TASK_EVENTS_CONFIG
+
+        self.max_events_per_task = config.get('MAX_EVENTS_PER_TASK', 500)
+        self.retention_seconds = config.get('RETENTION_SECONDS', 600)
+
+        self._buffers = {}  # task_id -> {'events': deque, 'next_id': int, 'closed_at': float}
+        self._cond = threading.Condition()
+
+    def _get_buffer(self, task_id: str) -> Dict:
+        buffer = self._buffers.get(task_id)
+        if buffer is None:
+            buffer = {
+                'events': deque(maxlen=self.max_events_per_task),
+                'next_id': 1,
+                'closed_at': None
+            }
+            self._buffers[task_id] = buffer
+        return buffer
+
+    def publish(self, task_id: str, event: Dict) -> int:
+        """发布一个事件，返回分配的event_id；终态事件会关闭该任务的事件流"""
+        with self._cond:
+            self._evict_expired()
+            buffer = self._get_buffer(task_id)
+            event_id = buffer['next_id']
+            buffer['next_id'] += 1
+            buffer['events'].append(dict(event, event_id=event_id))
+            if event.get('status') in TERMINAL_STATUSES:
+                buffer['closed_at'] = time.time()
+            self._cond.notify_all()
+            return event_id
+
+    def has_task(self, task_id: str) -> bool:
+        with self._cond:
+            return task_id in self._buffers
+
+    def get_events(self, task_id: str, after_id: int = 0) -> Tuple[List[Dict], bool]:
+        """
+        获取event_id大于after_id的事件
+
+        Returns:
+            (事件列表, 事件流是否已结束)
+        """
+        with self._cond:
+            buffer = self._buffers.get(task_id)
+            if buffer is None:
+                return [], False
+            events = [event for event in buffer['events'] if event['event_id'] > after_id]
+            return events, buffer['closed_at'] is not None
+
+    def wait_for_events(self, task_id: str, after_id: int = 0,
+                        timeout: float = 15) -> Tuple[List[Dict], bool]:
+        """阻塞等待新事件，超时返回空列表"""
+        deadline = time.time() + timeout
+        with self._cond:
+            while True:
+                events, closed = self.get_events(task_id, after_id)
+                remaining = deadline - time.time()
+                if events or closed or remaining <= 0:
+                    return events, closed
+                self._cond.wait(remaining)
+
+    def _evict_expired(self):
+        """删除已结束且超过保留时间的任务缓冲区（调用方持有锁）"""
+        now = time.time()
+        expired = [
+            task_id for task_id, buffer in self._buffers.items()
+            if buffer['closed_at'] is not None and now - buffer['closed_at'] > self.retention_seconds
+        ]
+        for task_id in expired:
+            del self._buffers[task_id]
+
+    def get_stats(self) -> Dict:
+        with self._cond:
+            return {
+                'tasks': len(self._buffers),
+                'open_streams': sum(1 for buffer in self._buffers.values() if buffer['closed_at'] is None),
+                'buffered_events': sum(len(buffer['events']) for buffer in self._buffers.values())
+            }
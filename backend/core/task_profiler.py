@@ -0,0 +1,258 @@
+"""
+任务性能剖析 - 按需对单个任务开启cProfile和tracemalloc，结果写入 data/profiles
+
+管理接口登记剖析请求后，执行任务的线程在任务开始和每页开始时检查请求（未登记任何请求时
+只是一次属性读取），在自己的线程上启动cProfile（cProfile只统计启动它的线程），
+收到停止请求或任务结束时写出：
+    <task_id>_<时间>.pstats      cProfile原始数据，可用 python -m pstats 或 snakeviz 打开
+    <task_id>_<时间>.cpu.txt     按累计耗时排序的函数列表
+    <task_id>_<时间>.memory.txt  任务开始/结束两次tracemalloc快照的差异（按分配位置排序）
+tracemalloc只在有内存剖析进行时开启，全部结束后关闭。
+"""
+
+import cProfile
+import io
+import logging
+import os
+import pstats
+import threading
+import tracemalloc
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 快照差异中排除剖析工具自身的分配
+_MEMORY_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>')
+]
+
+class TaskProfiler:
+    """按任务登记和执行性能剖析"""
+
+    def __init__(self, profiles_dir: str, memory_frames: int = 10, top_n: int = 30):
+        self.profiles_dir = profiles_dir
+        self.memory_frames = memory_frames
+        self.top_n = top_n
+        self.armed = False            # 有未开始或进行中的剖析时为True，检查点据此快速返回
+        self._requests = {}           # task_id -> 等待任务线程开始的剖析请求
+        self._sessions = {}           # task_id -> 进行中的剖析
+        self._memory_sessions = 0
+        self._started_tracemalloc = False
+        self._recent = deque(maxlen=50)
+        self._lock = threading.Lock()
+
+    def request(self, task_id: str, cpu: bool = True, memory: bool = False) -> Optional[Dict]:
+        """登记剖析请求，任务（排队中或执行中）的线程在下一个检查点开始剖析；已在剖析时返回None"""
+        if not cpu and not memory:
+            raise ValueError('cpu和memory至少开启一个')
+        with self._lock:
+            if task_id in self._sessions or task_id in self._requests:
+                return None
+            self._requests[task_id] = {
+                'task_id': task_id,
+                'cpu': cpu,
+                'memory': memory,
+                'requested_at': datetime.now().isoformat()
+            }
+            self.armed = True
+            return dict(self._requests[task_id])
+
+    def stop(self, task_id: str) -> bool:
+        """请求停止剖析：未开始的请求直接取消，进行中的在任务线程的下一个检查点写出结果"""
+        with self._lock:
+            if self._requests.pop(task_id, None):
+                self._update_armed()
+                return True
+            session = self._sessions.get(task_id)
+            if session is None:
+                return False
+            session['stop_requested'] = True
+            return True
+
+    def discard(self, task_id: str):
+        """丢弃还未开始的剖析请求（任务被取消、被远程工作节点领取或已结束，不会再到达本进程的检查点）"""
+        if not self.armed:
+            return
+        with self._lock:
+            if self._requests.pop(task_id, None):
+                self._update_armed()
+
+    def checkpoint(self, task_id: str):
+        """由执行任务的线程调用（任务开始、每页开始）：开始已登记的剖析或处理停止请求"""
+        if not self.armed:
+            return
+        with self._lock:
+            request = self._requests.pop(task_id, None)
+            session = self._sessions.get(task_id)
+        if request:
+            self._start(task_id, request)
+        elif session and session['stop_requested'] and session['thread'] == threading.get_ident():
+            self.finish(task_id)
+
+    def _start(self, task_id: str, request: Dict):
+        session = {
+            'task_id': task_id,
+            'cpu': None,
+            'memory_before': None,
+            'started_at': datetime.now(),
+            'thread': threading.get_ident(),
+            'stop_requested': False
+        }
+        if request['memory']:
+            with self._lock:
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start(self.memory_frames)
+                    self._started_tracemalloc = True
+                self._memory_sessions += 1
+            session['memory_before'] = tracemalloc.take_snapshot()
+        if request['cpu']:
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+                session['cpu'] = profile
+            except ValueError as e:
+                # 同一线程上已有其他剖析器
+                logger.warning(f"任务 {task_id} 无法开启cProfile: {e}")
+
+        with self._lock:
+            self._sessions[task_id] = session
+        logger.info(f"任务 {task_id} 开始性能剖析: cpu={session['cpu'] is not None}, "
+                    f"memory={session['memory_before'] is not None}")
+
+    def finish(self, task_id: str) -> Optional[Dict]:
+        """结束任务的剖析并写出结果（须在执行任务的线程上调用，任务结束时调用一次）"""
+        if not self.armed:
+            return None
+        with self._lock:
+            session = self._sessions.pop(task_id, None)
+        if session is None:
+            return None
+
+        profile = session['cpu']
+        if profile is not None:
+            profile.disable()
+
+        after = None
+        if session['memory_before'] is not None:
+            after = tracemalloc.take_snapshot()
+            with self._lock:
+                self._memory_sessions -= 1
+                if self._memory_sessions == 0 and self._started_tracemalloc:
+                    tracemalloc.stop()
+                    self._started_tracemalloc = False
+
+        with self._lock:
+            self._update_armed()
+
+        finished_at = datetime.now()
+        base = f"{task_id}_{session['started_at'].strftime('%Y%m%d_%H%M%S')}"
+        result = {
+            'task_id': task_id,
+            'started_at': session['started_at'].isoformat(),
+            'finished_at': finished_at.isoformat(),
+            'seconds': round((finished_at - session['started_at']).total_seconds(), 3),
+            'files': []
+        }
+        try:
+            os.makedirs(self.profiles_dir, exist_ok=True)
+            if profile is not None:
+                result['files'].extend(self._write_cpu(profile, base))
+            if after is not None:
+                result['files'].append(self._write_memory(session['memory_before'], after, base, result))
+            logger.info(f"任务 {task_id} 性能剖析完成: {', '.join(result['files'])}")
+        except Exception as e:
+            logger.error(f"写入任务 {task_id} 性能剖析结果失败: {e}")
+            result['error'] = str(e)
+
+        with self._lock:
+            self._recent.appendleft(result)
+        return result
+
+    def _update_armed(self):
+        """调用方持有锁"""
+        self.armed = bool(self._requests or self._sessions)
+
+    def _write_cpu(self, profile: cProfile.Profile, base: str) -> List[str]:
+        stats_name = base + '.pstats'
+        text_name = base + '.cpu.txt'
+        profile.dump_stats(os.path.join(self.profiles_dir, stats_name))
+
+        buffer = io.StringIO()
+        stats = pstats.Stats(profile, stream=buffer)
+        stats.sort_stats('cumulative').print_stats(self.top_n)
+        stats.sort_stats('tottime').print_stats(self.top_n)
+        with open(os.path.join(self.profiles_dir, text_name), 'w', encoding='utf-8') as f:
+            f.write(buffer.getvalue())
+        return [stats_name, text_name]
+
+    def _write_memory(self, before, after, base: str, result: Dict) -> str:
+        name = base + '.memory.txt'
+        before = before.filter_traces(_MEMORY_FILTERS)
+        after = after.filter_traces(_MEMORY_FILTERS)
+        differences = after.compare_to(before, 'lineno')
+        growth = sum(stat.size_diff for stat in differences)
+        total = sum(stat.size for stat in after.statistics('filename'))
+        result['memory_growth_bytes'] = growth
+        result['memory_traced_bytes'] = total
+
+        lines = [
+            f"任务: {result['task_id']}",
+            f"时间: {result['started_at']} ~ {result['finished_at']}",
+            f"结束时已追踪内存: {total / 1024:.1f} KiB，期间净增长: {growth / 1024:+.1f} KiB",
+            '',
+            f"增长最多的分配位置（前{self.top_n}）:"
+        ]
+        lines.extend(str(stat) for stat in differences[:self.top_n])
+        lines.extend(['', f"结束时占用最多的分配位置（前{self.top_n}）:"])
+        lines.extend(str(stat) for stat in after.statistics('lineno')[:self.top_n])
+
+        # 占用最多的位置附带完整调用栈
+        if self.memory_frames > 1:
+            top = after.statistics('traceback')[:3]
+            lines.extend(['', '占用最多的调用栈（前3）:'])
+            for stat in top:
+                lines.append(f"{stat.size / 1024:.1f} KiB, {stat.count} 个块")
+                lines.extend('    ' + line for line in stat.traceback.format())
+
+        with open(os.path.join(self.profiles_dir, name), 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        return name
+
+    def get_status(self) -> Dict:
+        """等待开始、进行中的剖析和最近完成的结果"""
+        with self._lock:
+            return {
+                'pending': [dict(request) for request in self._requests.values()],
+                'active': [{
+                    'task_id': session['task_id'],
+                    'cpu': session['cpu'] is not None,
+                    'memory': session['memory_before'] is not None,
+                    'started_at': session['started_at'].isoformat(),
+                    'stop_requested': session['stop_requested']
+                } for session in self._sessions.values()],
+                'recent': list(self._recent),
+                'tracemalloc_tracing': tracemalloc.is_tracing()
+            }
+
+    def list_files(self) -> List[Dict]:
+        """剖析结果文件列表（最新的在前）"""
+        if not os.path.isdir(self.profiles_dir):
+            return []
+        files = []
+        for name in os.listdir(self.profiles_dir):
+            path = os.path.join(self.profiles_dir, name)
+            if not os.path.isfile(path):
+                continue
+            stat = os.stat(path)
+            files.append({
+                'filename': name,
+                'size': stat.st_size,
+                'modified_at': datetime.fromtimestamp(stat.st_mtime).isoformat()
+            })
+        files.sort(key=lambda item: item['modified_at'], reverse=True)
+        return files
@@ -7,10 +7,20 @@ import threading
 import time
 import logging
 from datetime import datetime
-from typing import Dict, List, Optional, Callable
+from typing import Dict, List, Optional, Callable, Tuple
 from enum import Enum
 from ..models.database import DatabaseManager
 from ..core.custom_crawler import WebCustomCrawler
+from ..core.result_cache import PageResultCache, export_cached_rows
+from ..core.shop_store import ShopStore
+from ..core.throughput_model import ThroughputModel
+from ..core.scheduler import FairShareScheduler
+from ..core.task_events import TaskEventHub, TERMINAL_STATUSES
+from ..core.task_status_cache import TaskStatusCache
+from ..core.task_profiler import TaskProfiler
+from ..core import status_pipeline
+from ..core.metrics import (QUEUE_PENDING, QUEUE_RUNNING, QUEUE_SLOTS, QUEUE_SLOT_UTILIZATION,
+                            TASKS_FINISHED, TASK_SECONDS)
 
 # 配置日志
 logger = logging.getLogger(__name__)
@@ -23,6 +33,9 @@ class TaskStatus(Enum):
     FAILED = "failed"
     CANCELLED = "cancelled"
 
+class IdempotencyConflict(ValueError):
+    """幂等键已用于参数不同的请求"""
+
 class TaskQueue:
     """任务队列管理器"""
     
@@ -35,16 +48,77 @@ class TaskQueue:
         self.worker_thread = None
         self.is_running = False
         self._lock = threading.Lock()
+        self._submit_lock = threading.Lock()  # 保证"查重+入队"的原子性
+        self._claim_lock = threading.Lock()   # 本地线程与远程工作节点领取任务互斥
+        self.lease_manager = None  # 远程工作节点租约管理器（由LeaseManager登记），用于预测排队时间
+        
+        # 列表页结果缓存
+        from config.crawler_config import RESULT_CACHE_CONFIG
+        self.page_cache = None
+        if RESULT_CACHE_CONFIG.get('ENABLED', True):
+            self.page_cache = PageResultCache(db_manager, RESULT_CACHE_CONFIG.get('TTL_HOURS', 6))
+        
+        # 商铺数据存储（每页结果写入shops/shop_observations表）
+        from config.crawler_config import SHOP_STORE_CONFIG
+        self.shop_store = None
+        if SHOP_STORE_CONFIG.get('ENABLED', True):
+            self.shop_store = ShopStore(db_manager, SHOP_STORE_CONFIG.get('PAGE_SIZE', 15))
+        
+        # 历史吞吐量模型，用于预测任务耗时和排队时间
+        self.throughput_model = ThroughputModel(db_manager)
+        
+        # 公平分享调度器（优先级老化 + 按账号/提交人分摊）
+        self.scheduler = FairShareScheduler()
+        
+        # 任务事件环形缓冲区（SSE推送）
+        self.task_events = TaskEventHub()
+        
+        # 最近任务状态缓存（状态变化时写入）
+        from config.crawler_config import STATUS_CACHE_CONFIG
+        self.status_cache = TaskStatusCache(STATUS_CACHE_CONFIG.get('MAX_ENTRIES', 5000))
+        
+        # 按需性能剖析（管理接口登记，执行任务的线程开启）
+        from config.crawler_config import PROFILING_CONFIG
+        self.profiler = TaskProfiler(PROFILING_CONFIG['PROFILES_DIR'],
+                                     memory_frames=PROFILING_CONFIG.get('MEMORY_FRAMES', 10),
+                                     top_n=PROFILING_CONFIG.get('TOP_N', 30))
+        
+        # /metrics 抓取时直接读取内存中的运行状态
+        QUEUE_RUNNING.set_function(lambda: len(self.running_tasks))
+        QUEUE_PENDING.set_function(self._count_pending)
+        QUEUE_SLOTS.set_function(lambda: self.max_concurrent_tasks)
+        QUEUE_SLOT_UTILIZATION.set_function(lambda: len(self.running_tasks) / max(1, self.max_concurrent_tasks))
+    
+    def _count_pending(self) -> int:
+        """待领取任务数（/metrics 抓取时查询，走 (status, created_at) 索引）"""
+        with self.db_manager.get_connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM task_queue WHERE status = 'pending'").fetchone()[0]
     
     def start_worker(self):
         """启动任务处理工作线程"""
         if self.worker_thread and self.worker_thread.is_alive():
             return
         
+        self.recover_orphaned_tasks()
         self.is_running = True
         self.worker_thread = threading.Thread(target=self._worker_loop, daemon=True)
         self.worker_thread.start()
     
+    def recover_orphaned_tasks(self) -> int:
+        """把上次进程退出时已领取但未执行完的本地任务放回队列"""
+        try:
+            requeued = self.db_manager.writer.execute('''
+                UPDATE task_queue SET status = 'pending', updated_at = ? 
+                WHERE status = 'queued'
+            ''', (datetime.now(),))
+            if requeued:
+                self.status_cache.clear()
+                logger.warning(f"{requeued} 个未执行完的任务已重新排队")
+            return requeued
+        except Exception as e:
+            logger.error(f"恢复遗留任务失败: {e}")
+            return 0
+    
     def stop_worker(self, timeout=10):
         """停止任务处理工作线程 - 优化版本"""
         logger.info("开始停止任务队列工作线程...")
@@ -95,32 +169,46 @@ class TaskQueue:
                 print(f"任务队列工作线程异常: {e}")
                 time.sleep(5)
     
-    def _get_next_task(self) -> Optional[Dict]:
-        """获取下一个待处理任务"""
+    def _get_next_task(self, claim_status: str = 'queued', worker_id: str = None,
+                       lease_id: str = None, lease_expires_at: datetime = None) -> Optional[Dict]:
+        """
+        领取下一个待处理任务
+        
+        本地工作线程和远程工作节点共用同一个领取入口。UPDATE只在任务仍为pending时
+        生效，并检查受影响行数，保证同一个任务不会被两个执行方同时领取。
+        """
         try:
-            with self.db_manager.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    SELECT * FROM task_queue 
-                    WHERE status = 'pending' 
-                    ORDER BY priority DESC, created_at ASC 
-                    LIMIT 1
-                ''')
-                
-                row = cursor.fetchone()
-                if row:
-                    columns = [description[0] for description in cursor.description]
-                    task = dict(zip(columns, row))
-                    
-                    # 更新任务状态为队列中
+            with self._claim_lock:
+                with self.db_manager.get_connection() as conn:
+                    cursor = conn.cursor()
                     cursor.execute('''
+                        SELECT * FROM task_queue 
+                        WHERE status = 'pending' 
+                        ORDER BY created_at ASC
+                    ''')
+                    
+                    columns = [description[0] for description in cursor.description]
+                    candidates = [dict(zip(columns, row)) for row in cursor.fetchall()]
+                
+                # 按有效优先级（老化 + 公平分享）选择任务
+                now = datetime.utcnow()
+                while candidates:
+                    task = self.scheduler.select(candidates, now)
+                    claimed = self.db_manager.writer.execute('''
                         UPDATE task_queue 
-                        SET status = 'queued', updated_at = ? 
-                        WHERE task_id = ?
-                    ''', (datetime.now(), task['task_id']))
+                        SET status = ?, worker_id = ?, lease_id = ?, lease_expires_at = ?, updated_at = ? 
+                        WHERE task_id = ? AND status = 'pending'
+                    ''', (claim_status, worker_id, lease_id, lease_expires_at, datetime.now(), task['task_id']))
+                    
+                    if claimed == 1:
+                        self.scheduler.record_dispatch(task, now)
+                        task.update(status=claim_status, worker_id=worker_id, lease_id=lease_id,
+                                    lease_expires_at=lease_expires_at)
+                        self.status_cache.put(task['task_id'], self._queue_row_status(task))
+                        return task
                     
-                    conn.commit()
-                    return task
+                    # 已被其他进程领取或取消，换下一个候选
+                    candidates.remove(task)
                 
                 return None
                 
@@ -128,23 +216,99 @@ class TaskQueue:
             print(f"获取下一个任务失败: {e}")
             return None
     
+    def _begin_task(self, task: Dict):
+        """标记任务开始执行"""
+        task_id = task['task_id']
+        self.db_manager.update_crawl_history(task_id, status='running')
+        running_status = {
+            'task_id': task_id,
+            'status': TaskStatus.RUNNING.value,
+            'start_time': datetime.now().isoformat(),
+            'is_running': True
+        }
+        if task.get('worker_id'):
+            running_status['worker_id'] = task['worker_id']
+        self.status_cache.put(task_id, running_status)
+        self._notify_status_change(task_id, TaskStatus.RUNNING, "任务开始执行")
+        logger.info(f"任务 {task_id} 状态已更新为运行中")
+    
+    def _complete_task(self, task: Dict, city_name: str, category_names: List[str], total_shops: int,
+                       shops_per_category: Dict[str, int], captcha_count: int = 0, skipped_pages: int = 0,
+                       output_file: str = None):
+        """记录任务成功完成：更新历史、记录爬取组合并通知"""
+        task_id = task['task_id']
+        
+        # 更新数据库（使用中文名称）
+        self.db_manager.update_crawl_history(
+            task_id,
+            status='completed',
+            end_time=datetime.now(),
+            total_shops=total_shops,
+            captcha_count=captcha_count,
+            skipped_pages=skipped_pages,
+            output_file=output_file
+        )
+        
+        # 记录爬取组合（使用中文名称）
+        cookie_hash = self.cookie_manager.hash_cookie(task['cookie_string'])
+        for category_name in category_names:
+            self.db_manager.record_crawl_combination(
+                city_name, category_name, cookie_hash, task_id, 
+                task.get('end_page', 15), shops_per_category.get(category_name, 0)
+            )
+        
+        self._notify_status_change(task_id, TaskStatus.COMPLETED, f"任务完成，共爬取 {total_shops} 个商铺")
+    
+    def _fail_task(self, task_id: str, error_message: str):
+        """记录任务失败"""
+        self.db_manager.update_crawl_history(
+            task_id,
+            status='failed',
+            end_time=datetime.now(),
+            error_message=error_message
+        )
+        
+        self._notify_status_change(task_id, TaskStatus.FAILED, error_message)
+    
+    def _release_task(self, task_id: str):
+        """任务结束后从队列中移除"""
+        # 终态已写入历史和状态缓存，不需要等待删除提交
+        try:
+            self.db_manager.writer.execute('''
+                DELETE FROM task_queue WHERE task_id = ?
+            ''', (task_id,), wait=False)
+        except Exception as e:
+            logger.error(f"清理任务队列记录失败: {e}")
+    
+    def _make_page_result_callback(self, task: Dict) -> Optional[Callable]:
+        """每页结果写入商铺存储（命中缓存的页面在原来爬取的任务中已经记录过）"""
+        if not self.shop_store:
+            return None
+        task_id = task['task_id']
+        sort_type = task.get('sort_type') or 'popularity'
+        
+        def on_page_result(category_id, category_name, page_num, shops, from_cache):
+            if shops and not from_cache:
+                self.shop_store.record_page(task_id, category_name, sort_type, page_num, shops)
+        return on_page_result
+    
     def _execute_task(self, task: Dict):
         """执行单个任务"""
         task_id = task['task_id']
         logger.info(f"开始执行任务: {task_id}")
+        crawler = None
         
         try:
             with self._lock:
                 self.running_tasks[task_id] = {
                     'task': task,
                     'start_time': datetime.now(),
-                    'status': TaskStatus.RUNNING
+                    'status': TaskStatus.RUNNING,
+                    'estimated_seconds': self._estimate_queue_row_seconds(task)
                 }
             
-            # 更新数据库状态
-            self.db_manager.update_crawl_history(task_id, status='running')
-            self._notify_status_change(task_id, TaskStatus.RUNNING, "任务开始执行")
-            logger.info(f"任务 {task_id} 状态已更新为运行中")
+            self._begin_task(task)
+            self.profiler.checkpoint(task_id)
             
             # 解析任务参数
             import json
@@ -157,48 +321,29 @@ class TaskQueue:
             
             # 创建爬虫实例并执行任务
             logger.info(f"任务 {task_id} 创建爬虫实例")
-            crawler = WebCustomCrawler(task['cookie_string'], status_callback)
-            
-            # 将英文城市代码转换为中文名
-            city_name = None
-            for name, code in crawler.cities.items():
-                if code == task['city']:
-                    city_name = name
-                    break
-            
-            if not city_name:
-                error_msg = f"不支持的城市代码: {task['city']}"
-                logger.error(f"任务 {task_id} 失败: {error_msg}")
-                raise Exception(error_msg)
-            
-            logger.info(f"任务 {task_id} 城市转换成功: {task['city']} -> {city_name}")
-            
-            # 将品类ID转换为中文品类名
-            category_names = []
-            for category_id in categories:
-                category_name = None
-                for name, cid in crawler.categories.items():
-                    if cid == category_id:
-                        category_name = name
-                        break
-                if category_name:
-                    category_names.append(category_name)
-                else:
-                    error_msg = f"不支持的品类ID: {category_id}"
-                    logger.error(f"任务 {task_id} 失败: {error_msg}")
-                    raise Exception(error_msg)
-            
-            logger.info(f"任务 {task_id} 品类转换成功: {categories} -> {category_names}")
+            use_cache = task.get('use_cache', 1) != 0
+            crawler = WebCustomCrawler(task['cookie_string'], status_callback,
+                                       page_cache=self.page_cache if use_cache else None,
+                                       phase_recorder=self.throughput_model,
+                                       page_result_callback=self._make_page_result_callback(task),
+                                       task_id=task_id,
+                                       profiler=self.profiler)
+            
+            # 将城市代码和品类ID转换为中文名
+            city_name, category_names = crawler.resolve_task_names(task['city'], categories)
+            logger.info(f"任务 {task_id} 名称转换成功: {task['city']} -> {city_name}, {categories} -> {category_names}")
             
             # 使用修正后的方法调用
             start_page = task.get('start_page', 1)
             end_page = task.get('end_page', 15)
-            logger.info(f"任务 {task_id} 开始爬取: 城市={city_name}, 品类={category_names}, 页数范围={start_page}-{end_page}")
+            sort_type = task.get('sort_type') or 'popularity'
+            logger.info(f"任务 {task_id} 开始爬取: 城市={city_name}, 品类={category_names}, 页数范围={start_page}-{end_page}, 排序={sort_type}")
             result = crawler.crawl_specific_task(
                 city_name,  # 使用中文城市名
                 category_names,  # 使用中文品类名列表
                 start_page,  # 起始页
-                end_page   # 结束页
+                end_page,  # 结束页
+                sort_type  # 排序方式
             )
             
             # 处理新的返回值格式
@@ -212,9 +357,6 @@ class TaskQueue:
             
             if success:
                 # 保存数据
-                import sys
-                import os
-                sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
                 from config.crawler_config import FILE_PATHS
                 save_result = crawler.save_task_data(
                     data, 
@@ -223,116 +365,289 @@ class TaskQueue:
                     FILE_PATHS['OUTPUTS_DIR']
                 )
                 
-                # 更新数据库（使用中文名称）
-                self.db_manager.update_crawl_history(
-                    task_id,
-                    status='completed',
-                    end_time=datetime.now(),
-                    total_shops=len(data),
+                shops_per_category = {}
+                for row in data:
+                    category_name = row.get('secondary_category')
+                    shops_per_category[category_name] = shops_per_category.get(category_name, 0) + 1
+                
+                self._complete_task(
+                    task, city_name, category_names, len(data), shops_per_category,
                     captcha_count=crawler.captcha_count,
                     skipped_pages=crawler.skipped_pages,
                     output_file=save_result['filename'] if save_result else None
                 )
                 
-                # 记录爬取组合（使用中文名称）
-                cookie_hash = self.cookie_manager.hash_cookie(task['cookie_string'])
-                for category_name in category_names:
-                    category_data = [d for d in data if d['secondary_category'] == category_name]
-                    self.db_manager.record_crawl_combination(
-                        city_name, category_name, cookie_hash, task_id, 
-                        task.get('end_page', 15), len(category_data)
-                    )
-                
-                self._notify_status_change(task_id, TaskStatus.COMPLETED, f"任务完成，共爬取 {len(data)} 个商铺")
-                
             else:
-                self.db_manager.update_crawl_history(
-                    task_id,
-                    status='failed',
-                    end_time=datetime.now(),
-                    error_message="爬取任务执行失败"
-                )
-                
-                self._notify_status_change(task_id, TaskStatus.FAILED, "任务执行失败")
+                self._fail_task(task_id, "爬取任务执行失败")
             
         except Exception as e:
             error_message = f"任务执行异常: {e}"
             logger.error(f"任务 {task_id} 执行失败: {error_message}", exc_info=True)
+            self._fail_task(task_id, error_message)
             
-            self.db_manager.update_crawl_history(
-                task_id,
-                status='failed',
-                end_time=datetime.now(),
-                error_message=error_message
-            )
+        finally:
+            if crawler:
+                crawler.close()
             
-            self._notify_status_change(task_id, TaskStatus.FAILED, error_message)
+            # 写出本任务的性能剖析结果（如有），任务开始前就失败时丢弃未开始的请求
+            self.profiler.finish(task_id)
+            self.profiler.discard(task_id)
             
-        finally:
             # 清理运行任务记录
             with self._lock:
                 if task_id in self.running_tasks:
-                    del self.running_tasks[task_id]
+                    started = self.running_tasks.pop(task_id)['start_time']
+                    TASK_SECONDS.observe((datetime.now() - started).total_seconds())
+            
+            # 保存本次任务积累的耗时统计
+            self.throughput_model.flush()
             
             # 更新任务队列状态
-            try:
-                with self.db_manager.get_connection() as conn:
-                    cursor = conn.cursor()
-                    cursor.execute('''
-                        DELETE FROM task_queue WHERE task_id = ?
-                    ''', (task_id,))
-                    conn.commit()
-            except Exception as e:
-                logger.error(f"清理任务队列记录失败: {e}")
+            self._release_task(task_id)
     
     def _notify_status_change(self, task_id: str, status: TaskStatus, message: str, extra_info: Dict = None):
         """通知任务状态变化"""
+        event = {
+            'task_id': task_id,
+            'status': status.value,
+            'message': message,
+            'timestamp': datetime.now().isoformat(),
+            'extra_info': extra_info or {}
+        }
+        
+        # 写入事件缓冲区，SSE订阅方据此推送
+        self.task_events.publish(task_id, event)
+        
+        # 同步状态缓存：排队、运行进度和结束状态
+        if status == TaskStatus.RUNNING:
+            fields = {'message': message}
+            if (extra_info or {}).get('progress') is not None:
+                fields['progress'] = extra_info['progress']
+            self.status_cache.update(task_id, **fields)
+        elif status == TaskStatus.PENDING:
+            self.status_cache.put(task_id, {
+                'task_id': task_id,
+                'status': TaskStatus.PENDING.value,
+                'created_at': event['timestamp'],
+                'is_running': False
+            })
+        elif status in (TaskStatus.COMPLETED, TaskStatus.FAILED, TaskStatus.CANCELLED):
+            TASKS_FINISHED.inc(status=status.value)
+            self._refresh_status_cache(task_id)
+        
         if task_id in self.task_status_callbacks:
             try:
                 callback = self.task_status_callbacks[task_id]
-                callback({
-                    'task_id': task_id,
-                    'status': status.value,
-                    'message': message,
-                    'timestamp': datetime.now().isoformat(),
-                    'extra_info': extra_info or {}
-                })
+                callback(event)
             except Exception as e:
                 print(f"任务状态回调失败: {e}")
     
+    @staticmethod
+    def build_dedupe_key(city: str, categories: List[str], sort_type: str,
+                         start_page: Optional[int], end_page: int) -> str:
+        """生成任务去重键：城市+品类+排序+页数范围相同即视为同一工作单元"""
+        return '|'.join([
+            city,
+            ','.join(sorted(categories)),
+            sort_type or 'popularity',
+            str(start_page),
+            str(end_page)
+        ])
+    
+    def find_inflight_task(self, dedupe_key: str) -> Optional[str]:
+        """查找等待中或执行中的相同任务，返回其task_id"""
+        try:
+            with self.db_manager.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT task_id FROM task_queue 
+                    WHERE dedupe_key = ? AND status IN ('pending', 'queued', 'leased')
+                    ORDER BY created_at ASC LIMIT 1
+                ''', (dedupe_key,))
+                row = cursor.fetchone()
+                return row[0] if row else None
+            
+        except Exception as e:
+            logger.error(f"查找重复任务失败: {e}")
+            return None
+    
+    def find_idempotent_task(self, idempotency_key: str) -> Optional[Dict]:
+        """
+        按幂等键查找之前创建的任务（不论任务是否已结束）
+        
+        Returns:
+            该任务的爬取历史记录（含dedupe_key，用于核对请求参数），没有时返回None
+        """
+        try:
+            with self.db_manager.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT task_id FROM crawl_history 
+                    WHERE idempotency_key = ?
+                    ORDER BY created_at ASC LIMIT 1
+                ''', (idempotency_key,))
+                row = cursor.fetchone()
+            
+            return self.db_manager.get_crawl_history_by_task_id(row[0]) if row else None
+            
+        except Exception as e:
+            logger.error(f"按幂等键查找任务失败: {e}")
+            return None
+    
+    def submit_task(self, city: str, city_name: str, categories: List[str], category_names: List[str],
+                    start_page: int = None, end_page: int = 15, range_type: str = 'first',
+                    sort_type: str = 'popularity', cookie_string: str = '', priority: int = 0,
+                    status_callback: Callable = None, idempotency_key: str = None,
+                    use_cache: bool = True, submitter: str = None) -> Tuple[Optional[str], bool]:
+        """
+        幂等地提交任务
+        
+        幂等键已创建过任务时直接返回该任务（不论是否已结束）；否则如果已有相同参数的任务
+        在等待或执行，直接附着到该任务，共享其任务结果和输出文件。
+        
+        Returns:
+            (task_id, coalesced): coalesced为True表示复用了已有任务
+        
+        Raises:
+            IdempotencyConflict: 幂等键已用于参数不同的请求
+        """
+        dedupe_key = self.build_dedupe_key(city, categories, sort_type, start_page, end_page)
+        
+        with self._submit_lock:
+            if idempotency_key:
+                record = self.find_idempotent_task(idempotency_key)
+                if record:
+                    if record['dedupe_key'] != dedupe_key:
+                        raise IdempotencyConflict(f"幂等键 {idempotency_key} 已用于参数不同的任务 {record['task_id']}")
+                    logger.info(f"幂等键 {idempotency_key} 重试，返回原任务 {record['task_id']}")
+                    return record['task_id'], True
+            
+            existing_task_id = self.find_inflight_task(dedupe_key)
+            if existing_task_id:
+                logger.info(f"重复提交已合并到任务 {existing_task_id} (去重键: {dedupe_key})")
+                if status_callback:
+                    self.task_status_callbacks[existing_task_id] = status_callback
+                return existing_task_id, True
+            
+            task_id = self.add_task(
+                city=city,
+                city_name=city_name,
+                categories=categories,
+                category_names=category_names,
+                start_page=start_page,
+                end_page=end_page,
+                range_type=range_type,
+                sort_type=sort_type,
+                cookie_string=cookie_string,
+                priority=priority,
+                status_callback=status_callback,
+                idempotency_key=idempotency_key,
+                use_cache=use_cache,
+                submitter=submitter
+            )
+            return task_id, False
+    
     def add_task(self, city: str, city_name: str, categories: List[str], category_names: List[str],
                  start_page: int = None, end_page: int = 15, range_type: str = 'first',
                  sort_type: str = 'popularity', cookie_string: str = '', priority: int = 0,
-                 status_callback: Callable = None) -> str:
+                 status_callback: Callable = None, idempotency_key: str = None,
+                 use_cache: bool = True, submitter: str = None) -> str:
         """添加新任务到队列"""
         task_id = str(uuid.uuid4())
+        dedupe_key = self.build_dedupe_key(city, categories, sort_type, start_page, end_page)
         
         try:
             # 添加到任务队列表
             import json
-            with self.db_manager.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT INTO task_queue 
-                    (task_id, city, categories, start_page, end_page, range_type, cookie_string, priority, status)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'pending')
-                ''', (task_id, city, json.dumps(categories), start_page, end_page, range_type, cookie_string, priority))
-                conn.commit()
+            cookie_hash = self.cookie_manager.hash_cookie(cookie_string)
+            self.db_manager.writer.execute('''
+                INSERT INTO task_queue 
+                (task_id, city, categories, start_page, end_page, range_type, sort_type, cookie_string, 
+                 priority, status, dedupe_key, idempotency_key, use_cache, cookie_hash, submitter)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 'pending', ?, ?, ?, ?, ?)
+            ''', (task_id, city, json.dumps(categories), start_page, end_page, range_type, sort_type,
+                  cookie_string, priority, dedupe_key, idempotency_key, 1 if use_cache else 0,
+                  cookie_hash, submitter))
             
             # 添加到爬取历史（使用中文名）
-            cookie_hash = self.cookie_manager.hash_cookie(cookie_string)
-            self.db_manager.add_crawl_history(task_id, city_name, category_names, start_page, end_page, range_type, cookie_hash)
+            self.db_manager.add_crawl_history(task_id, city_name, category_names, start_page, end_page, range_type,
+                                              cookie_hash, dedupe_key=dedupe_key, idempotency_key=idempotency_key)
             
             # 注册状态回调
             if status_callback:
                 self.task_status_callbacks[task_id] = status_callback
             
+            self._notify_status_change(task_id, TaskStatus.PENDING, "任务已加入队列")
             return task_id
             
         except Exception as e:
             print(f"添加任务失败: {e}")
             return None
     
+    def complete_from_cache(self, city: str, city_name: str, categories: List[str], category_names: List[str],
+                            start_page: int, end_page: int, range_type: str = 'first',
+                            sort_type: str = 'popularity', cookie_string: str = '',
+                            idempotency_key: str = None, cutoff: datetime = None) -> Optional[Dict]:
+        """
+        页数范围已全部命中缓存时，直接生成已完成的任务，不进入队列
+        
+        Args:
+            cutoff: plan_range返回的新鲜度标准，读取缓存时使用同一个标准
+        
+        Returns:
+            {'task_id', 'output_file', 'total_shops'}；有页在计划之后不可用（过期、被清理、读取失败）
+            或幂等键已创建过任务时返回None，由调用方正常提交任务
+        """
+        if not self.page_cache:
+            return None
+        
+        try:
+            with self._submit_lock:
+                # 幂等键已有对应任务（并发的重试）时交给submit_task处理
+                if idempotency_key and self.find_idempotent_task(idempotency_key):
+                    return None
+                
+                pages = self.page_cache.load_range(city, categories, sort_type, start_page, end_page, cutoff)
+                rows = []
+                for category_id in categories:
+                    for page_num in range(start_page, end_page + 1):
+                        if page_num not in pages[category_id]:
+                            logger.info(f"缓存页 {category_id} 第{page_num}页已不可用，改为提交任务")
+                            return None
+                        rows.extend(pages[category_id][page_num])
+                if not rows:
+                    return None
+                
+                from config.crawler_config import FILE_PATHS
+                save_result = export_cached_rows(rows, city_name, category_names, FILE_PATHS['OUTPUTS_DIR'])
+                if not save_result:
+                    return None
+                
+                task_id = str(uuid.uuid4())
+                cookie_hash = self.cookie_manager.hash_cookie(cookie_string)
+                dedupe_key = self.build_dedupe_key(city, categories, sort_type, start_page, end_page)
+                self.db_manager.add_crawl_history(task_id, city_name, category_names, start_page, end_page,
+                                                  range_type, cookie_hash, dedupe_key=dedupe_key,
+                                                  idempotency_key=idempotency_key)
+                self.db_manager.update_crawl_history(
+                    task_id,
+                    status='completed',
+                    end_time=datetime.now(),
+                    total_shops=len(rows),
+                    output_file=save_result['filename']
+                )
+            
+            logger.info(f"任务 {task_id} 全部命中缓存，直接完成: {len(rows)} 个商铺")
+            return {
+                'task_id': task_id,
+                'output_file': save_result['filename'],
+                'total_shops': len(rows)
+            }
+            
+        except Exception as e:
+            logger.error(f"从缓存生成任务失败: {e}")
+            return None
+    
     def cancel_task(self, task_id: str) -> bool:
         """取消任务"""
         try:
@@ -341,11 +656,19 @@ class TaskQueue:
                 if task_id in self.running_tasks:
                     return False
             
-            # 从队列中删除
-            with self.db_manager.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute('DELETE FROM task_queue WHERE task_id = ?', (task_id,))
-                conn.commit()
+            # 从队列中删除（已被远程工作节点领取的任务同样无法取消）
+            deleted = self.db_manager.writer.execute(
+                "DELETE FROM task_queue WHERE task_id = ? AND status != 'leased'", (task_id,))
+            if deleted == 0:
+                with self.db_manager.get_connection() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute("SELECT 1 FROM task_queue WHERE task_id = ?", (task_id,))
+                    if cursor.fetchone():
+                        return False
+                # 不在队列中：只有历史记录还未结束的任务可以取消，不存在的任务不发布事件
+                record = self.db_manager.get_crawl_history_by_task_id(task_id)
+                if not record or record['status'] in TERMINAL_STATUSES:
+                    return False
             
             # 更新历史记录
             self.db_manager.update_crawl_history(
@@ -354,6 +677,7 @@ class TaskQueue:
                 end_time=datetime.now()
             )
             
+            self.profiler.discard(task_id)
             self._notify_status_change(task_id, TaskStatus.CANCELLED, "任务已取消")
             return True
             
@@ -361,21 +685,72 @@ class TaskQueue:
             print(f"取消任务失败: {e}")
             return False
     
+    @staticmethod
+    def _queue_row_status(task: Dict) -> Dict:
+        """task_queue表中一行对应的任务状态"""
+        if task['status'] == 'leased':
+            # 已被远程工作节点领取，正在执行
+            return {
+                'task_id': task['task_id'],
+                'status': TaskStatus.RUNNING.value,
+                'created_at': task.get('created_at'),
+                'worker_id': task.get('worker_id'),
+                'is_running': True
+            }
+        return {
+            'task_id': task['task_id'],
+            'status': task['status'],
+            'created_at': task.get('created_at'),
+            'is_running': False
+        }
+    
+    @staticmethod
+    def _history_status(record: Dict) -> Dict:
+        """爬取历史记录对应的任务状态"""
+        return {
+            'task_id': record['task_id'],
+            'status': record['status'],
+            'start_time': record['start_time'],
+            'end_time': record['end_time'],
+            'total_shops': record['total_shops'],
+            'is_running': False
+        }
+    
+    def _refresh_status_cache(self, task_id: str):
+        """任务结束后从爬取历史重新加载状态到缓存"""
+        record = self.db_manager.get_crawl_history_by_task_id(task_id)
+        if record:
+            self.status_cache.put(task_id, self._history_status(record))
+        else:
+            self.status_cache.invalidate(task_id)
+    
     def get_task_status(self, task_id: str) -> Optional[Dict]:
-        """获取任务状态"""
+        """
+        获取任务状态
+        
+        依次查找：本地运行中的任务（内存）→ 状态缓存 → 任务队列表 → 爬取历史（均按task_id索引查找），
+        从数据库查到的结果写入缓存。
+        """
         try:
             # 检查是否在运行任务中
             with self._lock:
                 if task_id in self.running_tasks:
                     running_task = self.running_tasks[task_id]
+                    elapsed = (datetime.now() - running_task['start_time']).total_seconds()
                     return {
                         'task_id': task_id,
                         'status': running_task['status'].value,
                         'start_time': running_task['start_time'].isoformat(),
+                        'estimated_remaining_seconds': round(max(0.0, running_task['estimated_seconds'] - elapsed)),
                         'is_running': True
                     }
             
+            cached = self.status_cache.get(task_id)
+            if cached:
+                return cached
+            
             # 检查队列中的任务
+            status = None
             with self.db_manager.get_connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute('SELECT * FROM task_queue WHERE task_id = ?', (task_id,))
@@ -383,45 +758,155 @@ class TaskQueue:
                 row = cursor.fetchone()
                 if row:
                     columns = [description[0] for description in cursor.description]
-                    task = dict(zip(columns, row))
-                    return {
-                        'task_id': task_id,
-                        'status': task['status'],
-                        'created_at': task['created_at'],
-                        'is_running': False
-                    }
+                    status = self._queue_row_status(dict(zip(columns, row)))
             
             # 检查历史记录
-            history = self.db_manager.get_crawl_history(limit=1, offset=0)
-            for record in history:
-                if record['task_id'] == task_id:
-                    return {
-                        'task_id': task_id,
-                        'status': record['status'],
-                        'start_time': record['start_time'],
-                        'end_time': record['end_time'],
-                        'total_shops': record['total_shops'],
-                        'is_running': False
-                    }
+            if status is None:
+                record = self.db_manager.get_crawl_history_by_task_id(task_id)
+                if record:
+                    status = self._history_status(record)
             
-            return None
+            if status is not None:
+                self.status_cache.fill(task_id, status)
+            return status
             
         except Exception as e:
             logger.error(f"获取任务状态失败: {e}")
             return None
     
+    def get_task_statuses(self, task_ids: List[str] = None, active: bool = False,
+                          since_version: int = 0) -> Dict:
+        """
+        批量获取任务状态，只返回客户端已知版本之后变化的任务
+        
+        Args:
+            task_ids: 要查询的任务ID列表
+            active: 是否包含所有活跃任务（排队中和执行中）以及since_version之后变化的任务
+            since_version: 客户端上次拿到的version，0表示全部返回
+            
+        Returns:
+            {'version': 当前版本, 'tasks': [变化的任务状态...], 'missing': [不存在的task_id...]}
+        """
+        # 服务重启后版本号从0开始，客户端带来的旧版本号作废
+        if since_version > self.status_cache.version:
+            since_version = 0
+        
+        ids = list(dict.fromkeys(task_ids or []))
+        if active:
+            with self._lock:
+                ids.extend(self.running_tasks.keys())
+            try:
+                with self.db_manager.get_connection() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute('SELECT task_id FROM task_queue')
+                    ids.extend(row[0] for row in cursor.fetchall())
+            except Exception as e:
+                logger.error(f"获取活跃任务失败: {e}")
+            ids.extend(self.status_cache.changed_since(since_version))
+            ids = list(dict.fromkeys(ids))
+        
+        # 版本号在查询前读取，查询期间发生的变化下次还会返回
+        version = self.status_cache.version
+        result = self.status_cache.get_many(ids, since_version)
+        tasks = result['changed']
+        missing = []
+        for task_id in result['missing']:
+            # 未缓存的任务逐个回退到数据库查询（查询结果写入缓存，带上版本号）；
+            # 本地运行中的任务直接由内存返回、不写缓存，使用当前版本号
+            status = self.get_task_status(task_id)
+            if status is None:
+                missing.append(task_id)
+                continue
+            tasks.append(self.status_cache.get(task_id) or dict(status, version=version))
+        
+        now = datetime.now()
+        with self._lock:
+            for status in tasks:
+                running_task = self.running_tasks.get(status['task_id'])
+                if running_task:
+                    elapsed = (now - running_task['start_time']).total_seconds()
+                    status['estimated_remaining_seconds'] = round(max(0.0, running_task['estimated_seconds'] - elapsed))
+        
+        return {'version': version, 'tasks': tasks, 'missing': missing}
+    
+    def _estimate_queue_row_seconds(self, task: Dict) -> float:
+        """预测任务队列中某一行的执行耗时"""
+        import json
+        try:
+            categories = json.loads(task['categories'])
+            end_page = task.get('end_page') or 15
+            return self.throughput_model.estimate_task_seconds(task['city'], categories, task.get('start_page'), end_page)
+        except Exception as e:
+            logger.warning(f"预测任务耗时失败: {e}")
+            return 0.0
+    
+    def estimate_task_seconds(self, city: str, categories: List[str], start_page: Optional[int],
+                              end_page: int, cached_pages: Dict[str, List[int]] = None) -> float:
+        """预测新任务的执行耗时(秒)"""
+        return self.throughput_model.estimate_task_seconds(city, categories, start_page, end_page, cached_pages)
+    
+    def estimate_queue_wait_seconds(self) -> float:
+        """
+        预测新任务需要排队等待的时间(秒)
+        
+        等待中任务的预测耗时 + 本地执行中和远程工作节点执行中任务的剩余耗时，
+        按执行槽位数（本地并发数 + 持有租约的远程工作节点数）平摊。
+        """
+        try:
+            with self.db_manager.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT task_id, status, city, categories, start_page, end_page FROM task_queue 
+                    WHERE status IN ('pending', 'queued', 'leased')
+                ''')
+                columns = [description[0] for description in cursor.description]
+                rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            
+            now = datetime.now()
+            with self._lock:
+                running = {task_id: dict(info) for task_id, info in self.running_tasks.items()}
+            leases = self.lease_manager.get_leases() if self.lease_manager else []
+            lease_started = {lease['task_id']: datetime.fromisoformat(lease['acquired_at']) for lease in leases}
+            
+            total = 0.0
+            for row in rows:
+                if row['task_id'] in running:
+                    continue
+                estimated = self._estimate_queue_row_seconds(row)
+                if row['status'] == 'leased':
+                    # 远程执行中：扣除已执行的时间（重启后租约信息丢失的按刚开始计算）
+                    started_at = lease_started.get(row['task_id'])
+                    if started_at:
+                        estimated = max(0.0, estimated - (now - started_at).total_seconds())
+                total += estimated
+            
+            for info in running.values():
+                elapsed = (now - info['start_time']).total_seconds()
+                total += max(0.0, info['estimated_seconds'] - elapsed)
+            
+            local_slots = self.max_concurrent_tasks if self.is_running else 0
+            remote_slots = len({lease['worker_id'] for lease in leases})
+            return total / max(1, local_slots + remote_slots)
+            
+        except Exception as e:
+            logger.error(f"预测排队时间失败: {e}")
+            return 0.0
+    
     def get_queue_status(self) -> Dict:
         """获取队列状态"""
         try:
             with self.db_manager.get_connection() as conn:
                 cursor = conn.cursor()
                 
-                # 队列中的任务数
-                cursor.execute("SELECT COUNT(*) FROM task_queue WHERE status = 'pending'")
-                pending_tasks = cursor.fetchone()[0]
-                
-                cursor.execute("SELECT COUNT(*) FROM task_queue WHERE status = 'queued'")
-                queued_tasks = cursor.fetchone()[0]
+                # 队列中和远程工作节点正在执行的任务数（一次查询，只扫描status索引中的这三段）
+                cursor.execute('''
+                    SELECT status, COUNT(*) FROM task_queue 
+                    WHERE status IN ('pending', 'queued', 'leased') GROUP BY status
+                ''')
+                counts = dict(cursor.fetchall())
+                pending_tasks = counts.get('pending', 0)
+                queued_tasks = counts.get('queued', 0)
+                leased_tasks = counts.get('leased', 0)
             
             with self._lock:
                 running_tasks = len(self.running_tasks)
@@ -430,14 +915,50 @@ class TaskQueue:
                 'pending_tasks': pending_tasks,
                 'queued_tasks': queued_tasks,
                 'running_tasks': running_tasks,
+                'leased_tasks': leased_tasks,
                 'max_concurrent_tasks': self.max_concurrent_tasks,
-                'worker_running': self.is_running
+                'worker_running': self.is_running,
+                'status_pipeline': status_pipeline.get_global_stats(),
+                'status_cache': self.status_cache.get_stats(),
+                'db_writer': self.db_manager.writer.get_stats(),
+                'estimated_wait_minutes': round(self.estimate_queue_wait_seconds() / 60, 1)
             }
             
         except Exception as e:
             print(f"获取队列状态失败: {e}")
             return {}
     
+    def get_scheduler_stats(self) -> Dict:
+        """获取调度统计：每个租户（提交人/账号）的队列深度和等待时间分位数"""
+        try:
+            with self.db_manager.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT task_id, submitter, cookie_hash, priority, created_at FROM task_queue 
+                    WHERE status = 'pending'
+                ''')
+                columns = [description[0] for description in cursor.description]
+                pending_tasks = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            
+            now = datetime.utcnow()
+            return {
+                'tenants': self.scheduler.get_tenant_stats(pending_tasks, now),
+                'pending': [
+                    {
+                        'task_id': task['task_id'],
+                        'submitter': task['submitter'],
+                        'cookie_hash': task['cookie_hash'],
+                        'priority': task['priority'],
+                        'effective_priority': round(self.scheduler.effective_priority(task, now), 3)
+                    }
+                    for task in pending_tasks
+                ]
+            }
+            
+        except Exception as e:
+            logger.error(f"获取调度统计失败: {e}")
+            return {}
+    
     def remove_status_callback(self, task_id: str):
         """移除任务状态回调"""
         if task_id in self.task_status_callbacks:
@@ -0,0 +1,110 @@
+"""
+任务状态缓存 - 最近任务状态的内存LRU缓存，状态变化时同步写入
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from .metrics import CACHE_LOOKUPS
+
+class TaskStatusCache:
+    """
+    task_id -> 状态字典的LRU缓存
+
+    任务状态变化时由TaskQueue写入（先写数据库再写缓存），查询热点任务时不访问数据库。
+    超出容量时淘汰最久未访问的任务，被淘汰的任务查询时回退到数据库按task_id查找。
+    每次写入都分配递增的version，客户端带上已知的version即可只获取之后变化的任务。
+    """
+
+    def __init__(self, max_entries: int = 5000):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.version = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, task_id: str) -> Optional[Dict]:
+        """获取缓存的状态（返回副本），未命中返回None"""
+        with self._lock:
+            status = self._entries.get(task_id)
+            if status is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(task_id)
+                self.hits += 1
+        CACHE_LOOKUPS.inc(cache='task_status', result='miss' if status is None else 'hit')
+        return dict(status) if status is not None else None
+
+    def _store(self, task_id: str, status: Dict):
+        """写入一条状态并淘汰超出容量的旧条目（调用方持有锁）"""
+        self.version += 1
+        self._entries[task_id] = dict(status, version=self.version)
+        self._entries.move_to_end(task_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def put(self, task_id: str, status: Dict):
+        """写入任务的最新状态"""
+        with self._lock:
+            self._store(task_id, status)
+
+    def fill(self, task_id: str, status: Dict):
+        """写入从数据库读到的状态；读取期间已有状态变化写入时保留较新的缓存"""
+        with self._lock:
+            if task_id not in self._entries:
+                self._store(task_id, status)
+
+    def update(self, task_id: str, **fields) -> bool:
+        """合并字段到已缓存的状态（未缓存时不写入），返回是否更新"""
+        with self._lock:
+            status = self._entries.get(task_id)
+            if status is None:
+                return False
+            self._store(task_id, dict(status, **fields))
+            return True
+
+    def get_many(self, task_ids: List[str], since_version: int = 0) -> Dict:
+        """
+        批量获取状态，只返回version大于since_version的条目
+
+        Returns:
+            {'changed': [状态...], 'unchanged': [task_id...], 'missing': [未缓存的task_id...]}
+        """
+        changed, unchanged, missing = [], [], []
+        with self._lock:
+            for task_id in task_ids:
+                status = self._entries.get(task_id)
+                if status is None:
+                    missing.append(task_id)
+                elif status['version'] > since_version:
+                    changed.append(dict(status))
+                else:
+                    unchanged.append(task_id)
+        return {'changed': changed, 'unchanged': unchanged, 'missing': missing}
+
+    def changed_since(self, since_version: int) -> List[str]:
+        """version大于since_version的任务ID"""
+        with self._lock:
+            return [task_id for task_id, status in self._entries.items() if status['version'] > since_version]
+
+    def invalidate(self, task_id: str):
+        with self._lock:
+            self._entries.pop(task_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'version': self.version,
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0
+            }
@@ -0,0 +1,162 @@
+"""
+历史吞吐量模型 - 基于分阶段耗时统计预测任务耗时和排队等待时间
+"""
+
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from ..models.database import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+# 汇总层级使用的通配值
+ANY_CITY = '*'
+ANY_CATEGORY = '*'
+ANY_PAGE = 0
+
+class ThroughputModel:
+    """
+    分阶段耗时统计
+
+    每条样本同时累加到四个层级：(城市, 品类, 页码)、(城市, 品类)、(城市)、全局，
+    预测时从最细的层级开始查找，样本不足时逐级回退，最终回退到配置默认值。
+    """
+
+    def __init__(self, db_manager: DatabaseManager, config: Dict = None):
+        if config is None:
+            from config.crawler_config import THROUGHPUT_CONFIG
+            config = THROUGHPUT_CONFIG
+
+        self.db_manager = db_manager
+        self.min_samples = config.get('MIN_SAMPLES', 3)
+        self.default_page_seconds = config.get('DEFAULT_PAGE_SECONDS', 35)
+        self.default_cached_page_seconds = config.get('DEFAULT_CACHED_PAGE_SECONDS', 0.1)
+        self.default_category_delay_seconds = config.get('DEFAULT_CATEGORY_DELAY_SECONDS', 30)
+        self.default_startup_seconds = config.get('DEFAULT_STARTUP_SECONDS', 25)
+        self.flush_every = config.get('FLUSH_EVERY', 50)
+
+        self._stats = {}  # (city_code, category_id, page_num, phase) -> [count, total, total_sq]
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        """从数据库加载已有统计"""
+        try:
+            with self.db_manager.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT city_code, category_id, page_num, phase, sample_count, total_seconds, total_sq_seconds
+                    FROM phase_timing_stats
+                ''')
+                for row in cursor.fetchall():
+                    self._stats[(row[0], row[1], row[2], row[3])] = [row[4], row[5], row[6]]
+        except Exception as e:
+            logger.error(f"加载耗时统计失败: {e}")
+
+    def record(self, city_code: str, category_id: Optional[str], page_num: Optional[int],
+               phase: str, seconds: float):
+        """记录一次阶段耗时"""
+        if seconds is None or seconds < 0:
+            return
+
+        keys = [
+            (city_code, category_id or ANY_CATEGORY, page_num or ANY_PAGE, phase),
+            (city_code, category_id or ANY_CATEGORY, ANY_PAGE, phase),
+            (city_code, ANY_CATEGORY, ANY_PAGE, phase),
+            (ANY_CITY, ANY_CATEGORY, ANY_PAGE, phase)
+        ]
+
+        with self._lock:
+            for key in dict.fromkeys(keys):  # 去重并保持顺序
+                entry = self._stats.setdefault(key, [0, 0.0, 0.0])
+                entry[0] += 1
+                entry[1] += seconds
+                entry[2] += seconds * seconds
+                self._dirty.add(key)
+            should_flush = len(self._dirty) >= self.flush_every
+
+        if should_flush:
+            self.flush()
+
+    def flush(self):
+        """把变更的统计写入数据库"""
+        with self._lock:
+            if not self._dirty:
+                return
+            rows = [key + tuple(self._stats[key]) + (datetime.now(),) for key in self._dirty]
+            self._dirty.clear()
+
+        try:
+            self.db_manager.writer.executemany('''
+                INSERT OR REPLACE INTO phase_timing_stats
+                (city_code, category_id, page_num, phase, sample_count, total_seconds, total_sq_seconds, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+        except Exception as e:
+            logger.error(f"保存耗时统计失败: {e}")
+
+    def _mean(self, city_code: str, category_id: str, page_num: int, phase: str) -> Optional[float]:
+        """按层级回退查找阶段平均耗时，样本不足时返回None"""
+        candidates = [
+            (city_code, category_id, page_num, phase),
+            (city_code, category_id, ANY_PAGE, phase),
+            (city_code, ANY_CATEGORY, ANY_PAGE, phase),
+            (ANY_CITY, ANY_CATEGORY, ANY_PAGE, phase)
+        ]
+        with self._lock:
+            for key in candidates:
+                entry = self._stats.get(key)
+                if entry and entry[0] >= self.min_samples:
+                    return entry[1] / entry[0]
+        return None
+
+    def estimate_page_seconds(self, city_code: str, category_id: str, page_num: int) -> float:
+        """预测单页耗时（含页面间延迟）"""
+        mean = self._mean(city_code, category_id, page_num, 'page_total')
+        return mean if mean is not None else self.default_page_seconds
+
+    def estimate_task_seconds(self, city_code: str, category_ids: List[str],
+                              start_page: Optional[int], end_page: int,
+                              cached_pages: Dict[str, List[int]] = None) -> float:
+        """
+        预测整个任务耗时(秒)
+
+        Args:
+            cached_pages: {category_id: [页码...]}，命中缓存的页按缓存耗时计算
+        """
+        start_page = start_page or 1
+        cached_pages = cached_pages or {}
+
+        startup = self._mean(city_code, ANY_CATEGORY, ANY_PAGE, 'startup')
+        total = startup if startup is not None else self.default_startup_seconds
+
+        for category_id in category_ids:
+            cached = set(cached_pages.get(category_id, []))
+            for page_num in range(start_page, end_page + 1):
+                if page_num in cached:
+                    total += self.default_cached_page_seconds
+                else:
+                    total += self.estimate_page_seconds(city_code, category_id, page_num)
+
+        if len(category_ids) > 1:
+            category_delay = self._mean(city_code, ANY_CATEGORY, ANY_PAGE, 'category_delay')
+            if category_delay is None:
+                category_delay = self.default_category_delay_seconds
+            total += category_delay * (len(category_ids) - 1)
+
+        return total
+
+    def get_phase_summary(self, city_code: str = ANY_CITY) -> Dict:
+        """获取某城市（默认全局）各阶段的平均耗时和样本数"""
+        summary = {}
+        with self._lock:
+            for (city, category_id, page_num, phase), (count, total, _) in self._stats.items():
+                if city == city_code and category_id == ANY_CATEGORY and page_num == ANY_PAGE and count:
+                    summary[phase] = {
+                        'samples': count,
+                        'mean_seconds': round(total / count, 2)
+                    }
+        return summary
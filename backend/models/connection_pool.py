@@ -0,0 +1,101 @@
+"""
+SQLite连接池 - 复用已打开的连接，并在每个新连接上设置统一的PRAGMA
+
+每次 sqlite3.connect 都要打开文件、读取schema、重新编译语句；池中的连接保留这些状态和
+预编译语句缓存。池只限制空闲连接数：并发超过池大小时临时创建连接，归还时关闭，不会阻塞。
+同一线程嵌套取连接时拿到的是不同连接，内层的提交不会影响外层事务。
+"""
+
+import sqlite3
+import threading
+from typing import Dict
+
+class PooledConnection:
+    """
+    从池中借出一个连接的上下文管理器
+
+    与 `with sqlite3.connect(...) as conn:` 行为一致：正常退出时提交，异常时回滚；
+    之后把连接放回池中。
+    """
+
+    def __init__(self, pool: 'ConnectionPool'):
+        self.pool = pool
+        self.conn = None
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.conn = self.pool.acquire()
+        return self.conn.__enter__()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            self.conn.__exit__(exc_type, exc_value, traceback)
+        finally:
+            self.pool.release(self.conn)
+            self.conn = None
+        return False
+
+class ConnectionPool:
+    """空闲连接数有上限的SQLite连接池"""
+
+    def __init__(self, db_path: str, size: int = 8, pragmas: Dict[str, object] = None,
+                 timeout: float = 5.0, cached_statements: int = 256):
+        self.db_path = db_path
+        self.size = size
+        self.pragmas = pragmas or {}
+        self.timeout = timeout
+        self.cached_statements = cached_statements
+        self.created = 0
+        self.reused = 0
+        self.discarded = 0
+        self._idle = []
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        # 连接只会被一个线程借用，归还后才可能被其他线程取走
+        conn = sqlite3.connect(self.db_path, timeout=self.timeout, check_same_thread=False,
+                               cached_statements=self.cached_statements)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name}={value}')
+        with self._lock:
+            self.created += 1
+        return conn
+
+    def acquire(self) -> sqlite3.Connection:
+        with self._lock:
+            if self._idle:
+                self.reused += 1
+                return self._idle.pop()
+        return self._connect()
+
+    def release(self, conn: sqlite3.Connection):
+        # 调用方没有提交的事务不能带给下一个使用者
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            if not self._closed and len(self._idle) < self.size:
+                self._idle.append(conn)
+                return
+            self.discarded += 1
+        conn.close()
+
+    def connection(self) -> PooledConnection:
+        return PooledConnection(self)
+
+    def close(self):
+        """关闭所有空闲连接（借出中的连接归还时关闭）"""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                'size': self.size,
+                'idle': len(self._idle),
+                'created': self.created,
+                'reused': self.reused,
+                'discarded': self.discarded
+            }
@@ -5,6 +5,8 @@ Cookie管理器 - 处理Cookie的存储、验证和轮换
 import hashlib
 import os
 import json
+import threading
+import time
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple
 from .database import DatabaseManager
@@ -12,9 +14,13 @@ from .database import DatabaseManager
 class CookieManager:
     """Cookie管理器"""
     
-    def __init__(self, cookies_dir: str, db_manager: DatabaseManager):
+    def __init__(self, cookies_dir: str, db_manager: DatabaseManager, stats_ttl_seconds: float = 30):
         self.cookies_dir = cookies_dir
         self.db_manager = db_manager
+        # 统计摘要缓存：(缓存键, 过期时间, 统计)，Cookie文件增删或过期后重新计算
+        self.stats_ttl_seconds = stats_ttl_seconds
+        self._stats_cache = None
+        self._stats_lock = threading.Lock()
         os.makedirs(cookies_dir, exist_ok=True)
     
     def hash_cookie(self, cookie_string: str) -> str:
@@ -60,6 +66,7 @@ class CookieManager:
             cookie_file = os.path.join(self.cookies_dir, f"{cookie_name}.txt")
             with open(cookie_file, 'w', encoding='utf-8') as f:
                 f.write(cookie_string.strip())
+            self.invalidate_stats()
             
             # 记录到数据库
             cookie_hash = self.hash_cookie(cookie_string)
@@ -173,6 +180,7 @@ class CookieManager:
                 return False, f"Cookie文件 {cookie_name}.txt 不存在"
             
             os.remove(cookie_file)
+            self.invalidate_stats()
             return True, f"Cookie {cookie_name} 已删除"
             
         except Exception as e:
@@ -214,18 +222,45 @@ class CookieManager:
             }
         }
     
+    def invalidate_stats(self):
+        """Cookie文件变化后丢弃缓存的统计摘要"""
+        with self._stats_lock:
+            self._stats_cache = None
+    
+    def _stats_cache_key(self) -> tuple:
+        # 目录修改时间覆盖其他进程增删Cookie文件；日期变化时每日使用次数清零
+        try:
+            dir_mtime = os.stat(self.cookies_dir).st_mtime_ns
+        except OSError:
+            dir_mtime = None
+        return dir_mtime, datetime.now().date()
+    
     def get_cookie_stats(self) -> Dict:
-        """获取Cookie统计信息"""
+        """
+        获取Cookie统计信息
+        
+        完整统计需要读取每个Cookie文件并为每个Cookie查询两次数据库，结果缓存
+        stats_ttl_seconds秒（使用次数/冷却状态最多滞后这么久），保存/删除Cookie时立即失效。
+        """
+        key = self._stats_cache_key()
+        now = time.monotonic()
+        with self._stats_lock:
+            if self._stats_cache and self._stats_cache[0] == key and now < self._stats_cache[1]:
+                return dict(self._stats_cache[2])
+        
         cookies = self.list_cookies()
         
         total_cookies = len(cookies)
         available_cookies = len([c for c in cookies if c['can_use']])
         invalid_cookies = len([c for c in cookies if c['status'] == 'invalid'])
         
-        return {
+        stats = {
             'total_cookies': total_cookies,
             'available_cookies': available_cookies,
             'limited_cookies': total_cookies - available_cookies - invalid_cookies,
             'invalid_cookies': invalid_cookies,
             'availability_rate': (available_cookies / total_cookies * 100) if total_cookies > 0 else 0
-        }
\ No newline at end of file
+        }
+        with self._stats_lock:
+            self._stats_cache = (key, now + self.stats_ttl_seconds, stats)
+        return dict(stats)
@@ -4,118 +4,101 @@
 
 import sqlite3
 import json
+import base64
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional
 import os
 
+from .connection_pool import ConnectionPool
+from .migrations import backup_database, run_migrations
+from .db_writer import DatabaseWriter
+
 class DatabaseManager:
     """数据库管理器"""
     
     def __init__(self, db_path: str):
+        from config.crawler_config import DATABASE_CONFIG
         self.db_path = db_path
+        self.journal_mode = DATABASE_CONFIG.get('JOURNAL_MODE', 'WAL')
+        self.auto_vacuum = DATABASE_CONFIG.get('AUTO_VACUUM')
+        self.backup_dir = DATABASE_CONFIG.get('BACKUP_DIR')
         self.init_database()
+        
+        # 连接池：复用连接和预编译语句，每个连接设置相同的PRAGMA
+        self.pool = ConnectionPool(
+            db_path,
+            size=DATABASE_CONFIG.get('POOL_SIZE', 8),
+            pragmas={
+                'synchronous': DATABASE_CONFIG.get('SYNCHRONOUS', 'NORMAL'),
+                'busy_timeout': DATABASE_CONFIG.get('BUSY_TIMEOUT_MS', 5000)
+            },
+            timeout=DATABASE_CONFIG.get('BUSY_TIMEOUT_MS', 5000) / 1000,
+            cached_statements=DATABASE_CONFIG.get('CACHED_STATEMENTS', 256)
+        )
+        
+        # 单写线程：各线程的写操作排队执行并按批提交
+        self.writer = DatabaseWriter(self.pool, batch_size=DATABASE_CONFIG.get('WRITE_BATCH_SIZE', 64))
+        self.writer.start()
     
     def init_database(self):
-        """初始化数据库表"""
+        """初始化数据库：设置日志模式并执行未执行的结构迁移"""
         os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
         
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            
-            # 创建爬取历史表
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS crawl_history (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    task_id TEXT UNIQUE NOT NULL,
-                    city TEXT NOT NULL,
-                    categories TEXT NOT NULL,  -- JSON格式存储多个品类
-                    start_page INTEGER DEFAULT 1,
-                    end_page INTEGER NOT NULL,
-                    range_type TEXT DEFAULT 'first',  -- first, last, custom
-                    cookie_hash TEXT NOT NULL,  -- Cookie的hash值，用于识别账号
-                    start_time DATETIME NOT NULL,
-                    end_time DATETIME,
-                    status TEXT NOT NULL,  -- pending, running, completed, failed
-                    total_shops INTEGER DEFAULT 0,
-                    captcha_count INTEGER DEFAULT 0,
-                    skipped_pages INTEGER DEFAULT 0,
-                    output_file TEXT,
-                    error_message TEXT,
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            # 创建Cookie使用记录表
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS cookie_usage (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    cookie_hash TEXT NOT NULL,
-                    cookie_name TEXT,
-                    last_used DATETIME NOT NULL,
-                    daily_usage_count INTEGER DEFAULT 0,
-                    usage_date DATE NOT NULL,
-                    is_active BOOLEAN DEFAULT 1,
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(cookie_hash, usage_date)
-                )
-            ''')
-            
-            # 创建爬取组合记录表（城市+品类+日期）
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS crawl_combinations (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    city TEXT NOT NULL,
-                    category TEXT NOT NULL,
-                    crawl_date DATE NOT NULL,
-                    cookie_hash TEXT NOT NULL,
-                    task_id TEXT NOT NULL,
-                    pages_crawled INTEGER DEFAULT 0,
-                    shops_found INTEGER DEFAULT 0,
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(city, category, crawl_date, cookie_hash)
-                )
-            ''')
-            
-            # 创建任务队列表
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS task_queue (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    task_id TEXT UNIQUE NOT NULL,
-                    city TEXT NOT NULL,
-                    categories TEXT NOT NULL,
-                    start_page INTEGER DEFAULT 1,
-                    end_page INTEGER NOT NULL,
-                    range_type TEXT DEFAULT 'first',
-                    cookie_string TEXT NOT NULL,
-                    priority INTEGER DEFAULT 0,
-                    status TEXT DEFAULT 'pending',
-                    scheduled_time DATETIME,
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            conn.commit()
-    
+        # 日志模式和auto_vacuum写在数据库文件中，设置一次后所有连接生效（不能在事务中设置）
+        conn = sqlite3.connect(self.db_path)
+        try:
+            if self.auto_vacuum:
+                self._set_auto_vacuum(conn)
+            conn.execute(f'PRAGMA journal_mode={self.journal_mode}')
+        finally:
+            conn.close()
+        
+        run_migrations(self.db_path, backup_dir=self.backup_dir)
+        
+        # 更新查询规划器使用的统计信息（只分析变化较大的表）
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.execute('PRAGMA optimize')
+        finally:
+            conn.close()
+
+    def _set_auto_vacuum(self, conn):
+        """新库建表前设置即可生效；已有库需要VACUUM一次重建才能切换（只在第一次启动时发生）"""
+        modes = {'NONE': 0, 'FULL': 1, 'INCREMENTAL': 2}
+        if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == modes.get(self.auto_vacuum.upper()):
+            return
+        conn.execute(f'PRAGMA auto_vacuum={self.auto_vacuum}')
+        if conn.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()[0]:
+            # VACUUM重写整个数据库文件，和重迁移一样先备份
+            if self.backup_dir:
+                backup_path = backup_database(self.db_path, self.backup_dir, 'auto_vacuum')
+                if backup_path:
+                    print(f"切换auto_vacuum前已备份数据库: {backup_path}")
+            print(f"切换数据库auto_vacuum为{self.auto_vacuum}，正在执行VACUUM...")
+            conn.execute('VACUUM')
+
     def get_connection(self):
-        """获取数据库连接"""
-        return sqlite3.connect(self.db_path)
+        """
+        从连接池借用一个数据库连接
+        
+        用法与sqlite3连接相同：`with db_manager.get_connection() as conn:`，
+        退出时提交（异常时回滚）并归还连接。
+        """
+        return self.pool.connection()
     
     def add_crawl_history(self, task_id: str, city: str, categories: List[str], 
-                         start_page: int, end_page: int, range_type: str, cookie_hash: str) -> bool:
+                         start_page: int, end_page: int, range_type: str, cookie_hash: str,
+                         dedupe_key: str = None, idempotency_key: str = None) -> bool:
         """添加爬取历史记录"""
         try:
-            with self.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT INTO crawl_history 
-                    (task_id, city, categories, start_page, end_page, range_type, cookie_hash, start_time, status)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (task_id, city, json.dumps(categories), start_page, end_page, range_type, cookie_hash, 
-                      datetime.now(), 'pending'))
-                conn.commit()
-                return True
+            self.writer.execute('''
+                INSERT INTO crawl_history 
+                (task_id, city, categories, start_page, end_page, range_type, cookie_hash, start_time, status,
+                 dedupe_key, idempotency_key)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (task_id, city, json.dumps(categories), start_page, end_page, range_type, cookie_hash, 
+                  datetime.now(), 'pending', dedupe_key, idempotency_key))
+            return True
         except Exception as e:
             print(f"添加爬取历史失败: {e}")
             return False
@@ -123,31 +106,27 @@ class DatabaseManager:
     def update_crawl_history(self, task_id: str, **kwargs) -> bool:
         """更新爬取历史记录"""
         try:
-            with self.get_connection() as conn:
-                cursor = conn.cursor()
-                
-                # 构建更新SQL
-                set_clauses = []
-                values = []
-                
-                for key, value in kwargs.items():
-                    if key in ['status', 'end_time', 'total_shops', 'captcha_count', 
-                              'skipped_pages', 'output_file', 'error_message']:
-                        set_clauses.append(f"{key} = ?")
-                        values.append(value)
-                
-                if not set_clauses:
-                    return False
-                
-                set_clauses.append("updated_at = ?")
-                values.append(datetime.now())
-                values.append(task_id)
-                
-                sql = f"UPDATE crawl_history SET {', '.join(set_clauses)} WHERE task_id = ?"
-                cursor.execute(sql, values)
-                conn.commit()
-                return True
-                
+            # 构建更新SQL
+            set_clauses = []
+            values = []
+            
+            for key, value in kwargs.items():
+                if key in ['status', 'end_time', 'total_shops', 'captcha_count', 
+                          'skipped_pages', 'output_file', 'error_message']:
+                    set_clauses.append(f"{key} = ?")
+                    values.append(value)
+            
+            if not set_clauses:
+                return False
+            
+            set_clauses.append("updated_at = ?")
+            values.append(datetime.now())
+            values.append(task_id)
+            
+            sql = f"UPDATE crawl_history SET {', '.join(set_clauses)} WHERE task_id = ?"
+            self.writer.execute(sql, values)
+            return True
+            
         except Exception as e:
             print(f"更新爬取历史失败: {e}")
             return False
@@ -155,38 +134,20 @@ class DatabaseManager:
     def record_cookie_usage(self, cookie_hash: str, cookie_name: str = None) -> bool:
         """记录Cookie使用情况"""
         try:
-            with self.get_connection() as conn:
-                cursor = conn.cursor()
-                today = datetime.now().date()
-                
-                # 检查今天是否已有记录
-                cursor.execute('''
-                    SELECT daily_usage_count FROM cookie_usage 
-                    WHERE cookie_hash = ? AND usage_date = ?
-                ''', (cookie_hash, today))
-                
-                result = cursor.fetchone()
-                
-                if result:
-                    # 更新使用次数
-                    cursor.execute('''
-                        UPDATE cookie_usage 
-                        SET daily_usage_count = daily_usage_count + 1, 
-                            last_used = ?,
-                            cookie_name = COALESCE(?, cookie_name)
-                        WHERE cookie_hash = ? AND usage_date = ?
-                    ''', (datetime.now(), cookie_name, cookie_hash, today))
-                else:
-                    # 插入新记录
-                    cursor.execute('''
-                        INSERT INTO cookie_usage 
-                        (cookie_hash, cookie_name, last_used, daily_usage_count, usage_date)
-                        VALUES (?, ?, ?, 1, ?)
-                    ''', (cookie_hash, cookie_name, datetime.now(), today))
-                
-                conn.commit()
-                return True
-                
+            today = datetime.now().date()
+            
+            # 今天已有记录时累加使用次数，否则插入新记录（按cookie_hash+usage_date唯一）
+            self.writer.execute('''
+                INSERT INTO cookie_usage 
+                (cookie_hash, cookie_name, last_used, daily_usage_count, usage_date)
+                VALUES (?, ?, ?, 1, ?)
+                ON CONFLICT(cookie_hash, usage_date) DO UPDATE SET
+                    daily_usage_count = daily_usage_count + 1,
+                    last_used = excluded.last_used,
+                    cookie_name = COALESCE(excluded.cookie_name, cookie_name)
+            ''', (cookie_hash, cookie_name, datetime.now(), today))
+            return True
+            
         except Exception as e:
             print(f"记录Cookie使用失败: {e}")
             return False
@@ -219,10 +180,16 @@ class DatabaseManager:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
                 
+                # 每个状态分别取MAX，各自只需在(cookie_hash, status, start_time)索引上定位一次
                 cursor.execute('''
-                    SELECT MAX(start_time) FROM crawl_history 
-                    WHERE cookie_hash = ? AND status IN ('completed', 'running')
-                ''', (cookie_hash,))
+                    SELECT MAX(last_start) FROM (
+                        SELECT MAX(start_time) AS last_start FROM crawl_history 
+                        WHERE cookie_hash = ? AND status = 'completed'
+                        UNION ALL
+                        SELECT MAX(start_time) FROM crawl_history 
+                        WHERE cookie_hash = ? AND status = 'running'
+                    )
+                ''', (cookie_hash, cookie_hash))
                 
                 result = cursor.fetchone()
                 last_crawl_time = result[0] if result and result[0] else None
@@ -263,19 +230,15 @@ class DatabaseManager:
                                task_id: str, pages_crawled: int = 0, shops_found: int = 0) -> bool:
         """记录爬取组合"""
         try:
-            with self.get_connection() as conn:
-                cursor = conn.cursor()
-                today = datetime.now().date()
-                
-                cursor.execute('''
-                    INSERT OR REPLACE INTO crawl_combinations 
-                    (city, category, crawl_date, cookie_hash, task_id, pages_crawled, shops_found)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                ''', (city, category, today, cookie_hash, task_id, pages_crawled, shops_found))
-                
-                conn.commit()
-                return True
-                
+            today = datetime.now().date()
+            
+            self.writer.execute('''
+                INSERT OR REPLACE INTO crawl_combinations 
+                (city, category, crawl_date, cookie_hash, task_id, pages_crawled, shops_found)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (city, category, today, cookie_hash, task_id, pages_crawled, shops_found))
+            return True
+            
         except Exception as e:
             print(f"记录爬取组合失败: {e}")
             return False
@@ -307,36 +270,146 @@ class DatabaseManager:
             print(f"获取爬取历史失败: {e}")
             return []
     
-    def get_crawl_stats(self) -> Dict:
-        """获取爬取统计信息"""
+    @staticmethod
+    def encode_history_cursor(created_at: str, history_id: int) -> str:
+        """把一页最后一条记录的(created_at, id)编码成下一页的游标"""
+        raw = json.dumps([created_at, history_id]).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+    
+    @staticmethod
+    def decode_history_cursor(cursor: str) -> tuple:
+        """解析游标，格式不正确时抛出ValueError"""
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            created_at, history_id = json.loads(raw)
+        except Exception:
+            raise ValueError('无效的分页游标')
+        if not isinstance(created_at, str) or not isinstance(history_id, int):
+            raise ValueError('无效的分页游标')
+        return created_at, history_id
+    
+    def get_crawl_history_page(self, limit: int = 20, cursor: str = None, city: str = None,
+                               category: str = None, status: str = None, cookie_hash: str = None) -> Dict:
+        """
+        按(created_at, id)倒序游标分页获取爬取历史
+        
+        每页从上一页最后一条记录的位置在索引上直接定位，翻到多深都只读limit+1行。
+        品类筛选走crawl_history_categories副表。不带筛选时total来自crawl_stats计数；
+        带筛选时total只在第一页（不带cursor）计算，之后的页为None。
+        
+        Returns:
+            {'records': [...], 'next_cursor': 下一页游标（没有更多时为None）, 'total': 总数}
+        
+        Raises:
+            ValueError: 游标格式不正确
+        """
+        position = self.decode_history_cursor(cursor) if cursor else None
+        
+        if category:
+            source = 'crawl_history_categories c JOIN crawl_history h ON h.id = c.history_id'
+            order_columns = ('c.created_at', 'c.history_id')
+            conditions, params = ['c.category = ?'], [category]
+        else:
+            source = 'crawl_history h'
+            order_columns = ('h.created_at', 'h.id')
+            conditions, params = [], []
+        for column, value in (('city', city), ('status', status), ('cookie_hash', cookie_hash)):
+            if value:
+                conditions.append(f'h.{column} = ?')
+                params.append(value)
+        filtered = bool(conditions)
+        
+        try:
+            with self.get_connection() as conn:
+                cursor_obj = conn.cursor()
+                
+                total = None
+                if not filtered:
+                    cursor_obj.execute("SELECT total_tasks FROM crawl_stats WHERE stat_date = '*'")
+                    row = cursor_obj.fetchone()
+                    total = row[0] if row else 0
+                elif position is None:
+                    cursor_obj.execute(f"SELECT COUNT(*) FROM {source} WHERE {' AND '.join(conditions)}", params)
+                    total = cursor_obj.fetchone()[0]
+                
+                page_conditions, page_params = list(conditions), list(params)
+                if position is not None:
+                    page_conditions.append(f'({order_columns[0]}, {order_columns[1]}) < (?, ?)')
+                    page_params.extend(position)
+                where = f"WHERE {' AND '.join(page_conditions)}" if page_conditions else ''
+                
+                # 多取一行判断是否还有下一页
+                cursor_obj.execute(f'''
+                    SELECT h.* FROM {source} {where}
+                    ORDER BY {order_columns[0]} DESC, {order_columns[1]} DESC
+                    LIMIT ?
+                ''', page_params + [limit + 1])
+                
+                columns = [description[0] for description in cursor_obj.description]
+                rows = cursor_obj.fetchall()
+                
+            records = []
+            for row in rows[:limit]:
+                record = dict(zip(columns, row))
+                if record['categories']:
+                    record['categories'] = json.loads(record['categories'])
+                records.append(record)
+            
+            next_cursor = None
+            if len(rows) > limit and records:
+                last = records[-1]
+                next_cursor = self.encode_history_cursor(last['created_at'], last['id'])
+            
+            return {'records': records, 'next_cursor': next_cursor, 'total': total}
+            
+        except Exception as e:
+            print(f"获取爬取历史失败: {e}")
+            return {'records': [], 'next_cursor': None, 'total': 0}
+    
+    def get_crawl_history_by_task_id(self, task_id: str) -> Optional[Dict]:
+        """按task_id获取一条爬取历史记录（task_id有唯一索引）"""
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
+                cursor.execute('SELECT * FROM crawl_history WHERE task_id = ?', (task_id,))
                 
-                # 总任务数
-                cursor.execute('SELECT COUNT(*) FROM crawl_history')
-                total_tasks = cursor.fetchone()[0]
-                
-                # 今日任务数
-                today = datetime.now().date()
-                cursor.execute('''
-                    SELECT COUNT(*) FROM crawl_history 
-                    WHERE DATE(created_at) = ?
-                ''', (today,))
-                today_tasks = cursor.fetchone()[0]
+                row = cursor.fetchone()
+                if not row:
+                    return None
                 
-                # 成功任务数
-                cursor.execute("SELECT COUNT(*) FROM crawl_history WHERE status = 'completed'")
-                completed_tasks = cursor.fetchone()[0]
+                columns = [description[0] for description in cursor.description]
+                record = dict(zip(columns, row))
+                if record['categories']:
+                    record['categories'] = json.loads(record['categories'])
+                return record
                 
-                # 总商铺数
-                cursor.execute('SELECT SUM(total_shops) FROM crawl_history WHERE total_shops IS NOT NULL')
-                result = cursor.fetchone()
-                total_shops = result[0] if result[0] else 0
+        except Exception as e:
+            print(f"获取爬取历史失败: {e}")
+            return None
+    
+    def get_crawl_stats(self) -> Dict:
+        """
+        获取爬取统计信息
+        
+        任务数和商铺数来自触发器增量维护的crawl_stats表（按主键读'*'和今天两行），
+        不随爬取历史的行数增长。
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                today = datetime.now().date()
                 
-                # 活跃Cookie数
                 cursor.execute('''
-                    SELECT COUNT(DISTINCT cookie_hash) FROM cookie_usage 
+                    SELECT stat_date, total_tasks, completed_tasks, total_shops FROM crawl_stats 
+                    WHERE stat_date IN ('*', ?)
+                ''', (str(today),))
+                counters = {row[0]: row[1:] for row in cursor.fetchall()}
+                total_tasks, completed_tasks, total_shops = counters.get('*', (0, 0, 0))
+                today_tasks = counters.get(str(today), (0, 0, 0))[0]
+                
+                # 活跃Cookie数（cookie_usage按cookie_hash+usage_date唯一，只扫描今天的索引区间）
+                cursor.execute('''
+                    SELECT COUNT(*) FROM cookie_usage 
                     WHERE usage_date = ?
                 ''', (today,))
                 active_cookies = cursor.fetchone()[0]
@@ -354,31 +427,17 @@ class DatabaseManager:
             print(f"获取统计信息失败: {e}")
             return {}
     
-    def cleanup_old_records(self, days: int = 30):
-        """清理旧记录"""
+    def cleanup_old_records(self, days: int = 30) -> bool:
+        """立即归档并分批删除超过days天的旧记录（后台定期执行见 DatabaseMaintenance）"""
+        from ..core.db_maintenance import DatabaseMaintenance
         try:
-            with self.get_connection() as conn:
-                cursor = conn.cursor()
-                cutoff_date = datetime.now() - timedelta(days=days)
-                
-                # 清理旧的爬取历史
-                cursor.execute('DELETE FROM crawl_history WHERE created_at < ?', (cutoff_date,))
-                
-                # 清理旧的Cookie使用记录
-                cursor.execute('DELETE FROM cookie_usage WHERE usage_date < ?', (cutoff_date.date(),))
-                
-                # 清理旧的爬取组合记录
-                cursor.execute('DELETE FROM crawl_combinations WHERE crawl_date < ?', (cutoff_date.date(),))
-                
-                conn.commit()
-                return True
-                
+            result = DatabaseMaintenance(self, retention_days=days).run_once()
+            return bool(result) and not result['errors']
         except Exception as e:
             print(f"清理旧记录失败: {e}")
             return False
     
     def close(self):
-        """关闭数据库连接"""
-        # SQLite使用连接池，每次操作都会自动打开和关闭连接
-        # 这里主要是为了兼容性，实际上SQLite不需要显式关闭
-        pass
\ No newline at end of file
+        """执行完排队的写操作，关闭连接池中的数据库连接"""
+        self.writer.stop()
+        self.pool.close()
\ No newline at end of file
@@ -0,0 +1,235 @@
+"""
+单写线程 - 所有写操作排队交给一个线程执行，按批提交
+
+SQLite同一时刻只允许一个写事务，多个线程各自提交时会互相等待锁，并且每次提交都要刷盘。
+写线程每次取出队列中已积累的全部写操作（最多batch_size个），在一个事务中执行后只提交一次：
+负载低时每个写操作立即单独提交，不增加延迟；并发写入多时自动合并成批。
+每个写操作在自己的SAVEPOINT中执行，失败只回滚它自己，不影响同批的其他写操作。
+
+需要读到自己写入结果的调用方使用 wait=True（默认），提交完成后才返回；
+不关心结果的写操作使用 wait=False 立即返回，之后需要读取时调用 flush()。
+不能在事务中执行的操作（如 PRAGMA wal_checkpoint）用 transaction=False 提交，
+写线程先提交此前的批次，再在事务之外单独执行它。
+"""
+
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from ..core.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+DB_WRITES = REGISTRY.counter('db_writes_total', '写线程执行的写操作数（按结果）', ('result',))
+DB_WRITE_COMMITS = REGISTRY.counter('db_write_commits_total', '写线程提交的事务数（每次提交一次刷盘）')
+DB_WRITE_BATCH_SIZE = REGISTRY.histogram('db_write_batch_size', '每次提交包含的写操作数',
+                                         buckets=(1, 2, 4, 8, 16, 32, 64, 128))
+DB_WRITE_WAIT_SECONDS = REGISTRY.histogram('db_write_wait_seconds', '写操作从入队到提交的耗时(秒)',
+                                           buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5))
+DB_WRITE_QUEUE = REGISTRY.gauge('db_write_queue_depth', '等待写线程执行的写操作数')
+
+class _WriteIntent:
+    """一个排队中的写操作"""
+
+    __slots__ = ('operation', 'wait', 'transaction', 'done', 'result', 'error', 'queued_at')
+
+    def __init__(self, operation: Callable, wait: bool, transaction: bool = True):
+        self.operation = operation
+        self.wait = wait
+        self.transaction = transaction
+        self.done = threading.Event() if wait else None
+        self.result = None
+        self.error = None
+        self.queued_at = time.perf_counter()
+
+_STOP = object()
+
+class DatabaseWriter:
+    """数据库单写线程"""
+
+    def __init__(self, pool, batch_size: int = 64):
+        self.pool = pool
+        self.batch_size = batch_size
+        self.intents = 0
+        self.batches = 0
+        self.failures = 0
+        self.max_batch = 0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._stopped = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+            self._thread.start()
+        DB_WRITE_QUEUE.set_function(self._queue.qsize)
+
+    def stop(self, timeout: float = 10):
+        """执行完已排队的写操作后停止"""
+        thread = self._thread
+        if not thread or not thread.is_alive():
+            return
+        with self._lock:
+            # 停止标记之后不再入队，之后的写操作直接执行
+            self._stopped = True
+            self._queue.put(_STOP)
+        thread.join(timeout)
+
+    def submit(self, operation: Callable[[Any], Any], wait: bool = True, transaction: bool = True) -> Any:
+        """
+        提交一个写操作
+
+        Args:
+            operation: 接收cursor并执行写入的函数，返回值作为结果
+            wait: 是否等待提交完成；为True时返回operation的结果，出错时抛出对应异常
+            transaction: 为False时不放进批量事务，在事务之外单独执行
+
+        Returns:
+            wait=True时为operation的返回值，否则为None
+        """
+        thread = self._thread
+        intent = _WriteIntent(operation, wait, transaction)
+        with self._lock:
+            queued = thread is not None and thread.is_alive() and not self._stopped \
+                and threading.current_thread() is not thread
+            if queued:
+                self._queue.put(intent)
+        if not queued:
+            # 写线程未启动或已停止（或在写操作内部再次写入）时直接执行
+            return self._execute_directly(operation)
+        if not wait:
+            return None
+        intent.done.wait()
+        if intent.error is not None:
+            raise intent.error
+        return intent.result
+
+    def execute(self, sql: str, params: Iterable = (), wait: bool = True) -> Optional[int]:
+        """执行一条写入SQL，wait=True时返回受影响行数"""
+        params = tuple(params)
+
+        def operation(cursor):
+            cursor.execute(sql, params)
+            return cursor.rowcount
+        return self.submit(operation, wait)
+
+    def executemany(self, sql: str, rows: Iterable[Iterable], wait: bool = True) -> Optional[int]:
+        rows = [tuple(row) for row in rows]
+
+        def operation(cursor):
+            cursor.executemany(sql, rows)
+            return cursor.rowcount
+        return self.submit(operation, wait)
+
+    def flush(self):
+        """等待此前提交的所有写操作完成（用于wait=False之后需要读到结果的场景）"""
+        self.submit(lambda cursor: None, wait=True)
+
+    def _execute_directly(self, operation: Callable) -> Any:
+        with self.pool.connection() as conn:
+            return operation(conn.cursor())
+
+    def _run(self):
+        next_intent = None
+        while True:
+            intent = next_intent or self._queue.get()
+            next_intent = None
+            if intent is _STOP:
+                return
+            if not intent.transaction:
+                self._execute_alone(intent)
+                continue
+
+            # 取出已积累的写操作组成一批，不额外等待；遇到事务外执行的操作时先提交这一批
+            batch = [intent]
+            stopping = False
+            while len(batch) < self.batch_size:
+                try:
+                    intent = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if intent is _STOP:
+                    stopping = True
+                    break
+                if not intent.transaction:
+                    next_intent = intent
+                    break
+                batch.append(intent)
+
+            self._commit_batch(batch)
+            if stopping:
+                return
+
+    def _execute_alone(self, intent):
+        """在事务之外执行一个写操作（连接处于自动提交状态）"""
+        try:
+            with self.pool.connection() as conn:
+                intent.result = intent.operation(conn.cursor())
+        except Exception as e:
+            intent.error = e
+        self._finish([intent])
+
+    def _commit_batch(self, batch):
+        try:
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('BEGIN IMMEDIATE')
+                for intent in batch:
+                    cursor.execute('SAVEPOINT write_intent')
+                    try:
+                        intent.result = intent.operation(cursor)
+                        cursor.execute('RELEASE write_intent')
+                    except Exception as e:
+                        cursor.execute('ROLLBACK TO write_intent')
+                        cursor.execute('RELEASE write_intent')
+                        intent.error = e
+                # 退出with时提交整批
+        except Exception as e:
+            # 提交本身失败（如磁盘错误），整批都算失败
+            logger.error(f"批量写入提交失败: {e}")
+            for intent in batch:
+                if intent.error is None:
+                    intent.result = None
+                    intent.error = e
+        self._finish(batch)
+
+    def _finish(self, batch):
+        """通知等待方并记录指标"""
+        now = time.perf_counter()
+        failed = 0
+        for intent in batch:
+            DB_WRITE_WAIT_SECONDS.observe(now - intent.queued_at)
+            if intent.error is not None:
+                failed += 1
+                if not intent.wait:
+                    logger.error(f"数据库写入失败: {intent.error}")
+            if intent.done is not None:
+                intent.done.set()
+
+        DB_WRITES.inc(len(batch) - failed, result='ok')
+        if failed:
+            DB_WRITES.inc(failed, result='error')
+        DB_WRITE_COMMITS.inc()
+        DB_WRITE_BATCH_SIZE.observe(len(batch))
+        with self._lock:
+            self.intents += len(batch)
+            self.batches += 1
+            self.failures += failed
+            self.max_batch = max(self.max_batch, len(batch))
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                'queued': self._queue.qsize(),
+                'intents': self.intents,
+                'commits': self.batches,
+                'failures': self.failures,
+                'max_batch': self.max_batch,
+                'avg_batch': round(self.intents / self.batches, 2) if self.batches else 0.0
+            }
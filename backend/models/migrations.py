@@ -0,0 +1,453 @@
+"""
+数据库迁移 - 按版本号顺序、只前进地升级数据库结构
+
+每个迁移有唯一递增的版本号，已执行的版本记录在 schema_migrations 表中。
+启动时在一个事务中执行所有未执行的迁移，任何一步失败都整体回滚，数据库保持原状。
+迁移步骤本身也要可重复执行（IF NOT EXISTS、检查列是否存在），以兼容在引入迁移之前
+已经手工建好表的旧库。
+
+标记为heavy的迁移（给大表建索引、重写数据）执行前先用sqlite3在线备份API备份数据库。
+
+新增表/列/索引时在 MIGRATIONS 末尾追加一个迁移，不要修改已发布的迁移。
+"""
+
+import logging
+import os
+import sqlite3
+from datetime import datetime
+from typing import Callable, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    apply: Callable  # apply(cursor)
+    heavy: bool = False
+
+def add_column_if_missing(cursor, table: str, column: str, definition: str):
+    """为已存在的表补充缺失的列"""
+    cursor.execute(f'PRAGMA table_info({table})')
+    existing_columns = [row[1] for row in cursor.fetchall()]
+    if column not in existing_columns:
+        cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+
+def _create_base_tables(cursor):
+    # 爬取历史表
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS crawl_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            task_id TEXT UNIQUE NOT NULL,
+            city TEXT NOT NULL,
+            categories TEXT NOT NULL,  -- JSON格式存储多个品类
+            start_page INTEGER DEFAULT 1,
+            end_page INTEGER NOT NULL,
+            range_type TEXT DEFAULT 'first',  -- first, last, custom
+            cookie_hash TEXT NOT NULL,  -- Cookie的hash值，用于识别账号
+            start_time DATETIME NOT NULL,
+            end_time DATETIME,
+            status TEXT NOT NULL,  -- pending, running, completed, failed
+            total_shops INTEGER DEFAULT 0,
+            captcha_count INTEGER DEFAULT 0,
+            skipped_pages INTEGER DEFAULT 0,
+            output_file TEXT,
+            error_message TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Cookie使用记录表
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS cookie_usage (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            cookie_hash TEXT NOT NULL,
+            cookie_name TEXT,
+            last_used DATETIME NOT NULL,
+            daily_usage_count INTEGER DEFAULT 0,
+            usage_date DATE NOT NULL,
+            is_active BOOLEAN DEFAULT 1,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(cookie_hash, usage_date)
+        )
+    ''')
+
+    # 爬取组合记录表（城市+品类+日期）
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS crawl_combinations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            city TEXT NOT NULL,
+            category TEXT NOT NULL,
+            crawl_date DATE NOT NULL,
+            cookie_hash TEXT NOT NULL,
+            task_id TEXT NOT NULL,
+            pages_crawled INTEGER DEFAULT 0,
+            shops_found INTEGER DEFAULT 0,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(city, category, crawl_date, cookie_hash)
+        )
+    ''')
+
+    # 任务队列表
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS task_queue (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            task_id TEXT UNIQUE NOT NULL,
+            city TEXT NOT NULL,
+            categories TEXT NOT NULL,
+            start_page INTEGER DEFAULT 1,
+            end_page INTEGER NOT NULL,
+            range_type TEXT DEFAULT 'first',
+            cookie_string TEXT NOT NULL,
+            priority INTEGER DEFAULT 0,
+            status TEXT DEFAULT 'pending',
+            scheduled_time DATETIME,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+def _add_task_queue_columns(cursor):
+    # 排序方式、去重/幂等键、缓存开关、提交人和远程工作节点租约
+    add_column_if_missing(cursor, 'task_queue', 'sort_type', "TEXT DEFAULT 'popularity'")
+    add_column_if_missing(cursor, 'task_queue', 'dedupe_key', 'TEXT')
+    add_column_if_missing(cursor, 'task_queue', 'idempotency_key', 'TEXT')
+    add_column_if_missing(cursor, 'task_queue', 'use_cache', 'INTEGER DEFAULT 1')
+    add_column_if_missing(cursor, 'task_queue', 'cookie_hash', 'TEXT')
+    add_column_if_missing(cursor, 'task_queue', 'submitter', 'TEXT')
+    add_column_if_missing(cursor, 'task_queue', 'worker_id', 'TEXT')
+    add_column_if_missing(cursor, 'task_queue', 'lease_id', 'TEXT')
+    add_column_if_missing(cursor, 'task_queue', 'lease_expires_at', 'DATETIME')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_task_queue_dedupe_key ON task_queue(dedupe_key)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_task_queue_idempotency_key ON task_queue(idempotency_key)')
+
+def _create_cache_tables(cursor):
+    # 列表页结果缓存表（城市+品类+排序+页码）
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS page_cache (
+            city_code TEXT NOT NULL,
+            category_id TEXT NOT NULL,
+            sort_type TEXT NOT NULL,
+            page_num INTEGER NOT NULL,
+            shops TEXT NOT NULL,  -- JSON格式存储该页商铺
+            shop_count INTEGER DEFAULT 0,
+            crawled_at DATETIME NOT NULL,
+            PRIMARY KEY (city_code, category_id, sort_type, page_num)
+        )
+    ''')
+
+    # 分阶段耗时统计表（城市+品类+页码+阶段，'*'/0表示汇总层级）
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS phase_timing_stats (
+            city_code TEXT NOT NULL,
+            category_id TEXT NOT NULL,
+            page_num INTEGER NOT NULL,
+            phase TEXT NOT NULL,
+            sample_count INTEGER DEFAULT 0,
+            total_seconds REAL DEFAULT 0,
+            total_sq_seconds REAL DEFAULT 0,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (city_code, category_id, page_num, phase)
+        )
+    ''')
+
+def _create_query_indexes(cursor):
+    # 历史列表按created_at排序、今日任务按created_at范围、
+    # 冷却检查按cookie_hash+status取MAX(start_time)、任务领取按status+created_at
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_crawl_history_created_at ON crawl_history(created_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_crawl_history_cookie_status_start '
+                   'ON crawl_history(cookie_hash, status, start_time)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_crawl_history_status ON crawl_history(status)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_cookie_usage_date_hash ON cookie_usage(usage_date, cookie_hash)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_crawl_combinations_cookie_date '
+                   'ON crawl_combinations(cookie_hash, crawl_date)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_task_queue_status_created ON task_queue(status, created_at)')
+
+def _create_crawl_stats(cursor):
+    # 仪表板计数表：每天一行（按created_at的日期），stat_date='*'为全部汇总。
+    # 由crawl_history上的触发器在插入/更新/删除时增量维护，仪表板只按主键读两行
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS crawl_stats (
+            stat_date TEXT PRIMARY KEY,
+            total_tasks INTEGER DEFAULT 0,
+            completed_tasks INTEGER DEFAULT 0,
+            total_shops INTEGER DEFAULT 0
+        )
+    ''')
+
+    # 从已有历史初始化计数（与触发器在同一事务中创建，中间不会漏掉写入）
+    cursor.execute('DELETE FROM crawl_stats')
+    cursor.execute('''
+        INSERT INTO crawl_stats (stat_date, total_tasks, completed_tasks, total_shops)
+        SELECT DATE(created_at), COUNT(*), SUM(status = 'completed'), SUM(COALESCE(total_shops, 0))
+        FROM crawl_history GROUP BY DATE(created_at)
+    ''')
+    cursor.execute('''
+        INSERT INTO crawl_stats (stat_date, total_tasks, completed_tasks, total_shops)
+        SELECT '*', COUNT(*), COALESCE(SUM(status = 'completed'), 0), COALESCE(SUM(total_shops), 0)
+        FROM crawl_history
+    ''')
+
+    # 每个触发器对当天和'*'两行各做一次增量upsert
+    def bump(row, tasks, completed, shops):
+        return f'''
+            INSERT INTO crawl_stats (stat_date, total_tasks, completed_tasks, total_shops)
+            VALUES ({row}, {tasks}, {completed}, {shops})
+            ON CONFLICT(stat_date) DO UPDATE SET
+                total_tasks = total_tasks + excluded.total_tasks,
+                completed_tasks = completed_tasks + excluded.completed_tasks,
+                total_shops = total_shops + excluded.total_shops;
+        '''
+
+    inserted = ('1', "(NEW.status = 'completed')", 'COALESCE(NEW.total_shops, 0)')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_crawl_stats_insert AFTER INSERT ON crawl_history
+        BEGIN
+            {bump('DATE(NEW.created_at)', *inserted)}
+            {bump("'*'", *inserted)}
+        END
+    ''')
+
+    updated = ('0', "(NEW.status = 'completed') - (OLD.status = 'completed')",
+               'COALESCE(NEW.total_shops, 0) - COALESCE(OLD.total_shops, 0)')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_crawl_stats_update AFTER UPDATE OF status, total_shops ON crawl_history
+        WHEN OLD.status IS NOT NEW.status OR OLD.total_shops IS NOT NEW.total_shops
+        BEGIN
+            {bump('DATE(OLD.created_at)', *updated)}
+            {bump("'*'", *updated)}
+        END
+    ''')
+
+    deleted = ('-1', "-(OLD.status = 'completed')", '-COALESCE(OLD.total_shops, 0)')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_crawl_stats_delete AFTER DELETE ON crawl_history
+        BEGIN
+            {bump('DATE(OLD.created_at)', *deleted)}
+            {bump("'*'", *deleted)}
+        END
+    ''')
+
+def _create_history_filters(cursor):
+    # 品类副表：categories是JSON数组无法建索引，每个品类一行，带created_at以便按品类做游标分页。
+    # 由触发器随crawl_history的插入/删除维护（categories写入后不再修改）
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS crawl_history_categories (
+            history_id INTEGER NOT NULL,
+            category TEXT NOT NULL,
+            created_at DATETIME NOT NULL,
+            PRIMARY KEY (category, created_at, history_id)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_crawl_history_categories_history '
+                   'ON crawl_history_categories(history_id)')
+    cursor.execute('''
+        INSERT OR IGNORE INTO crawl_history_categories (history_id, category, created_at)
+        SELECT h.id, c.value, h.created_at FROM crawl_history h, json_each(h.categories) c
+        WHERE json_valid(h.categories) AND h.created_at IS NOT NULL
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_crawl_history_categories_insert AFTER INSERT ON crawl_history
+        WHEN json_valid(NEW.categories)
+        BEGIN
+            INSERT OR IGNORE INTO crawl_history_categories (history_id, category, created_at)
+            SELECT NEW.id, value, NEW.created_at FROM json_each(NEW.categories);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_crawl_history_categories_delete AFTER DELETE ON crawl_history
+        BEGIN
+            DELETE FROM crawl_history_categories WHERE history_id = OLD.id;
+        END
+    ''')
+
+    # 历史列表按(created_at, id)游标分页，各筛选条件都带上created_at以便按顺序扫描；
+    # (status, created_at) 覆盖了原来只有status的索引
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_crawl_history_city_created ON crawl_history(city, created_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_crawl_history_status_created ON crawl_history(status, created_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_crawl_history_cookie_created '
+                   'ON crawl_history(cookie_hash, created_at)')
+    cursor.execute('DROP INDEX IF EXISTS idx_crawl_history_status')
+
+def _create_retention_indexes(cursor):
+    # 维护线程按日期找出过期的爬取组合（爬取历史和Cookie使用记录已有以日期开头的索引）
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_crawl_combinations_date ON crawl_combinations(crawl_date)')
+
+def _create_shop_tables(cursor):
+    # 商铺表：按稳定身份(城市+店名的hash)唯一，保存最近一次观测到的数据
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS shops (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            shop_key TEXT UNIQUE NOT NULL,
+            city TEXT NOT NULL,
+            shop_name TEXT NOT NULL,
+            primary_category TEXT,
+            secondary_category TEXT,
+            avg_price INTEGER,
+            review_count INTEGER,
+            rating REAL,
+            first_seen_at DATETIME NOT NULL,
+            last_seen_at DATETIME NOT NULL
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_shops_city_category ON shops(city, secondary_category)')
+
+    # 商铺观测表：每个任务在某个品类列表（排序方式）中的一个名次一行，重复回传的页面不会重复写入
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS shop_observations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            shop_id INTEGER NOT NULL,
+            task_id TEXT NOT NULL,
+            category TEXT NOT NULL,
+            sort_type TEXT NOT NULL,
+            page_num INTEGER NOT NULL,
+            rank INTEGER NOT NULL,
+            avg_price INTEGER,
+            review_count INTEGER,
+            rating REAL,
+            observed_at DATETIME NOT NULL,
+            UNIQUE(task_id, category, sort_type, rank)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_shop_observations_shop_observed '
+                   'ON shop_observations(shop_id, observed_at)')
+
+def _create_shop_imports(cursor):
+    # 已导入的输出文件（按内容hash），内容完全相同的文件只导入一次
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS shop_imports (
+            file_hash TEXT PRIMARY KEY,
+            file_name TEXT NOT NULL,
+            task_id TEXT NOT NULL,
+            row_count INTEGER DEFAULT 0,
+            imported_at DATETIME NOT NULL
+        )
+    ''')
+    # 高德补全电话的输出文件带tel列
+    add_column_if_missing(cursor, 'shops', 'tel', 'TEXT')
+
+def _compact_shop_observations(cursor):
+    # 观测改为变化点存储：同一商铺在同一品类列表(排序方式)中，名次/人均/评价数/评分与上一条相同时不再写入，
+    # 某时刻的值即该时刻之前最近一条记录的值。先删除已有数据中与上一条相同的记录
+    cursor.execute('''
+        DELETE FROM shop_observations WHERE id IN (
+            SELECT id FROM (
+                SELECT id, rank, avg_price, review_count, rating,
+                       ROW_NUMBER() OVER series AS position,
+                       LAG(rank) OVER series AS previous_rank,
+                       LAG(avg_price) OVER series AS previous_avg_price,
+                       LAG(review_count) OVER series AS previous_review_count,
+                       LAG(rating) OVER series AS previous_rating
+                FROM shop_observations
+                WINDOW series AS (PARTITION BY shop_id, category, sort_type ORDER BY observed_at, id)
+            )
+            WHERE position > 1 AND rank IS previous_rank AND avg_price IS previous_avg_price
+              AND review_count IS previous_review_count AND rating IS previous_rating
+        )
+    ''')
+    # 写入时按序列找上一条记录、读取单个商铺的历史都走(shop_id, category, sort_type, observed_at)；
+    # 涨跌榜按观测时间找出时间窗口内有变化的序列
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_shop_observations_series '
+                   'ON shop_observations(shop_id, category, sort_type, observed_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_shop_observations_observed ON shop_observations(observed_at)')
+    cursor.execute('DROP INDEX IF EXISTS idx_shop_observations_shop_observed')
+
+def _add_history_idempotency(cursor):
+    # 幂等键和请求参数指纹(去重键)随爬取历史保存，任务结束后重试同一个键仍返回原任务
+    add_column_if_missing(cursor, 'crawl_history', 'idempotency_key', 'TEXT')
+    add_column_if_missing(cursor, 'crawl_history', 'dedupe_key', 'TEXT')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_crawl_history_idempotency_key ON crawl_history(idempotency_key)')
+
+MIGRATIONS = [
+    Migration(1, 'base_tables', _create_base_tables),
+    Migration(2, 'task_queue_columns', _add_task_queue_columns),
+    Migration(3, 'cache_tables', _create_cache_tables),
+    Migration(4, 'query_indexes', _create_query_indexes, heavy=True),
+    Migration(5, 'crawl_stats', _create_crawl_stats),
+    Migration(6, 'history_filters', _create_history_filters, heavy=True),
+    Migration(7, 'retention_indexes', _create_retention_indexes),
+    Migration(8, 'shop_tables', _create_shop_tables),
+    Migration(9, 'shop_imports', _create_shop_imports),
+    Migration(10, 'shop_observation_changes', _compact_shop_observations, heavy=True),
+    Migration(11, 'history_idempotency', _add_history_idempotency),
+]
+
+def get_migration(name: str) -> Optional[Migration]:
+    for migration in MIGRATIONS:
+        if migration.name == name:
+            return migration
+    return None
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """已执行的最高迁移版本（没有迁移表时为0）"""
+    row = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'schema_migrations'").fetchone()
+    if not row:
+        return 0
+    return conn.execute('SELECT COALESCE(MAX(version), 0) FROM schema_migrations').fetchone()[0]
+
+def backup_database(db_path: str, backup_dir: str, label: str) -> Optional[str]:
+    """用sqlite3在线备份API备份数据库（其他连接可继续读写），返回备份文件路径"""
+    if not os.path.exists(db_path) or os.path.getsize(db_path) == 0:
+        return None
+
+    os.makedirs(backup_dir, exist_ok=True)
+    name = os.path.splitext(os.path.basename(db_path))[0]
+    backup_path = os.path.join(backup_dir, f"{name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{label}.db")
+    source = sqlite3.connect(db_path)
+    target = sqlite3.connect(backup_path)
+    try:
+        with target:
+            source.backup(target, pages=1024)
+    finally:
+        target.close()
+        source.close()
+    return backup_path
+
+def run_migrations(db_path: str, backup_dir: str = None, migrations: List[Migration] = None) -> List[int]:
+    """
+    执行未执行的迁移，返回本次执行的版本号
+
+    所有待执行迁移在同一个事务中执行；失败时回滚并抛出异常。
+    """
+    migrations = sorted(migrations or MIGRATIONS, key=lambda migration: migration.version)
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at DATETIME NOT NULL
+            )
+        ''')
+        current = get_schema_version(conn)
+        pending = [migration for migration in migrations if migration.version > current]
+        if not pending:
+            return []
+
+        # 已有数据的库执行重迁移前先备份（新建的空库不需要）
+        has_data = conn.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name != 'schema_migrations'").fetchone()[0]
+        if backup_dir and has_data and any(migration.heavy for migration in pending):
+            backup_path = backup_database(db_path, backup_dir, f'v{current}')
+            if backup_path:
+                logger.info(f"数据库迁移前已备份: {backup_path}")
+
+        cursor = conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            for migration in pending:
+                migration.apply(cursor)
+                cursor.execute('INSERT INTO schema_migrations (version, name, applied_at) VALUES (?, ?, ?)',
+                               (migration.version, migration.name, datetime.now()))
+            cursor.execute('COMMIT')
+        except Exception:
+            cursor.execute('ROLLBACK')
+            raise
+
+        applied = [migration.version for migration in pending]
+        logger.info(f"数据库已迁移到版本 {applied[-1]}（本次执行: "
+                    f"{', '.join(f'{m.version}:{m.name}' for m in pending)}）")
+        return applied
+    finally:
+        conn.close()
@@ -100,14 +100,115 @@ WEB_CONFIG = {
     'DEBUG': os.environ.get('FLASK_DEBUG', 'False').lower() == 'true',
     'HOST': '0.0.0.0',
     'PORT': int(os.environ.get('PORT', 5000)),
-    'THREADED': False  # 在Vercel serverless环境中禁用多线程
+    # SSE任务进度推送需要多线程处理长连接；不支持多线程的环境可设置FLASK_THREADED=false
+    'THREADED': os.environ.get('FLASK_THREADED', 'True').lower() == 'true'
 }
 
 # 数据库配置
 DATABASE_CONFIG = {
     'DB_PATH': os.path.join(BASE_DIR, 'data/database.db'),
     'BACKUP_INTERVAL_HOURS': 24,
-    'MAX_HISTORY_DAYS': 30
+    'BACKUP_DIR': os.path.join(BASE_DIR, 'data/backups'),  # 结构迁移前的在线备份目录
+    'MAX_HISTORY_DAYS': 30,         # 历史记录保留天数，超过后由维护线程归档并删除
+    'JOURNAL_MODE': 'WAL',          # WAL模式下写入不阻塞读取
+    'SYNCHRONOUS': 'NORMAL',        # WAL模式下NORMAL只在检查点时fsync，断电最多丢失最近的事务
+    'BUSY_TIMEOUT_MS': 5000,        # 数据库被锁时的等待时间(毫秒)
+    'POOL_SIZE': 8,                 # 连接池保留的空闲连接数
+    'CACHED_STATEMENTS': 256,       # 每个连接缓存的预编译语句数
+    'WRITE_BATCH_SIZE': 64,         # 写线程每次提交最多合并的写操作数
+    'AUTO_VACUUM': 'INCREMENTAL'    # 删除后的空闲页由维护线程分块归还（已有库启动时VACUUM一次完成切换）
+}
+
+# 列表页结果缓存配置
+RESULT_CACHE_CONFIG = {
+    'ENABLED': True,
+    'TTL_HOURS': 6               # 缓存有效期(小时)，超过后该页需要重新爬取
+}
+
+# 吞吐量模型配置（历史数据不足时使用默认值）
+THROUGHPUT_CONFIG = {
+    'MIN_SAMPLES': 3,                       # 某一层级至少有多少样本才被采用
+    'DEFAULT_PAGE_SECONDS': 35,             # 单页默认耗时(秒)，含页面间延迟
+    'DEFAULT_CACHED_PAGE_SECONDS': 0.1,     # 命中缓存的单页耗时(秒)
+    'DEFAULT_CATEGORY_DELAY_SECONDS': 30,   # 品类间默认延迟(秒)
+    'DEFAULT_STARTUP_SECONDS': 25,          # 浏览器启动+初始延迟默认耗时(秒)
+    'FLUSH_EVERY': 50                       # 累积多少条变更后写入数据库
+}
+
+# 任务调度配置（优先级老化 + 账号/提交人公平分享）
+SCHEDULER_CONFIG = {
+    'AGING_MINUTES': 10,            # 每等待多少分钟，有效优先级+1
+    'FAIR_SHARE_WEIGHT': 1.0,       # 近期使用量对有效优先级的惩罚权重
+    'USAGE_HALF_LIFE_MINUTES': 60,  # 近期使用量的半衰期(分钟)
+    'MAX_PRIORITY': 5,              # 提交时允许的最大优先级
+    'WAIT_SAMPLES': 200             # 每个租户保留多少条等待时间样本用于计算分位数
+}
+
+# 爬虫状态更新合并配置
+STATUS_PIPELINE_CONFIG = {
+    'WINDOW_SECONDS': 2.0,                  # 合并窗口(秒)，窗口内的普通状态更新只投递最后一条；0表示不合并
+    'IMMEDIATE_TYPES': ['error', 'warning'] # 总是立即投递的状态类型（进度100%的终态更新也立即投递）
+}
+
+# 任务事件流配置（SSE推送）
+TASK_EVENTS_CONFIG = {
+    'MAX_EVENTS_PER_TASK': 500,     # 每个任务保留的最近事件数（环形缓冲区）
+    'RETENTION_SECONDS': 600,       # 任务结束后事件保留时间(秒)，用于断线续传
+    'KEEPALIVE_SECONDS': 15,        # 无新事件时发送心跳注释的间隔(秒)
+    'MAX_STREAM_SECONDS': 300       # 单个SSE连接最长持续时间(秒)，到期后浏览器自动带Last-Event-ID重连
+}
+
+# 任务状态缓存配置（/api/crawler/status 查询热点任务时不访问数据库）
+STATUS_CACHE_CONFIG = {
+    'MAX_ENTRIES': 5000     # 缓存的最近任务数，超出后淘汰最久未查询的任务
+}
+
+# 分布式工作节点配置
+WORKER_CONFIG = {
+    # local: 只由主服务内置线程执行; remote: 只由远程工作节点领取; hybrid: 两者同时
+    'MODE': os.environ.get('CRAWLER_WORKER_MODE', 'local'),
+    'LEASE_SECONDS': 120,           # 租约有效期(秒)，超时未续约的任务重新排队
+    'RESULT_BATCH_SIZE': 50,        # 工作节点每批回传的商铺行数
+    'POLL_INTERVAL_SECONDS': 5,     # 工作节点无任务时的轮询间隔(秒)
+    'AUTH_TOKEN': os.environ.get('CRAWLER_WORKER_TOKEN', '')  # 工作节点访问令牌，remote/hybrid模式必须设置
+}
+
+# 任务耗时追踪配置（Chrome trace-event格式，写在输出CSV旁边）
+TRACE_CONFIG = {
+    'ENABLED': True,
+    'MAX_EVENTS': 20000,    # 每个任务写入时间线的最大事件数，超出后只计入汇总
+    'TRACE_DIR': os.path.join(BASE_DIR, 'data/logs/traces')  # 没有输出CSV的任务（失败或远程节点）写到这里
+}
+
+# 性能剖析配置（管理接口按任务开启cProfile/tracemalloc）
+PROFILING_CONFIG = {
+    'PROFILES_DIR': os.path.join(BASE_DIR, 'data/profiles'),
+    'MEMORY_FRAMES': 10,    # tracemalloc每个分配记录的调用栈深度
+    'TOP_N': 30,            # 报告中列出的函数/分配位置数
+    'AUTH_TOKEN': os.environ.get('CRAWLER_ADMIN_TOKEN', '')  # 管理接口访问令牌，为空时不校验
+}
+
+# 仪表板统计配置（任务/商铺计数由数据库触发器增量维护，这里只缓存需要逐个读取文件的Cookie统计）
+DASHBOARD_CONFIG = {
+    'COOKIE_STATS_TTL_SECONDS': 30  # Cookie统计摘要缓存时间(秒)，保存/删除Cookie时立即失效
+}
+
+# 数据库维护配置（过期历史归档、分批删除、增量vacuum）
+MAINTENANCE_CONFIG = {
+    'ENABLED': True,
+    'INTERVAL_HOURS': 6,            # 执行间隔(小时)
+    'START_DELAY_SECONDS': 300,     # 服务启动后延迟多久执行第一次(秒)
+    'ARCHIVE_DIR': os.path.join(BASE_DIR, 'data/archives'),  # 按月压缩归档文件目录
+    'DELETE_BATCH_SIZE': 500,       # 每批归档并删除的行数（每批一个短写事务）
+    'BATCH_PAUSE_SECONDS': 0.05,    # 批之间的停顿(秒)，让其他写操作先提交
+    'VACUUM_PAGES': 2000,           # 每次最多归还的空闲页数，0表示全部
+    'VACUUM_CHUNK_PAGES': 200       # 每个vacuum事务归还的页数
+}
+
+# 商铺数据存储配置（爬取结果按商铺写入数据库，跨任务查询不再读取CSV）
+SHOP_STORE_CONFIG = {
+    'ENABLED': True,
+    'PAGE_SIZE': 15         # 每个列表页的商铺数，名次 = (页码-1)*PAGE_SIZE + 页内序号
 }
 
 # 文件路径配置
@@ -118,6 +219,13 @@ FILE_PATHS = {
     'TEMP_DIR': os.path.join(BASE_DIR, 'data/temp')
 }
 
+# 爬虫日志配置（所有爬虫实例共用一个异步队列日志后端）
+CRAWLER_LOG_CONFIG = {
+    'QUEUE_SIZE': 10000,    # 日志队列容量，队列满时丢弃并计数，不阻塞爬虫
+    'CONSOLE': True,        # 是否同时输出到控制台
+    'EVENT_LOG': True       # 是否写入结构化事件日志 events_YYYYMMDD.jsonl（每个阶段一行JSON）
+}
+
 # 日志配置
 LOGGING_CONFIG = {
     'VERSION': 1,
@@ -0,0 +1,150 @@
+"""
+本地多工作节点验证 - 在临时数据库上启动主服务的工作节点API，
+用模拟爬虫分别以1/2/4个工作节点消费同一批任务，输出耗时和加速比。
+
+用法:
+    python crawler_service/local_harness.py --tasks 8 --pages 3 --page-seconds 0.2
+"""
+
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from flask import Flask
+from werkzeug.serving import make_server
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.models.database import DatabaseManager
+from backend.models.cookie_manager import CookieManager
+from backend.core.task_queue import TaskQueue
+from backend.core.lease_manager import LeaseManager
+from backend.api import worker_api
+from crawler_service.standalone_crawler import BackendClient, RemoteWorker
+
+CITIES = {'深圳市': 'shenzhen'}
+CATEGORIES = {'咖啡': 'g34236', '面包蛋糕甜品': 'g117'}
+
+class FakeCrawler:
+    """模拟爬虫：按固定耗时"爬取"每页并回调结果"""
+
+    def __init__(self, status_callback, phase_recorder, page_result_callback, page_seconds):
+        self.status_callback = status_callback
+        self.phase_recorder = phase_recorder
+        self.page_result_callback = page_result_callback
+        self.page_seconds = page_seconds
+        self.captcha_count = 0
+        self.skipped_pages = 0
+        self._city_code = None
+
+    def resolve_task_names(self, city_code, category_ids):
+        city_name = next(name for name, code in CITIES.items() if code == city_code)
+        category_names = [next(name for name, cid in CATEGORIES.items() if cid == category_id)
+                          for category_id in category_ids]
+        self._city_code = city_code
+        return city_name, category_names
+
+    def crawl_specific_task(self, city_name, category_names, start_page=1, end_page=15, sort_type='popularity'):
+        data = []
+        for category_name in category_names:
+            category_id = CATEGORIES[category_name]
+            for page_num in range(start_page, end_page + 1):
+                started_at = time.perf_counter()
+                time.sleep(self.page_seconds)
+                shops = [{
+                    'city': city_name,
+                    'primary_category': '美食',
+                    'secondary_category': category_name,
+                    'shop_name': f'{category_name}-{page_num}-{i}',
+                    'avg_price': '30',
+                    'review_count': str(i)
+                } for i in range(15)]
+                data.extend(shops)
+                self.phase_recorder.record(self._city_code, category_id, page_num, 'page_total',
+                                           time.perf_counter() - started_at)
+                self.status_callback({'message': f'第{page_num}页成功: {len(shops)} 个商铺'})
+                self.page_result_callback(category_id, category_name, page_num, shops, False)
+        return True, data
+
+def start_backend(workdir, lease_seconds):
+    """在临时目录上启动只包含工作节点API的主服务"""
+    db_manager = DatabaseManager(os.path.join(workdir, 'harness.db'))
+    cookie_manager = CookieManager(os.path.join(workdir, 'cookies'), db_manager)
+    task_queue = TaskQueue(db_manager, cookie_manager)
+    task_queue.page_cache = None  # 每轮都真正执行，不命中上一轮的缓存
+    lease_manager = LeaseManager(task_queue, {'LEASE_SECONDS': lease_seconds, 'RESULT_BATCH_SIZE': 50,
+                                              'POLL_INTERVAL_SECONDS': 0.2})
+    lease_manager.temp_dir = os.path.join(workdir, 'temp')
+    lease_manager.outputs_dir = os.path.join(workdir, 'outputs')
+
+    worker_api.lease_manager = lease_manager
+    worker_api.auth_token = ''
+    app = Flask(__name__)
+    app.register_blueprint(worker_api.worker_bp, url_prefix='/api/worker')
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, task_queue
+
+def run_round(num_workers, num_tasks, pages, page_seconds, lease_seconds):
+    """用num_workers个工作节点执行num_tasks个任务，返回(耗时秒数, 完成任务数)"""
+    workdir = tempfile.mkdtemp(prefix='worker_harness_')
+    server, task_queue = start_backend(workdir, lease_seconds)
+    try:
+        for i in range(num_tasks):
+            task_queue.add_task('shenzhen', '深圳市', list(CATEGORIES.values()), list(CATEGORIES.keys()),
+                                start_page=1, end_page=pages, cookie_string=f'harness_cookie_{i}',
+                                submitter=f'harness_{i % 3}')
+
+        backend_url = f'http://127.0.0.1:{server.server_port}'
+
+        def factory(cookie_string, status_callback, phase_recorder, page_result_callback, task_id=None):
+            return FakeCrawler(status_callback, phase_recorder, page_result_callback, page_seconds)
+
+        workers = [RemoteWorker(BackendClient(backend_url), f'harness-{i + 1}', crawler_factory=factory,
+                                poll_interval=0.2, exit_when_idle=True)
+                   for i in range(num_workers)]
+        threads = [threading.Thread(target=worker.run) for worker in workers]
+
+        started_at = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started_at
+
+        completed = task_queue.db_manager.get_crawl_history(limit=num_tasks, offset=0)
+        completed = [record for record in completed if record['status'] == 'completed']
+        return elapsed, len(completed)
+    finally:
+        server.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description='本地多工作节点扩展性验证')
+    parser.add_argument('--tasks', type=int, default=8, help='任务数')
+    parser.add_argument('--pages', type=int, default=3, help='每个品类的页数')
+    parser.add_argument('--page-seconds', type=float, default=0.2, help='模拟单页耗时(秒)')
+    parser.add_argument('--workers', default='1,2,4', help='依次测试的工作节点数')
+    parser.add_argument('--lease-seconds', type=int, default=30, help='租约有效期(秒)')
+    args = parser.parse_args()
+
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    results = []
+    for num_workers in [int(n) for n in args.workers.split(',')]:
+        elapsed, completed = run_round(num_workers, args.tasks, args.pages, args.page_seconds, args.lease_seconds)
+        results.append((num_workers, elapsed, completed))
+
+    baseline = results[0][1]
+    print(f"\n任务数={args.tasks}, 每任务页数={args.pages * len(CATEGORIES)}, 单页耗时={args.page_seconds}秒")
+    print(f"{'工作节点':>8} {'完成任务':>8} {'耗时(秒)':>10} {'加速比':>8}")
+    for num_workers, elapsed, completed in results:
+        print(f"{num_workers:>8} {completed:>8} {elapsed:>10.2f} {baseline / elapsed:>8.2f}")
+
+if __name__ == '__main__':
+    main()
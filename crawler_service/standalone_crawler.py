@@ -1,342 +1,282 @@
 """
-独立爬虫服务 - 可以部署在任何支持Python的服务器上
-提供RESTful API接口，与Vercel前端配合使用
+独立爬虫工作节点 - 可以部署在任何支持Python的服务器上
+从主服务通过HTTP租约领取任务，分批回传进度和结果，本身不保存任何任务状态。
+增加爬取能力只需要在更多机器上启动工作节点。
+
+用法:
+    python crawler_service/standalone_crawler.py --backend-url http://主服务:5000 --concurrency 2
 """
 
-from flask import Flask, request, jsonify, send_file
+import argparse
 import os
+import socket
 import sys
-import json
-import uuid
 import threading
 import time
+import uuid
+from collections import deque
 from datetime import datetime
-from werkzeug.utils import secure_filename
+
+import requests
 
 # 添加项目根目录到Python路径
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-app = Flask(__name__)
-app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max file size
+from config.crawler_config import WORKER_CONFIG
+
+class LeaseLost(Exception):
+    """租约已失效（过期或被主服务回收）"""
+
+class BackendClient:
+    """主服务工作节点API客户端"""
+
+    def __init__(self, backend_url, token='', timeout=30, retries=3):
+        self.base_url = backend_url.rstrip('/') + '/api/worker'
+        self.timeout = timeout
+        self.retries = retries
+        self.session = requests.Session()
+        if token:
+            self.session.headers['X-Worker-Token'] = token
+
+    def _post(self, path, payload):
+        """发送请求，网络错误和5xx时重试，租约失效时抛出LeaseLost"""
+        last_error = None
+        for attempt in range(self.retries):
+            try:
+                response = self.session.post(self.base_url + path, json=payload, timeout=self.timeout)
+                if response.status_code == 410:
+                    raise LeaseLost(payload.get('lease_id'))
+                if response.status_code < 500:
+                    body = response.json()
+                    if not body.get('success'):
+                        raise Exception(body.get('error', f'HTTP {response.status_code}'))
+                    return body
+                last_error = Exception(f'HTTP {response.status_code}')
+            except (requests.ConnectionError, requests.Timeout) as e:
+                last_error = e
+            time.sleep(2 ** attempt)
+        raise last_error
+
+    def lease(self, worker_id):
+        body = self._post('/lease', {'worker_id': worker_id})
+        return body.get('data'), body.get('poll_interval_seconds')
+
+    def heartbeat(self, lease_id, events=None, phases=None):
+        return self._post('/heartbeat', {'lease_id': lease_id, 'events': events or [], 'phases': phases or []})
+
+    def results(self, lease_id, pages):
+        return self._post('/results', {'lease_id': lease_id, 'pages': pages})
+
+    def complete(self, lease_id, success, stats=None, error=None):
+        # 输出文件名和城市/品类名由主服务按任务参数确定
+        return self._post('/complete', {
+            'lease_id': lease_id,
+            'success': success,
+            'stats': stats or {},
+            'error': error
+        })
 
-# 全局任务存储（生产环境应使用Redis或数据库）
-active_tasks = {}
-task_results = {}
+class LeaseBuffer:
+    """缓冲一个租约期间产生的状态事件、阶段耗时和页面结果"""
+
+    def __init__(self, max_events=200):
+        self.events = deque(maxlen=max_events)  # 只保留最近的事件，避免心跳负载过大
+        self.phases = []
+        self.pages = []
+        self.buffered_rows = 0
+        self._lock = threading.Lock()
+
+    def add_event(self, status_info):
+        with self._lock:
+            self.events.append(status_info)
+
+    def record(self, city_code, category_id, page_num, phase, seconds):
+        """与ThroughputModel.record签名一致，爬虫把阶段耗时记录到这里"""
+        with self._lock:
+            self.phases.append({
+                'category_id': category_id,
+                'page_num': page_num,
+                'phase': phase,
+                'seconds': seconds
+            })
 
-# 导入爬虫模块
-try:
+    def add_page(self, category_id, category_name, page_num, shops, from_cache):
+        with self._lock:
+            self.pages.append({
+                'category_id': category_id,
+                'category_name': category_name,
+                'page_num': page_num,
+                'shops': shops,
+                'from_cache': from_cache
+            })
+            self.buffered_rows += len(shops)
+            return self.buffered_rows
+
+    def drain_progress(self):
+        with self._lock:
+            events, phases = list(self.events), self.phases
+            self.events.clear()
+            self.phases = []
+            return events, phases
+
+    def drain_pages(self):
+        with self._lock:
+            pages = self.pages
+            self.pages = []
+            self.buffered_rows = 0
+            return pages
+
+def default_crawler_factory(cookie_string, status_callback, phase_recorder, page_result_callback, task_id=None):
+    """创建真实的Playwright爬虫，结果回传主服务，不在本机保存文件"""
     from backend.core.custom_crawler import WebCustomCrawler
-    from backend.models.cookie_manager import CookieManager
-    from backend.models.database import DatabaseManager
-    from config.crawler_config import CRAWL_LIMITS, ANTI_SPIDER_CONFIG, FILE_PATHS
-    CRAWLER_AVAILABLE = True
-except ImportError as e:
-    print(f"Warning: Crawler modules not available: {e}")
-    CRAWLER_AVAILABLE = False
-
-class CrawlerTask:
-    """爬虫任务类"""
-    def __init__(self, task_id, config):
-        self.task_id = task_id
-        self.config = config
-        self.status = 'pending'
-        self.progress = 0
-        self.result = None
-        self.error = None
-        self.start_time = None
-        self.end_time = None
-        self.thread = None
-
-    def start(self):
-        """启动任务"""
-        self.status = 'running'
-        self.start_time = datetime.now()
-        self.thread = threading.Thread(target=self._run_task)
-        self.thread.start()
-
-    def _run_task(self):
-        """执行爬虫任务"""
-        try:
-            if not CRAWLER_AVAILABLE:
-                raise Exception("Crawler modules not available")
-
-            # 初始化爬虫
-            crawler = WebCustomCrawler(self.config.get('cookie'))
-
-            # 获取配置参数
-            city = self.config.get('city')
-            categories = self.config.get('categories', [])
-            page_range = self.config.get('page_range', '1-15')
-
-            # 解析页数范围
-            if '-' in page_range:
-                start_page, end_page = map(int, page_range.split('-'))
-            else:
-                start_page = 1
-                end_page = int(page_range)
-
-            results = []
-            total_pages = len(categories) * (end_page - start_page + 1)
-            current_page = 0
-
-            # 执行爬取
-            for category in categories:
-                category_results = crawler.crawl_category(
-                    city=city,
-                    category=category,
-                    start_page=start_page,
-                    end_page=end_page,
-                    progress_callback=lambda p: self._update_progress(
-                        int((current_page + p / (end_page - start_page + 1)) / total_pages * 100)
-                    )
-                )
-                results.extend(category_results)
-                current_page += (end_page - start_page + 1)
-
-            # 保存结果
-            filename = f"crawl_results_{self.task_id}.csv"
-            filepath = os.path.join(FILE_PATHS.get('OUTPUTS_DIR', '/tmp'), filename)
-
-            import pandas as pd
-            df = pd.DataFrame(results)
-            df.to_csv(filepath, index=False, encoding='utf-8-sig')
-
-            self.status = 'completed'
-            self.result = {
-                'filename': filename,
-                'filepath': filepath,
-                'total_records': len(results),
-                'categories': categories,
-                'city': city,
-                'pages_crawled': total_pages
-            }
+    return WebCustomCrawler(cookie_string, status_callback,
+                            phase_recorder=phase_recorder,
+                            page_result_callback=page_result_callback,
+                            save_outputs=False,
+                            task_id=task_id)
+
+class RemoteWorker:
+    """无状态工作节点：循环领取租约并执行"""
+
+    def __init__(self, client, worker_id, crawler_factory=None, poll_interval=None, exit_when_idle=False):
+        self.client = client
+        self.worker_id = worker_id
+        self.crawler_factory = crawler_factory or default_crawler_factory
+        self.poll_interval = poll_interval or WORKER_CONFIG.get('POLL_INTERVAL_SECONDS', 5)
+        self.exit_when_idle = exit_when_idle
+        self.completed_tasks = 0
+        self.stop_event = threading.Event()
+
+    def log(self, message):
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] [{self.worker_id}] {message}", flush=True)
+
+    def run(self):
+        """主循环"""
+        self.log("工作节点已启动")
+        while not self.stop_event.is_set():
+            try:
+                lease, poll_interval = self.client.lease(self.worker_id)
+            except Exception as e:
+                self.log(f"领取任务失败: {e}")
+                self.stop_event.wait(self.poll_interval)
+                continue
+
+            if not lease:
+                if self.exit_when_idle:
+                    break
+                self.stop_event.wait(poll_interval or self.poll_interval)
+                continue
+
+            self.run_lease(lease)
+        self.log(f"工作节点已停止，共完成 {self.completed_tasks} 个任务")
+
+    def run_lease(self, lease):
+        """执行一个租约对应的任务"""
+        lease_id = lease['lease_id']
+        task = lease['task']
+        batch_size = lease.get('result_batch_size') or WORKER_CONFIG.get('RESULT_BATCH_SIZE', 50)
+        heartbeat_interval = max(1.0, lease['lease_seconds'] / 3)
+        buffer = LeaseBuffer()
+        lost = threading.Event()
+        finished = threading.Event()
+        self.log(f"领取任务 {task['task_id']}: {task['city']} {task['categories']} 第{task['start_page']}-{task['end_page']}页")
+
+        def send_heartbeat():
+            events, phases = buffer.drain_progress()
+            try:
+                self.client.heartbeat(lease_id, events, phases)
+            except LeaseLost:
+                lost.set()
+
+        def heartbeat_loop():
+            while not finished.wait(heartbeat_interval):
+                try:
+                    send_heartbeat()
+                except Exception as e:
+                    self.log(f"心跳失败: {e}")
+                if lost.is_set():
+                    self.log(f"任务 {task['task_id']} 的租约已失效，结果将不再回传")
+                    return
+
+        def flush_results():
+            pages = buffer.drain_pages()
+            if pages and not lost.is_set():
+                try:
+                    self.client.results(lease_id, pages)
+                except LeaseLost:
+                    lost.set()
+
+        def on_page(category_id, category_name, page_num, shops, from_cache):
+            if buffer.add_page(category_id, category_name, page_num, shops, from_cache) >= batch_size:
+                flush_results()
+
+        heartbeat_thread = threading.Thread(target=heartbeat_loop, daemon=True)
+        heartbeat_thread.start()
+        crawler = None
 
+        try:
+            crawler = self.crawler_factory(task['cookie_string'], buffer.add_event, buffer, on_page,
+                                           task_id=task['task_id'])
+            city_name, category_names = crawler.resolve_task_names(task['city'], task['categories'])
+            result = crawler.crawl_specific_task(city_name, category_names, task['start_page'],
+                                                 task['end_page'], task['sort_type'])
+            success = bool(result[0])
+
+            flush_results()
+            if lost.is_set():
+                raise LeaseLost(lease_id)
+            send_heartbeat()
+            self.client.complete(lease_id, success, {
+                'captcha_count': crawler.captcha_count,
+                'skipped_pages': crawler.skipped_pages
+            }, None if success else "爬取任务执行失败")
+            self.completed_tasks += 1
+            self.log(f"任务 {task['task_id']} 已完成: 成功={success}")
+
+        except LeaseLost:
+            self.log(f"任务 {task['task_id']} 的租约已失效，放弃结果")
         except Exception as e:
-            self.status = 'failed'
-            self.error = str(e)
+            self.log(f"任务 {task['task_id']} 执行异常: {e}")
+            try:
+                self.client.complete(lease_id, False, error=f"任务执行异常: {e}")
+            except Exception as report_error:
+                self.log(f"上报任务失败状态失败: {report_error}")
         finally:
-            self.end_time = datetime.now()
-            # 清理活动任务
-            if self.task_id in active_tasks:
-                del active_tasks[self.task_id]
-
-    def _update_progress(self, progress):
-        """更新进度"""
-        self.progress = min(100, max(0, progress))
-
-    def get_status(self):
-        """获取任务状态"""
-        return {
-            'task_id': self.task_id,
-            'status': self.status,
-            'progress': self.progress,
-            'result': self.result,
-            'error': self.error,
-            'start_time': self.start_time.isoformat() if self.start_time else None,
-            'end_time': self.end_time.isoformat() if self.end_time else None
-        }
-
-@app.route('/health')
-def health_check():
-    """健康检查"""
-    return jsonify({
-        'status': 'healthy',
-        'timestamp': datetime.now().isoformat(),
-        'crawler_available': CRAWLER_AVAILABLE,
-        'active_tasks': len(active_tasks)
-    })
-
-@app.route('/api/status')
-def api_status():
-    """API状态检查"""
-    return jsonify({
-        'status': 'running',
-        'environment': 'standalone_crawler_service',
-        'timestamp': datetime.now().isoformat(),
-        'crawler_available': CRAWLER_AVAILABLE,
-        'active_tasks': len(active_tasks),
-        'version': '1.0.0'
-    })
-
-@app.route('/api/crawler/start', methods=['POST'])
-def start_crawler():
-    """启动爬虫任务"""
-    try:
-        data = request.get_json()
-
-        # 验证必需参数
-        required_fields = ['city', 'categories', 'cookie']
-        for field in required_fields:
-            if not data.get(field):
-                return jsonify({
-                    'success': False,
-                    'error': f'Missing required field: {field}'
-                }), 400
-
-        # 创建任务
-        task_id = str(uuid.uuid4())
-        task = CrawlerTask(task_id, data)
-
-        # 存储任务
-        active_tasks[task_id] = task
-
-        # 启动任务
-        task.start()
-
-        return jsonify({
-            'success': True,
-            'task_id': task_id,
-            'message': 'Crawler task started successfully'
-        })
+            if crawler and hasattr(crawler, 'close'):
+                crawler.close()
+            finished.set()
+            heartbeat_thread.join(timeout=5)
+
+def main():
+    parser = argparse.ArgumentParser(description='大众点评爬虫远程工作节点')
+    parser.add_argument('--backend-url', default=os.environ.get('CRAWLER_BACKEND_URL', 'http://localhost:5000'),
+                        help='主服务地址')
+    parser.add_argument('--worker-id', default=f"{socket.gethostname()}-{uuid.uuid4().hex[:6]}",
+                        help='工作节点标识')
+    parser.add_argument('--concurrency', type=int, default=1, help='本机同时执行的任务数')
+    parser.add_argument('--token', default=WORKER_CONFIG.get('AUTH_TOKEN', ''), help='工作节点访问令牌')
+    parser.add_argument('--exit-when-idle', action='store_true', help='队列为空时退出')
+    args = parser.parse_args()
+
+    workers = []
+    for i in range(max(1, args.concurrency)):
+        worker_id = args.worker_id if args.concurrency == 1 else f"{args.worker_id}-{i + 1}"
+        workers.append(RemoteWorker(BackendClient(args.backend_url, args.token), worker_id,
+                                    exit_when_idle=args.exit_when_idle))
+
+    threads = [threading.Thread(target=worker.run, daemon=True) for worker in workers]
+    for thread in threads:
+        thread.start()
 
-    except Exception as e:
-        return jsonify({
-            'success': False,
-            'error': str(e)
-        }), 500
-
-@app.route('/api/crawler/status/<task_id>')
-def get_crawler_status(task_id):
-    """获取爬虫任务状态"""
-    if task_id in active_tasks:
-        return jsonify({
-            'success': True,
-            'status': active_tasks[task_id].get_status()
-        })
-    else:
-        # 检查是否在已完成任务中
-        if task_id in task_results:
-            return jsonify({
-                'success': True,
-                'status': task_results[task_id].get_status()
-            })
-        else:
-            return jsonify({
-                'success': False,
-                'error': 'Task not found'
-            }), 404
-
-@app.route('/api/crawler/download/<task_id>')
-def download_result(task_id):
-    """下载爬虫结果"""
-    if task_id in task_results and task_results[task_id].result:
-        filepath = task_results[task_id].result['filepath']
-        if os.path.exists(filepath):
-            return send_file(filepath, as_attachment=True)
-        else:
-            return jsonify({'error': 'File not found'}), 404
-    else:
-        return jsonify({'error': 'Result not found'}), 404
-
-@app.route('/api/upload', methods=['POST'])
-def upload_file():
-    """上传文件进行处理"""
     try:
-        if 'file' not in request.files:
-            return jsonify({'error': 'No file provided'}), 400
-
-        file = request.files['file']
-        if file.filename == '':
-            return jsonify({'error': 'No file selected'}), 400
-
-        # 保存上传的文件
-        filename = secure_filename(file.filename)
-        upload_dir = FILE_PATHS.get('TEMP_DIR', '/tmp')
-        os.makedirs(upload_dir, exist_ok=True)
-        filepath = os.path.join(upload_dir, filename)
-        file.save(filepath)
-
-        return jsonify({
-            'success': True,
-            'filename': filename,
-            'filepath': filepath,
-            'size': os.path.getsize(filepath)
-        })
-
-    except Exception as e:
-        return jsonify({
-            'success': False,
-            'error': str(e)
-        }), 500
-
-@app.route('/api/gaode/process', methods=['POST'])
-def process_with_gaode():
-    """使用高德API处理数据"""
-    try:
-        data = request.get_json()
-        file_path = data.get('file_path')
-        api_key = data.get('api_key')
-
-        if not file_path or not api_key:
-            return jsonify({
-                'success': False,
-                'error': 'Missing file_path or api_key'
-            }), 400
-
-        # 这里实现高德API处理逻辑
-        # 注意：实际实现需要高德地图API的具体调用代码
-
-        return jsonify({
-            'success': True,
-            'message': 'Gaode API processing completed',
-            'processed_records': 0  # 实际处理记录数
-        })
-
-    except Exception as e:
-        return jsonify({
-            'success': False,
-            'error': str(e)
-        }), 500
-
-@app.route('/api/tasks')
-def list_tasks():
-    """列出所有任务"""
-    all_tasks = {}
-
-    # 活动任务
-    for task_id, task in active_tasks.items():
-        all_tasks[task_id] = task.get_status()
-
-    # 已完成任务
-    for task_id, task in task_results.items():
-        all_tasks[task_id] = task.get_status()
-
-    return jsonify({
-        'success': True,
-        'tasks': all_tasks,
-        'total_count': len(all_tasks)
-    })
-
-# 定期清理完成的任务
-def cleanup_completed_tasks():
-    """清理完成的任务"""
-    while True:
-        time.sleep(300)  # 每5分钟清理一次
-
-        completed_task_ids = []
-        for task_id, task in active_tasks.items():
-            if task.status in ['completed', 'failed']:
-                completed_task_ids.append(task_id)
-                task_results[task_id] = task
-
-        for task_id in completed_task_ids:
-            del active_tasks[task_id]
-
-        if completed_task_ids:
-            print(f"Cleaned up {len(completed_task_ids)} completed tasks")
-
-# 启动清理线程
-cleanup_thread = threading.Thread(target=cleanup_completed_tasks, daemon=True)
-cleanup_thread.start()
+        while any(thread.is_alive() for thread in threads):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("收到中断信号，等待当前任务结束...")
+        for worker in workers:
+            worker.stop_event.set()
+        for thread in threads:
+            thread.join()
 
 if __name__ == '__main__':
-    print("Starting Standalone Crawler Service...")
-    print(f"Crawler Available: {CRAWLER_AVAILABLE}")
-    print("Service will be available at: http://localhost:5001")
-    print("API endpoints:")
-    print("  GET  /api/status - Service status")
-    print("  POST /api/crawler/start - Start crawler task")
-    print("  GET  /api/crawler/status/<task_id> - Get task status")
-    print("  GET  /api/crawler/download/<task_id> - Download result")
-
-    app.run(host='0.0.0.0', port=5001, debug=False)
\ No newline at end of file
+    main()
@@ -639,15 +639,22 @@ class CrawlerApp {
         }
     }
 
-    async loadHistory(page = 1) {
+    async loadHistory(cursor = null) {
         try {
-            const response = await ApiClient.get('/api/crawler/history', {
-                page: page,
-                per_page: 10
-            });
+            const params = { per_page: 10 };
+            if (cursor) {
+                params.cursor = cursor;
+            }
+            const response = await ApiClient.get('/api/crawler/history', params);
             
             if (response.success) {
-                this.renderHistory(response.data.records, page === 1);
+                this.renderHistory(response.data.records, !cursor);
+                this.historyCursor = response.data.next_cursor;
+                
+                const loadMoreBtn = document.getElementById('loadMoreHistoryBtn');
+                if (loadMoreBtn) {
+                    loadMoreBtn.style.display = this.historyCursor ? '' : 'none';
+                }
             }
         } catch (error) {
             console.error('加载历史记录失败:', error);
@@ -663,7 +670,9 @@ class CrawlerApp {
         }
 
         if (records.length === 0) {
-            container.innerHTML = '<div class="text-muted text-center">暂无历史记录</div>';
+            if (clear) {
+                container.innerHTML = '<div class="text-muted text-center">暂无历史记录</div>';
+            }
             return;
         }
 
@@ -969,8 +978,10 @@ class CrawlerApp {
     }
 
     loadMoreHistory() {
-        // 实现加载更多历史记录的逻辑
-        Toast.info('加载更多功能开发中...');
+        // 从上一页最后一条记录之后继续加载
+        if (this.historyCursor) {
+            this.loadHistory(this.historyCursor);
+        }
     }
 }
 
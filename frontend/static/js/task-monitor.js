@@ -6,6 +6,8 @@ class TaskMonitor {
     constructor() {
         this.currentTaskId = null;
         this.monitorInterval = null;
+        this.eventSource = null;
+        this.statusVersion = 0;
         this.statusUpdateCallbacks = [];
         this.init();
     }
@@ -65,8 +67,23 @@ class TaskMonitor {
 
     startMonitoring(taskId) {
         this.currentTaskId = taskId;
+        this.statusVersion = 0;
         this.showProgress();
         
+        // 优先使用SSE实时推送，不支持或连接失败时回退到定时轮询
+        if (window.EventSource) {
+            this.startEventStream(taskId);
+        } else {
+            this.startPolling();
+        }
+        
+        // 显示详细日志区域
+        this.showLogPanel();
+    }
+
+    startPolling() {
+        if (this.monitorInterval) return;
+
         // 开始定期检查任务状态 - 减少频率，增加详细日志显示
         this.monitorInterval = setInterval(() => {
             this.checkTaskStatus();
@@ -74,9 +91,49 @@ class TaskMonitor {
 
         // 立即检查一次
         this.checkTaskStatus();
-        
-        // 显示详细日志区域
-        this.showLogPanel();
+    }
+
+    startEventStream(taskId) {
+        // EventSource断线后会自动带Last-Event-ID重连，服务端补发遗漏的事件
+        const source = new EventSource(`${API_BASE_URL}/api/crawler/events/${taskId}`);
+        let failures = 0;
+
+        source.addEventListener('status', (e) => {
+            failures = 0;
+            const event = JSON.parse(e.data);
+            const extraInfo = event.extra_info || {};
+            this.updateTaskStatus({
+                ...event,
+                progress: extraInfo.progress ?? event.progress,
+                type: extraInfo.type || event.type
+            });
+        });
+
+        // 任务结束：通过状态接口获取最终结果（商铺数、输出文件），拿到终态后自动停止
+        source.addEventListener('end', () => {
+            this.closeEventStream();
+            this.startPolling();
+        });
+
+        source.onerror = () => {
+            failures += 1;
+            if (failures >= 3) {
+                console.warn('SSE连接失败，改用轮询获取任务状态');
+                this.closeEventStream();
+                if (this.currentTaskId === taskId) {
+                    this.startPolling();
+                }
+            }
+        };
+
+        this.eventSource = source;
+    }
+
+    closeEventStream() {
+        if (this.eventSource) {
+            this.eventSource.close();
+            this.eventSource = null;
+        }
     }
 
     stopMonitoring() {
@@ -84,6 +141,7 @@ class TaskMonitor {
             clearInterval(this.monitorInterval);
             this.monitorInterval = null;
         }
+        this.closeEventStream();
         this.currentTaskId = null;
         this.hideProgress();
     }
@@ -92,15 +150,23 @@ class TaskMonitor {
         if (!this.currentTaskId) return;
 
         try {
-            const response = await ApiClient.get(`/api/crawler/status/${this.currentTaskId}`);
+            // 批量状态接口只返回上次查询之后变化的任务，状态没变时不重复渲染
+            const response = await ApiClient.post('/api/crawler/status/batch', {
+                task_ids: [this.currentTaskId],
+                since_version: this.statusVersion
+            });
             
             if (response.success) {
-                this.updateTaskStatus(response.data);
+                this.statusVersion = response.data.version;
+                const taskData = response.data.tasks.find(task => task.task_id === this.currentTaskId);
+                if (!taskData) return;
+                
+                this.updateTaskStatus(taskData);
                 
                 // 如果任务完成或失败，停止监控
-                if (response.data.status === 'completed' || response.data.status === 'failed') {
+                if (taskData.status === 'completed' || taskData.status === 'failed') {
                     this.stopMonitoring();
-                    this.onTaskFinished(response.data);
+                    this.onTaskFinished(taskData);
                 }
             }
         } catch (error) {
@@ -500,7 +566,7 @@ class TaskMonitor {
     }
 
     isMonitoring() {
-        return !!this.monitorInterval;
+        return !!this.monitorInterval || !!this.eventSource;
     }
 
     getCurrentTaskId() {
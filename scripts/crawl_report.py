@@ -0,0 +1,115 @@
+"""
+爬取性能报告 - 从历史爬虫日志统计每个任务和每天的爬取性能
+
+指标包括页/小时、单页平均和P95耗时、延迟/加载/处理各占的时间比例、
+验证码率、跳页率和每页商铺数。日志逐行流式处理，文件再大也只占用固定内存。
+
+用法:
+    python scripts/crawl_report.py
+    python scripts/crawl_report.py --since 20250801 --until 20250831 --days-only
+    python scripts/crawl_report.py --json > report.jsonl
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.crawler_config import FILE_PATHS
+from backend.core.log_report import build_report, find_log_files
+
+COLUMNS = [
+    ('pages_ok', '成功页', 6),
+    ('pages_empty', '空页', 4),
+    ('pages_cached', '缓存', 4),
+    ('shops', '商铺', 6),
+    ('pages_per_hour', '页/时', 6),
+    ('page_mean_seconds', '均耗时', 6),
+    ('page_p95_seconds', 'P95', 6),
+    ('delay_share', '延迟%', 6),
+    ('load_share', '加载%', 6),
+    ('processing_share', '处理%', 6),
+    ('captcha_rate', '验证码率', 8),
+    ('skip_rate', '跳页率', 6),
+    ('shops_per_page', '铺/页', 6)
+]
+
+SHARE_KEYS = ('delay_share', 'load_share', 'processing_share', 'captcha_rate', 'skip_rate')
+
+def format_value(key, value):
+    if value is None:
+        return '-'
+    if key in SHARE_KEYS:
+        return f"{value * 100:.1f}"
+    return str(value)
+
+def format_row(label, label_width, data):
+    cells = [label.ljust(label_width)]
+    cells.extend(format_value(key, data.get(key)).rjust(width) for key, _, width in COLUMNS)
+    return ' '.join(cells)
+
+def format_header(label, label_width):
+    return ' '.join([label.ljust(label_width)] + [title.rjust(width) for _, title, width in COLUMNS])
+
+def task_label(report):
+    name = report['task'] or '-'
+    categories = ','.join(report['categories'] or [])
+    status = report['status'][:4] + ('*' if report['overlapped'] else '')
+    return f"{report['started_at']} {name[:8]:8} {status:5} {report['city'] or '-'} {categories}"[:60]
+
+def main():
+    parser = argparse.ArgumentParser(description='从爬虫日志生成爬取性能报告')
+    parser.add_argument('--logs-dir', default=FILE_PATHS['LOGS_DIR'], help='日志目录')
+    parser.add_argument('--since', help='起始日期 YYYYMMDD（含）')
+    parser.add_argument('--until', help='结束日期 YYYYMMDD（含）')
+    parser.add_argument('--days-only', action='store_true', help='只输出按天汇总')
+    parser.add_argument('--json', action='store_true', help='以JSON Lines输出（每个任务/每天/总计一行）')
+    args = parser.parse_args()
+
+    paths = find_log_files(args.logs_dir, args.since, args.until)
+    if not paths:
+        print(f"❌ 未找到日志文件: {args.logs_dir}")
+        sys.exit(1)
+
+    def on_task(report):
+        if args.days_only:
+            return
+        if args.json:
+            print(json.dumps(dict(report, kind='task'), ensure_ascii=False))
+        else:
+            print(format_row(task_label(report), 60, report))
+
+    if not args.json:
+        print(f"📂 日志文件: {len(paths)} 个 ({os.path.basename(paths[0])} ~ {os.path.basename(paths[-1])})")
+        print("ℹ️ 延迟%/加载%/处理% 为占任务总耗时的比例；单页耗时不含页面间延迟")
+        print("ℹ️ 状态带*的是与其他无标记任务重叠的旧格式任务，不参与耗时类统计")
+        if not args.days_only:
+            print()
+            print(format_header('任务', 60))
+
+    # 任务报告边解析边输出，不在内存中累积
+    report = build_report(paths, on_task=on_task)
+
+    if args.json:
+        for day in report['days']:
+            print(json.dumps(dict(day, kind='day'), ensure_ascii=False))
+        print(json.dumps(dict(report['total'], kind='total', lines=report['lines'],
+                              unparsed_lines=report['unparsed_lines']), ensure_ascii=False))
+        return
+
+    print()
+    print(format_header('日期', 10) + '   任务')
+    for day in report['days']:
+        print(format_row(day['date'], 10, day) + f"   {day['tasks']}")
+    print(format_row('总计', 10, report['total']) + f"   {report['total']['tasks']}")
+    total = report['total']
+    print()
+    print(f"📊 日志行数: {report['lines']}（无时间戳续行 {report['unparsed_lines']}）")
+    print(f"📊 任务: 完成 {total['completed']}，失败 {total['failed']}，未完成 {total['incomplete']}"
+          f"（重叠 {total['overlapped']}）；"
+          f"验证码 {total['captchas']} 次，跳过 {total['pages_skipped']} 页，异常 {total['pages_error']} 页")
+
+if __name__ == '__main__':
+    main()
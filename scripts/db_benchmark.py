@@ -0,0 +1,159 @@
+"""
+数据库并发基准测试 - 对比"每次新建连接+默认日志模式"、"连接池+WAL"和"连接池+WAL+单写线程"
+
+多个写线程模拟爬虫线程更新爬取历史和Cookie使用记录，多个读线程模拟仪表盘查询历史列表，
+分别统计写入吞吐量、提交（刷盘）次数、读取延迟分位数以及失败次数（数据库被锁超时）。使用临时数据库。
+
+用法:
+    python scripts/db_benchmark.py
+    python scripts/db_benchmark.py --writers 8 --readers 4 --seconds 10 --rows 5000
+    python scripts/db_benchmark.py --synchronous FULL   # 每次提交都刷盘时单写线程合并提交的效果更明显
+"""
+
+import argparse
+import contextlib
+import gc
+import io
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.crawler_config import DATABASE_CONFIG
+from backend.models.database import DatabaseManager
+
+class LegacyDatabaseManager(DatabaseManager):
+    """原实现：默认(DELETE)日志模式，每次操作新建连接"""
+
+    def __init__(self, db_path: str):
+        super().__init__(db_path)
+        self.writer.stop()
+        self.pool.close()
+        gc.collect()  # 回收初始化时打开的连接，切换日志模式需要独占数据库
+        conn = sqlite3.connect(db_path)
+        conn.execute('PRAGMA journal_mode=DELETE')
+        conn.close()
+
+    def get_connection(self):
+        return sqlite3.connect(self.db_path)
+
+class DirectWriteDatabaseManager(DatabaseManager):
+    """连接池+WAL，但不使用单写线程：每个线程各自提交"""
+
+    def __init__(self, db_path: str):
+        super().__init__(db_path)
+        self.writer.stop()
+
+def seed(db_manager, rows):
+    task_ids = []
+    with db_manager.get_connection() as conn:
+        for i in range(rows):
+            task_id = str(uuid.uuid4())
+            task_ids.append(task_id)
+            conn.execute('''
+                INSERT INTO crawl_history
+                (task_id, city, categories, start_page, end_page, range_type, cookie_hash, start_time, status, total_shops)
+                VALUES (?, ?, ?, 1, 15, 'first', ?, datetime('now'), 'completed', ?)
+            ''', (task_id, 'shenzhen', '["g112"]', f'cookie{i % 20}', random.randint(0, 300)))
+    return task_ids
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+def run(db_manager, task_ids, writers, readers, seconds):
+    stop = threading.Event()
+    write_counts = [0] * writers
+    write_failures = [0] * writers
+    read_latencies = [[] for _ in range(readers)]
+    read_failures = [0] * readers
+
+    def writer(index):
+        rng = random.Random(index)
+        while not stop.is_set():
+            ok = db_manager.update_crawl_history(rng.choice(task_ids), status='running',
+                                                 total_shops=rng.randint(0, 300))
+            ok = db_manager.record_cookie_usage(f'cookie{rng.randint(0, 19)}') and ok
+            if ok:
+                write_counts[index] += 2
+            else:
+                write_failures[index] += 1
+
+    def reader(index):
+        while not stop.is_set():
+            started = time.perf_counter()
+            rows = db_manager.get_crawl_history(limit=50)
+            db_manager.check_cookie_limit('cookie1')
+            read_latencies[index].append((time.perf_counter() - started) * 1000)
+            if not rows:
+                read_failures[index] += 1
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    threads += [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+
+    # 数据库方法失败时会打印错误，基准测试期间只计数
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+    latencies = [value for values in read_latencies for value in values]
+    writes = sum(write_counts)
+    if db_manager.writer.batches:
+        commits = db_manager.writer.get_stats()['commits']
+    else:
+        commits = writes  # 不经过写线程时每次写入各自提交
+    return {
+        'writes_per_sec': writes / elapsed,
+        'commits_per_write': commits / writes if writes else 0.0,
+        'write_failures': sum(write_failures),
+        'reads': len(latencies),
+        'read_p50_ms': percentile(latencies, 0.5),
+        'read_p95_ms': percentile(latencies, 0.95),
+        'read_max_ms': max(latencies) if latencies else 0.0,
+        'read_failures': sum(read_failures)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='数据库并发基准测试')
+    parser.add_argument('--writers', type=int, default=4, help='写线程数')
+    parser.add_argument('--readers', type=int, default=4, help='读线程数')
+    parser.add_argument('--seconds', type=float, default=5, help='每种模式的运行时间(秒)')
+    parser.add_argument('--rows', type=int, default=2000, help='预置的爬取历史行数')
+    parser.add_argument('--synchronous', default=DATABASE_CONFIG.get('SYNCHRONOUS', 'NORMAL'),
+                        choices=['OFF', 'NORMAL', 'FULL'], help='连接池连接的synchronous设置')
+    args = parser.parse_args()
+    DATABASE_CONFIG['SYNCHRONOUS'] = args.synchronous
+
+    workdir = tempfile.mkdtemp(prefix='db_benchmark_')
+    results = {}
+    modes = (('legacy', LegacyDatabaseManager), ('pooled', DirectWriteDatabaseManager), ('writer', DatabaseManager))
+    for name, manager_class in modes:
+        db_manager = manager_class(os.path.join(workdir, f'{name}.db'))
+        task_ids = seed(db_manager, args.rows)
+        print(f"▶️ {name}: {args.writers} 写线程 + {args.readers} 读线程，{args.seconds} 秒，synchronous={args.synchronous}")
+        results[name] = run(db_manager, task_ids, args.writers, args.readers, args.seconds)
+        db_manager.close()
+
+    print()
+    print(f"{'模式':8} {'写入/秒':>10} {'提交/写入':>10} {'写失败':>8} {'读次数':>8} {'读P50ms':>9} {'读P95ms':>9} "
+          f"{'读最大ms':>10} {'读失败':>8}")
+    for name, r in results.items():
+        print(f"{name:8} {r['writes_per_sec']:>10.1f} {r['commits_per_write']:>10.3f} {r['write_failures']:>8} {r['reads']:>8} "
+              f"{r['read_p50_ms']:>9.2f} {r['read_p95_ms']:>9.2f} {r['read_max_ms']:>10.2f} {r['read_failures']:>8}")
+
+if __name__ == '__main__':
+    main()
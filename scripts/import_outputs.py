@@ -0,0 +1,81 @@
+"""
+导入已有输出文件 - 把 data/outputs 中的爬取结果CSV回填到商铺存储(shops/shop_observations)
+
+内容完全相同的文件、已被完整结果包含的partial文件会被跳过；重复执行只导入新文件。
+文件逐行流式读取，按批提交，内存占用与文件大小无关。
+
+用法:
+    python scripts/import_outputs.py
+    python scripts/import_outputs.py --dry-run
+    python scripts/import_outputs.py data/outputs/custom_crawl_深圳市_粤菜_20250929_174553.csv --db /tmp/test.db
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.crawler_config import DATABASE_CONFIG, FILE_PATHS, SHOP_STORE_CONFIG
+from backend.models.database import DatabaseManager
+from backend.core.shop_store import ShopStore
+from backend.core.shop_importer import ShopImporter
+
+STATUS_ICONS = {'imported': '✅', 'duplicate': '⏭️', 'superseded': '⏭️', 'invalid': '⚠️', 'failed': '❌'}
+
+def collect_paths(inputs):
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            paths.extend(os.path.join(item, name) for name in sorted(os.listdir(item)) if name.endswith('.csv'))
+        elif os.path.isfile(item):
+            paths.append(item)
+        else:
+            print(f"⚠️ 路径不存在: {item}")
+    return paths
+
+def main():
+    parser = argparse.ArgumentParser(description='把爬取结果CSV导入商铺存储')
+    parser.add_argument('paths', nargs='*', default=[FILE_PATHS['OUTPUTS_DIR']], help='CSV文件或目录')
+    parser.add_argument('--db', default=DATABASE_CONFIG['DB_PATH'], help='数据库文件')
+    parser.add_argument('--batch-size', type=int, default=5000, help='每个事务写入的行数')
+    parser.add_argument('--sort-type', default='popularity', help='文件对应的排序方式（输出文件中没有记录）')
+    parser.add_argument('--dry-run', action='store_true', help='只列出导入计划，不打开数据库')
+    args = parser.parse_args()
+
+    paths = collect_paths(args.paths)
+
+    if args.dry_run:
+        # 只根据文件名列出计划，不打开数据库（打开时会执行迁移和迁移前备份）
+        for entry in ShopImporter.plan(paths):
+            info = entry['info']
+            action = f"跳过: {entry['skip']}" if entry['skip'] else '导入'
+            print(f"{info['timestamp']:%Y-%m-%d %H:%M:%S}  {os.path.basename(entry['path'])}  {action}")
+        return
+
+    db_manager = DatabaseManager(args.db)
+    shop_store = ShopStore(db_manager, SHOP_STORE_CONFIG.get('PAGE_SIZE', 15))
+    importer = ShopImporter(db_manager, shop_store, batch_size=args.batch_size, sort_type=args.sort_type)
+
+    try:
+        def progress(result):
+            detail = result.get('reason') or result.get('error') or ''
+            if result.get('duplicate_of'):
+                detail = f"与 {result['duplicate_of']} 内容相同"
+            print(f"{STATUS_ICONS.get(result['status'], '')} {result['file']}: {result['status']} "
+                  f"{result['rows']} 行 {detail}".rstrip())
+
+        started = time.perf_counter()
+        summary = importer.import_paths(paths, progress)
+        elapsed = time.perf_counter() - started
+        print()
+        print(f"📦 导入 {summary['imported']} 个文件共 {summary['rows']} 行，"
+              f"跳过重复 {summary['duplicate']} 个、被完整结果包含 {summary['superseded']} 个，"
+              f"无效 {summary['invalid']} 个，失败 {summary['failed']} 个；"
+              f"耗时 {elapsed:.1f} 秒（{summary['rows'] / elapsed if elapsed > 0 else 0:.0f} 行/秒）")
+    finally:
+        db_manager.close()
+
+if __name__ == '__main__':
+    main()
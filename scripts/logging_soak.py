@@ -0,0 +1,88 @@
+"""
+日志后端浸泡测试 - 连续创建并关闭大量爬虫实例，检查logger、handler和文件描述符是否泄漏
+
+用法:
+    python scripts/logging_soak.py --tasks 1000 --lines 20
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.core import crawler_logging
+from backend.core.custom_crawler import WebCustomCrawler
+
+def count_open_fds():
+    """当前进程打开的文件描述符数量（不支持的平台返回None）"""
+    try:
+        return len(os.listdir('/proc/self/fd'))
+    except OSError:
+        return None
+
+def snapshot():
+    logger = logging.getLogger(crawler_logging.LOGGER_NAME)
+    return {
+        'fds': count_open_fds(),
+        'loggers': len(logging.Logger.manager.loggerDict),
+        'handlers': len(logger.handlers)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='爬虫日志后端浸泡测试')
+    parser.add_argument('--tasks', type=int, default=1000, help='模拟任务数')
+    parser.add_argument('--lines', type=int, default=20, help='每个任务写入的日志行数')
+    args = parser.parse_args()
+
+    log_dir = tempfile.mkdtemp(prefix='logging_soak_')
+    crawler_logging.configure_crawler_logging(log_dir=log_dir, console=False)
+
+    # 预热一次，排除首次导入和打开日志文件（首条日志时才打开）的影响
+    warmup = WebCustomCrawler('a=b', task_id='warmup')
+    warmup.logger.info("预热")
+    warmup.close()
+    time.sleep(0.5)
+    before = snapshot()
+    started_at = time.perf_counter()
+
+    for i in range(args.tasks):
+        crawler = WebCustomCrawler('a=b', task_id=str(uuid.uuid4()))
+        for line in range(args.lines):
+            crawler.logger.info(f"[PAGE] ✅ 第{line + 1}页成功: 15 个商铺 (耗时0.1秒)")
+        crawler._update_status(f"任务 {i} 完成", progress=100, status_type='success')
+        crawler.close()
+
+    elapsed = time.perf_counter() - started_at
+    after = snapshot()
+    stats = crawler_logging.get_logging_stats()
+    crawler_logging.shutdown_crawler_logging()
+
+    total_lines = 0
+    tagged_lines = 0
+    for filename in os.listdir(log_dir):
+        with open(os.path.join(log_dir, filename), encoding='utf-8') as f:
+            for line in f:
+                total_lines += 1
+                tagged_lines += '[T:' in line
+
+    expected = args.tasks * (args.lines + 1) + 1
+    print(f"任务数: {args.tasks}, 耗时: {elapsed:.2f}秒 ({args.tasks / elapsed:.0f} 任务/秒)")
+    print(f"文件描述符: {before['fds']} -> {after['fds']}")
+    print(f"logger数量: {before['loggers']} -> {after['loggers']}")
+    print(f"共用logger的handler数量: {before['handlers']} -> {after['handlers']}")
+    print(f"日志行数: {total_lines} (期望 {expected}，丢弃 {stats['dropped']})，带任务标记: {tagged_lines}")
+
+    leaked = (after['loggers'] > before['loggers'] or after['handlers'] > before['handlers']
+              or (before['fds'] is not None and after['fds'] > before['fds']))
+    if leaked:
+        print("❌ 检测到资源泄漏")
+        sys.exit(1)
+    print("✅ 未检测到资源泄漏")
+
+if __name__ == '__main__':
+    main()
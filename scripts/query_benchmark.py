@@ -0,0 +1,184 @@
+"""
+查询基准测试 - 在大量历史数据上对比加索引/改写前后的查询耗时和执行计划
+
+在临时数据库中预置爬取历史（默认100万行）、Cookie使用记录、爬取组合和任务队列，
+先删除查询索引并执行原来的SQL，再建回索引执行改写后的SQL，输出每条查询的中位耗时和
+EXPLAIN QUERY PLAN。
+
+用法:
+    python scripts/query_benchmark.py
+    python scripts/query_benchmark.py --rows 200000 --repeat 10
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.models.database import DatabaseManager
+from backend.models.migrations import get_migration
+
+# query_indexes和history_filters迁移创建的查询索引
+QUERY_INDEXES = [
+    'idx_crawl_history_created_at',
+    'idx_crawl_history_cookie_status_start',
+    'idx_crawl_history_status',
+    'idx_cookie_usage_date_hash',
+    'idx_crawl_combinations_cookie_date',
+    'idx_task_queue_status_created',
+    'idx_crawl_history_city_created',
+    'idx_crawl_history_status_created',
+    'idx_crawl_history_cookie_created',
+    'idx_crawl_history_categories_history'
+]
+INDEX_MIGRATIONS = ['query_indexes', 'history_filters']
+
+COOKIES = 50
+STATUSES = ['completed'] * 8 + ['failed', 'cancelled']
+
+def build_queries(today):
+    """(名称, 原SQL, 改写后SQL, 参数构造函数)"""
+    tomorrow = today + timedelta(days=1)
+    return [
+        ('历史列表第一页',
+         'SELECT * FROM crawl_history ORDER BY created_at DESC LIMIT 50 OFFSET 0',
+         'SELECT * FROM crawl_history ORDER BY created_at DESC LIMIT 50 OFFSET 0',
+         lambda: ((), ())),
+        ('冷却检查MAX(start_time)',
+         "SELECT MAX(start_time) FROM crawl_history WHERE cookie_hash = ? AND status IN ('completed', 'running')",
+         '''SELECT MAX(last_start) FROM (
+                SELECT MAX(start_time) AS last_start FROM crawl_history WHERE cookie_hash = ? AND status = 'completed'
+                UNION ALL
+                SELECT MAX(start_time) FROM crawl_history WHERE cookie_hash = ? AND status = 'running')''',
+         lambda: _cookie_params()),
+        ('今日任务数',
+         'SELECT COUNT(*) FROM crawl_history WHERE DATE(created_at) = ?',
+         'SELECT COUNT(*) FROM crawl_history WHERE created_at >= ? AND created_at < ?',
+         lambda: ((str(today),), (str(today), str(tomorrow)))),
+        ('成功任务数',
+         "SELECT COUNT(*) FROM crawl_history WHERE status = 'completed'",
+         "SELECT COUNT(*) FROM crawl_history WHERE status = 'completed'",
+         lambda: ((), ())),
+        ('今日活跃Cookie',
+         'SELECT COUNT(DISTINCT cookie_hash) FROM cookie_usage WHERE usage_date = ?',
+         'SELECT COUNT(DISTINCT cookie_hash) FROM cookie_usage WHERE usage_date = ?',
+         lambda: ((str(today),), (str(today),))),
+        ('今日已爬组合',
+         "SELECT city, category FROM crawl_combinations WHERE cookie_hash = ? AND crawl_date = DATE('now')",
+         'SELECT city, category FROM crawl_combinations WHERE cookie_hash = ? AND crawl_date = ?',
+         lambda: _combination_params(today)),
+        ('待领取任务',
+         "SELECT * FROM task_queue WHERE status = 'pending' ORDER BY created_at ASC",
+         "SELECT * FROM task_queue WHERE status = 'pending' ORDER BY created_at ASC",
+         lambda: ((), ()))
+    ]
+
+def _cookie_params():
+    cookie_hash = f'cookie{random.randrange(COOKIES)}'
+    return (cookie_hash,), (cookie_hash, cookie_hash)
+
+def _combination_params(today):
+    cookie_hash = f'cookie{random.randrange(COOKIES)}'
+    return (cookie_hash,), (cookie_hash, str(today))
+
+def seed(db_path, rows, days):
+    """写入测试数据：历史记录的created_at均匀分布在最近days天内"""
+    now = datetime.now()
+    conn = sqlite3.connect(db_path)
+    conn.execute('PRAGMA synchronous=OFF')
+
+    def history_rows():
+        for i in range(rows):
+            created = now - timedelta(seconds=random.randrange(days * 86400))
+            yield (f'task-{i}', 'shenzhen', '["g112"]', 1, 15, 'first', f'cookie{i % COOKIES}',
+                   created.isoformat(' '), random.choice(STATUSES), random.randint(0, 300),
+                   created.strftime('%Y-%m-%d %H:%M:%S'))
+    conn.executemany('''
+        INSERT INTO crawl_history
+        (task_id, city, categories, start_page, end_page, range_type, cookie_hash, start_time, status,
+         total_shops, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', history_rows())
+
+    conn.executemany('''
+        INSERT INTO cookie_usage (cookie_hash, last_used, daily_usage_count, usage_date)
+        VALUES (?, ?, 1, ?)
+    ''', ((f'cookie{c}', now, (now - timedelta(days=d)).date()) for c in range(COOKIES) for d in range(days)))
+
+    conn.executemany('''
+        INSERT OR IGNORE INTO crawl_combinations (city, category, crawl_date, cookie_hash, task_id)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (('深圳', f'品类{k}', (now - timedelta(days=d)).date(), f'cookie{c}', 't')
+          for c in range(COOKIES) for d in range(days) for k in range(3)))
+
+    conn.executemany('''
+        INSERT INTO task_queue (task_id, city, categories, end_page, cookie_string, status, created_at)
+        VALUES (?, 'shenzhen', '["g112"]', 15, 'a=b', ?, ?)
+    ''', ((f'queued-{i}', 'pending' if i % 10 == 0 else 'leased', now - timedelta(seconds=i)) for i in range(2000)))
+    conn.commit()
+    conn.close()
+
+def measure(conn, sql, params_factory, which, repeat):
+    timings = []
+    for _ in range(repeat):
+        params = params_factory()[which]
+        started = time.perf_counter()
+        conn.execute(sql, params).fetchall()
+        timings.append((time.perf_counter() - started) * 1000)
+    plan = ' | '.join(row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params_factory()[which]))
+    return statistics.median(timings), plan
+
+def main():
+    parser = argparse.ArgumentParser(description='查询索引基准测试')
+    parser.add_argument('--rows', type=int, default=1000000, help='爬取历史行数')
+    parser.add_argument('--days', type=int, default=365, help='历史数据覆盖的天数')
+    parser.add_argument('--repeat', type=int, default=20, help='每条查询执行次数（取中位数）')
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix='query_benchmark_'), 'benchmark.db')
+    db_manager = DatabaseManager(db_path)
+    db_manager.close()
+
+    started = time.perf_counter()
+    seed(db_path, args.rows, args.days)
+    print(f"📦 预置数据: 爬取历史 {args.rows} 行，耗时 {time.perf_counter() - started:.1f} 秒")
+
+    today = datetime.now().date()
+    queries = build_queries(today)
+    conn = sqlite3.connect(db_path)
+
+    # 改写前：没有查询索引，执行原SQL
+    for name in QUERY_INDEXES:
+        conn.execute(f'DROP INDEX IF EXISTS {name}')
+    conn.execute('ANALYZE')
+    before = [measure(conn, old_sql, params, 0, args.repeat) for _, old_sql, _, params in queries]
+
+    # 改写后：重新执行建索引的迁移步骤（按迁移顺序，得到与实际数据库相同的索引），执行新SQL
+    for name in INDEX_MIGRATIONS:
+        get_migration(name).apply(conn.cursor())
+    conn.commit()
+    conn.execute('ANALYZE')
+    after = [measure(conn, new_sql, params, 1, args.repeat) for _, _, new_sql, params in queries]
+    conn.close()
+
+    print()
+    print(f"{'查询':24} {'改写前ms':>10} {'改写后ms':>10} {'加速':>8}")
+    for (name, *_), (old_ms, _), (new_ms, _) in zip(queries, before, after):
+        speedup = old_ms / new_ms if new_ms > 0 else float('inf')
+        print(f"{name:24} {old_ms:>10.2f} {new_ms:>10.2f} {speedup:>7.1f}x")
+
+    print()
+    for (name, *_), (_, old_plan), (_, new_plan) in zip(queries, before, after):
+        print(f"▶️ {name}")
+        print(f"    改写前: {old_plan}")
+        print(f"    改写后: {new_plan}")
+
+if __name__ == '__main__':
+    main()